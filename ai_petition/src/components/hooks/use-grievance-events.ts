@@ -0,0 +1,69 @@
+import { useEffect, useRef } from "react";
+
+export interface GrievanceEvent {
+  type: string;
+  grievance_id: string;
+  status: string;
+  [key: string]: unknown;
+}
+
+const EVENT_TYPES = ["grievance.created", "grievance.updated", "grievance.escalated", "comment.added", "reset"];
+// When the server turns the stream away (each worker takes a limited number),
+// pages reload on this interval and the stream is retried
+const FALLBACK_MS = 30000;
+
+// Subscribes to /api/events. EventSource reconnects on its own and resumes
+// from the last event id it received; if the server rejects the stream it
+// gives up, and we fall back to a "reset" event every FALLBACK_MS.
+export function useGrievanceEvents(onEvent: (event: GrievanceEvent) => void) {
+  const handler = useRef(onEvent);
+  handler.current = onEvent;
+
+  useEffect(() => {
+    const token = localStorage.getItem("token");
+    if (!token) return;
+
+    const url = import.meta.env.VITE_BACKEND_URL;
+    let source: EventSource | null = null;
+    let retry: ReturnType<typeof setTimeout> | undefined;
+    const listener = (e: MessageEvent) => {
+      handler.current({ ...JSON.parse(e.data || "{}"), type: e.type });
+    };
+
+    const connect = () => {
+      source = new EventSource(`${url}/api/events?token=${encodeURIComponent(token)}`);
+      EVENT_TYPES.forEach((type) => source!.addEventListener(type, listener));
+      source.onerror = () => {
+        if (source?.readyState !== EventSource.CLOSED) return;
+        retry = setTimeout(() => {
+          handler.current({ type: "reset", grievance_id: "", status: "" });
+          connect();
+        }, FALLBACK_MS);
+      };
+    };
+
+    connect();
+    return () => {
+      clearTimeout(retry);
+      source?.close();
+    };
+  }, []);
+}
+
+// Calls reload at most once per delayMs while grievance events arrive, for
+// pages that simply refetch (lists, dashboards)
+export function useLiveRefresh(reload: () => void, delayMs = 1000) {
+  const pending = useRef<ReturnType<typeof setTimeout> | undefined>(undefined);
+  const latest = useRef(reload);
+  latest.current = reload;
+
+  useEffect(() => () => clearTimeout(pending.current), []);
+
+  useGrievanceEvents(() => {
+    if (pending.current) return;
+    pending.current = setTimeout(() => {
+      pending.current = undefined;
+      latest.current();
+    }, delayMs);
+  });
+}
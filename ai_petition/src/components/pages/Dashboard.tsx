@@ -15,6 +15,7 @@ import {
 import { Doughnut, Pie } from 'react-chartjs-2';
 import Navbar from '@/components/ui/AppNavbar';
 import axios from 'axios';
+import { useLiveRefresh } from '@/components/hooks/use-grievance-events';
 
 // Register ChartJS components
 ChartJS.register(
@@ -33,6 +34,10 @@ const Dashboard: React.FC = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [userRole, setUserRole] = useState<string>("");
+  const [refreshKey, setRefreshKey] = useState(0);
+
+  // Reload the numbers when grievances change instead of polling
+  useLiveRefresh(() => setRefreshKey((key) => key + 1));
 
   const getUserInfo = async () => {
     const token = localStorage.getItem('token');
@@ -51,10 +56,21 @@ const Dashboard: React.FC = () => {
   };
 
 
+  useEffect(() => {
+    const fetchUser = async () => {
+      const userInfo = await getUserInfo();
+      setUserRole(userInfo.role);
+      console.log(userInfo.role)
+    };
+
+    fetchUser();
+  }, []);
+
   useEffect(() => {
     const fetchDashboardData = async () => {
       try {
-        setLoading(true);
+        // Live refreshes update in place; only the first load shows the spinner
+        if (refreshKey === 0) setLoading(true);
 
         // Fetch statistics
         const statsResponse = await statisticsApi.getStatistics();
@@ -78,16 +94,8 @@ const Dashboard: React.FC = () => {
       }
     };
 
-    const fetchUser = async () => {
-      const userInfo = await getUserInfo();
-      setUserRole(userInfo.role);
-      console.log(userInfo.role)
-    };
-
-    fetchUser();
-
     fetchDashboardData();
-  }, []);
+  }, [refreshKey]);
 
   // Prepare chart data
   const getStatusChartData = () => {
@@ -5,11 +5,17 @@ import { Link, useNavigate } from "react-router-dom";
 import api  from "@/lib/api";
 import Navbar from "../ui/AppNavbar";
 import { Plus } from "lucide-react";
+import { formatDistanceToNow } from "date-fns/formatDistanceToNow";
+import { useLiveRefresh } from "../hooks/use-grievance-events";
 
 const GrievancePage: React.FC = () => {
   const { user } = useAuth();
   const navigate = useNavigate();
   const [grievances, setGrievances] = useState([]);
+  const [refreshKey, setRefreshKey] = useState(0);
+
+  // Refetch when grievances change instead of polling
+  useLiveRefresh(() => setRefreshKey((key) => key + 1));
 
   useEffect(() => {
     if (!user) {
@@ -28,7 +34,7 @@ const GrievancePage: React.FC = () => {
     };
 
     fetchGrievances();
-  }, [user, navigate]);
+  }, [user, navigate, refreshKey]);
 
   return (
     <div className="min-h-screen w-full dark:bg-background-100">
@@ -50,7 +56,7 @@ const GrievancePage: React.FC = () => {
              <table className="min-w-full divide-y divide-gray-200 dark:divide-background-300">
                <thead className="bg-gray-50 dark:bg-background-200">
                  <tr>
-                   {['Title', 'Status', 'Priority', 'Created', 'Actions'].map((header) => (
+                   {['Title', 'Status', 'Priority', 'Created', 'Activity', 'Actions'].map((header) => (
                      <th 
                        key={header} 
                        className="px-6 py-3 text-left text-xs font-medium text-gray-500 dark:text-text-200 uppercase tracking-wider"
@@ -88,6 +94,13 @@ const GrievancePage: React.FC = () => {
                        <td className="px-6 py-4 whitespace-nowrap dark:text-text-100">
                          {new Date(grievance.created_at).toLocaleDateString()}
                        </td>
+                       <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-500 dark:text-text-200">
+                         {grievance.comment_count ?? 0} {grievance.comment_count === 1 ? 'comment' : 'comments'},{' '}
+                         {grievance.attachment_count ?? 0} {grievance.attachment_count === 1 ? 'file' : 'files'}
+                         {grievance.last_activity_at && (
+                           <>, last activity {formatDistanceToNow(new Date(grievance.last_activity_at), { addSuffix: true })}</>
+                         )}
+                       </td>
                        <td className="px-6 py-4 whitespace-nowrap">
                          <a 
                            href={`/grievances/${grievance.id}`} 
@@ -3,6 +3,7 @@ import { useEffect, useState } from "react";
 import { useParams } from "react-router-dom";
 import Navbar from "../ui/AppNavbar";
 import axios from "axios";
+import { useGrievanceEvents } from "../hooks/use-grievance-events";
 
 interface Grievance {
   id: string;
@@ -37,8 +38,57 @@ const GrievanceDetails = () => {
   const [userRole, setUserRole] = useState<string>("");
   const [updating, setUpdating] = useState(false);
   const [newComment, setNewComment] = useState<string>("");
+  const [refreshKey, setRefreshKey] = useState(0);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [prevCursor, setPrevCursor] = useState<string | null>(null);
   const statusOptions = ["Open", "In Progress", "Resolved", "Closed", "Pending"];
 
+  const fetchComments = async (params: Record<string, string>) => {
+    const token = localStorage.getItem("token");
+    const url = import.meta.env.VITE_BACKEND_URL;
+    const response = await axios.get(`${url}/api/grievances/${id}/comments`, {
+      params,
+      headers: { Authorization: `Bearer ${token}` },
+    });
+    return response.data;
+  };
+
+  // Append comments newer than the last one we have
+  const fetchNewComments = async () => {
+    if (!nextCursor) {
+      setRefreshKey((key) => key + 1);
+      return;
+    }
+    let cursor = nextCursor;
+    let more = true;
+    while (more) {
+      const page = await fetchComments({ since: cursor });
+      setComments((current) => {
+        const known = new Set(current.map((c) => c.id));
+        return [...current, ...page.comments.filter((c: Comment) => !known.has(c.id))];
+      });
+      cursor = page.next_cursor;
+      more = page.has_more;
+    }
+    setNextCursor(cursor);
+  };
+
+  const loadOlderComments = async () => {
+    if (!prevCursor) return;
+    const page = await fetchComments({ before: prevCursor });
+    setComments((current) => [...page.comments, ...current]);
+    setPrevCursor(page.prev_cursor);
+  };
+
+  // New comments are fetched incrementally; other changes reload the page
+  useGrievanceEvents((event) => {
+    if (event.type === "comment.added" && event.grievance_id === id) {
+      fetchNewComments().catch((err) => console.error("Error fetching comments", err));
+    } else if (event.type === "reset" || event.grievance_id === id) {
+      setRefreshKey((key) => key + 1);
+    }
+  });
+
   const getUserInfo = async () => {
     const token = localStorage.getItem('token');
     try {
@@ -59,7 +109,7 @@ const GrievanceDetails = () => {
     if (!id) return;
 
     const fetchGrievance = async () => {
-      setLoading(true);
+      setLoading(refreshKey === 0);
       try {
         const token = localStorage.getItem("token");
         // read environment variable
@@ -78,6 +128,8 @@ const GrievanceDetails = () => {
         const data = await response.json();
         setGrievance(data.grievance);
         setComments(data.comments);
+        setNextCursor(data.comments_next_cursor);
+        setPrevCursor(data.comments_prev_cursor);
         setAttachments(data.attachments);
         console.log(data);
       } catch (err: any) {
@@ -95,7 +147,7 @@ const GrievanceDetails = () => {
     fetchUser();
 
     fetchGrievance();
-  }, [id]);
+  }, [id, refreshKey]);
 
   const handleStatusChange = async (newStatus: string) => {
     if (!id || !grievance) return;
@@ -128,7 +180,9 @@ const GrievanceDetails = () => {
         { content: newComment },
         { headers: { Authorization: `Bearer ${token}` } }
       );
-      setComments([...comments, response.data.comment]);
+      setComments((current) =>
+        current.some((c) => c.id === response.data.comment.id) ? current : [...current, response.data.comment]
+      );
       setNewComment("");
     } catch (err) {
       console.error("Error adding comment", err);
@@ -233,6 +287,14 @@ const GrievanceDetails = () => {
                     {comments.length}
                 </span>
                 </h2>
+                {prevCursor && (
+                <button
+                    onClick={loadOlderComments}
+                    className="mb-3 text-sm text-blue-600 dark:text-[#69b4ff] hover:underline"
+                >
+                    Load older comments
+                </button>
+                )}
                 {comments.length > 0 ? (
                 <div className="space-y-3">
                     {comments.map((comment) => (
@@ -185,7 +185,9 @@ const NewGrievance: React.FC = () => {
       };
 
       // Use your actual Flask backend endpoint
-      const response = await axios.post('http://localhost:5000/api/ai-analyze-grievance', formDataToAnalyze);
+      const response = await axios.post('http://localhost:5000/api/ai-analyze-grievance', formDataToAnalyze, {
+        headers: { Authorization: `Bearer ${localStorage.getItem('token')}` },
+      });
 
       // Parse Gemini's response and update form
       const updatedFormData = parseAISuggestions(response.data, formData);
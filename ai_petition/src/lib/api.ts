@@ -133,6 +133,8 @@ export const grievanceApi = {
     api.get<ApiResponse<{ 
       grievance: Grievance; 
       comments: Comment[]; 
+      comments_next_cursor: string | null; 
+      comments_prev_cursor: string | null; 
       attachments: Attachment[] 
     }>>(`/grievances/${id}`),
   
@@ -149,8 +151,13 @@ export const grievanceApi = {
   addComment: (grievanceId: number, content: string) => 
     api.post<ApiResponse<{ comment: Comment }>>(`/grievances/${grievanceId}/comments`, { content }),
   
-  getComments: (grievanceId: number) => 
-    api.get<ApiResponse<{ comments: Comment[] }>>(`/grievances/${grievanceId}/comments`),
+  getComments: (grievanceId: number, params?: { since?: string; before?: string; limit?: number }) => 
+    api.get<ApiResponse<{ 
+      comments: Comment[]; 
+      next_cursor: string | null; 
+      prev_cursor: string | null; 
+      has_more: boolean 
+    }>>(`/grievances/${grievanceId}/comments`, { params }),
   
   uploadAttachment: (grievanceId: number, file: File) => {
     const formData = new FormData();
@@ -23,6 +23,13 @@ export interface FeedbackStatistics {
   };
 }
 
+// One page of GET /feedback; next_cursor is null on the last page
+export interface FeedbackPage {
+  status: string;
+  feedback: Feedback[];
+  next_cursor: string | null;
+}
+
 export interface FeedbackFormData {
   message: string;
   rating: number;
@@ -32,6 +39,35 @@ export interface FeedbackFormData {
 // Create api instance from your existing api.ts file
 import api from './api'; // Import your existing api instance
 
+/**
+ * Get one page of feedback, newest first
+ * @param category Optional category filter
+ * @param rating Optional rating filter
+ * @param cursor next_cursor of the previous page
+ */
+const getFeedbackPage = (category?: string, rating?: number, cursor?: string) => {
+  let url = '/feedback';
+  const params = new URLSearchParams();
+  
+  if (category && category !== 'all') {
+    params.append('category', category);
+  }
+  
+  if (rating) {
+    params.append('rating', rating.toString());
+  }
+
+  if (cursor) {
+    params.append('cursor', cursor);
+  }
+  
+  if (params.toString()) {
+    url += `?${params.toString()}`;
+  }
+  
+  return api.get<FeedbackPage>(url);
+};
+
 // Feedback API endpoints
 export const feedbackApi = {
   /**
@@ -40,28 +76,22 @@ export const feedbackApi = {
   submitFeedback: (feedbackData: FeedbackFormData) =>
     api.post<ApiResponse<{ feedback: Feedback }>>('/feedback', feedbackData),
 
+  getFeedbackPage,
+
   /**
-   * Get all feedback with optional filtering
+   * Get all feedback with optional filtering, following next_cursor
+   * until the last page
    * @param category Optional category filter
    * @param rating Optional rating filter
    */
-  getFeedback: (category?: string, rating?: number) => {
-    let url = '/feedback';
-    const params = new URLSearchParams();
-    
-    if (category && category !== 'all') {
-      params.append('category', category);
-    }
-    
-    if (rating) {
-      params.append('rating', rating.toString());
-    }
-    
-    if (params.toString()) {
-      url += `?${params.toString()}`;
+  getFeedback: async (category?: string, rating?: number) => {
+    let response = await getFeedbackPage(category, rating);
+    const feedback = [...response.data.feedback];
+    while (response.data.next_cursor) {
+      response = await getFeedbackPage(category, rating, response.data.next_cursor);
+      feedback.push(...response.data.feedback);
     }
-    
-    return api.get<ApiResponse<{ feedback: Feedback[] }>>(url);
+    return { ...response, data: { ...response.data, feedback, next_cursor: null } };
   },
 
   /**
@@ -24,6 +24,9 @@ export interface User {
     updated_at: string;
     ai_summary: string | null;
     ai_recommendation: string | null;
+    comment_count: number;
+    attachment_count: number;
+    last_activity_at: string | null;
     submitter?: User;
     assignee?: User;
   }
@@ -1,5 +1,5 @@
 import sqlite3
-import uuid
+import ids
 from werkzeug.security import generate_password_hash
 
 DATABASE_NAME = 'grievance_system.db'
@@ -23,7 +23,7 @@ def create_admin_account():
         return
     
     # Admin details
-    admin_id = str(uuid.uuid4())
+    admin_id = ids.new_id()
     admin_name = "Admin User"
     admin_email = "admin@petition.ai"
     admin_password = generate_password_hash("Admin@123")  # Securely hash the password
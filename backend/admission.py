@@ -0,0 +1,223 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from flask import jsonify
+
+# Admission control for expensive endpoints.
+#
+# Every expensive route belongs to a lane. A request is admitted when both
+# the per-user and the lane-wide token bucket have a token, and then has to
+# get one of the lane's worker slots. Lanes never share slots, so a flood of
+# AI or statistics calls can only tie up its own lane while interactive reads
+# (which don't go through admission at all) keep being served.
+#
+#   rate/burst             - tokens per second and bucket size
+#   concurrency            - slots in the lane
+#   queue_timeout          - how long a request may wait for a slot (seconds)
+LANES = {
+    'ai': {
+        'user_rate': 5 / 60, 'user_burst': 5,
+        'global_rate': 2.0, 'global_burst': 20,
+        'concurrency': 4, 'queue_timeout': 2.0,
+    },
+    'upload': {
+        'user_rate': 30 / 60, 'user_burst': 10,
+        'global_rate': 20.0, 'global_burst': 100,
+        'concurrency': 8, 'queue_timeout': 5.0,
+    },
+    'statistics': {
+        'user_rate': 1.0, 'user_burst': 10,
+        'global_rate': 50.0, 'global_burst': 200,
+        'concurrency': 4, 'queue_timeout': 1.0,
+    },
+}
+
+MAX_MEMORY_BUCKETS = 10000
+BUCKET_IDLE_SECONDS = 3600  # Longer than any bucket takes to refill
+
+
+class MemoryBuckets:
+    """Token buckets held in this process"""
+
+    def __init__(self):
+        self.buckets = {}  # key -> [tokens, updated]
+        self.lock = threading.Lock()
+
+    def take(self, specs, cost=1.0):
+        """Take cost tokens from every (key, rate, burst) bucket, or none.
+
+        Returns 0 when admitted, otherwise the seconds to wait before retrying.
+        """
+        now = time.monotonic()
+        with self.lock:
+            if len(self.buckets) > MAX_MEMORY_BUCKETS:
+                self._prune(now)
+
+            levels = []
+            wait = 0.0
+            for key, rate, burst in specs:
+                tokens, updated = self.buckets.get(key, (burst, now))
+                tokens = min(burst, tokens + (now - updated) * rate)
+                levels.append((key, tokens))
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / rate)
+
+            if wait:
+                for key, tokens in levels:
+                    self.buckets[key] = [tokens, now]
+                return wait
+
+            for key, tokens in levels:
+                self.buckets[key] = [tokens - cost, now]
+            return 0.0
+
+    def _prune(self, now):
+        """Drop buckets idle long enough to have refilled completely"""
+        for key, (_, updated) in list(self.buckets.items()):
+            if now - updated > BUCKET_IDLE_SECONDS:
+                del self.buckets[key]
+
+
+class SQLiteBuckets:
+    """Token buckets shared by every worker process through a SQLite file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        conn = self._connection()
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS rate_buckets (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated REAL NOT NULL
+        )
+        ''')
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self.local.conn = conn
+        return conn
+
+    def take(self, specs, cost=1.0):
+        """Same contract as MemoryBuckets.take, atomic across processes"""
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            levels = []
+            wait = 0.0
+            for key, rate, burst in specs:
+                row = conn.execute('SELECT tokens, updated FROM rate_buckets WHERE key = ?', (key,)).fetchone()
+                tokens, updated = row if row else (burst, now)
+                tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+                levels.append((key, tokens))
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / rate)
+
+            for key, tokens in levels:
+                conn.execute(
+                    'INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                    (key, tokens if wait else tokens - cost, now)
+                )
+            conn.execute('COMMIT')
+            return wait
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+
+class Lane:
+    """A bounded set of worker slots for one class of requests"""
+
+    def __init__(self, concurrency, queue_timeout):
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.queue_timeout = queue_timeout
+
+    def acquire(self):
+        return self.slots.acquire(timeout=self.queue_timeout)
+
+    def release(self):
+        self.slots.release()
+
+
+_store = None
+_lanes = {}
+_setup_lock = threading.Lock()
+
+
+def enabled():
+    return os.environ.get('ADMISSION_ENABLED', '1') != '0'
+
+
+def get_store():
+    """Return the bucket store (SQLite-backed when ADMISSION_DB is set)"""
+    global _store
+    if _store is None:
+        with _setup_lock:
+            if _store is None:
+                path = os.environ.get('ADMISSION_DB')
+                _store = SQLiteBuckets(path) if path else MemoryBuckets()
+    return _store
+
+
+def get_lane(name):
+    lane = _lanes.get(name)
+    if lane is None:
+        with _setup_lock:
+            lane = _lanes.get(name)
+            if lane is None:
+                policy = LANES[name]
+                lane = _lanes[name] = Lane(policy['concurrency'], policy['queue_timeout'])
+    return lane
+
+
+def check(lane_name, user_id, cost=1.0):
+    """Charge the user's and the lane's buckets; return seconds to wait or 0"""
+    policy = LANES[lane_name]
+    return get_store().take([
+        (f'{lane_name}:user:{user_id}', policy['user_rate'], policy['user_burst']),
+        (f'{lane_name}:global', policy['global_rate'], policy['global_burst']),
+    ], cost)
+
+
+def too_many_requests(retry_after, message="Too many requests, please slow down"):
+    """Build a standard 429 response"""
+    response = jsonify({"error": message, "retry_after": retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def admit(lane_name, cost=1.0):
+    """Decorator placing a route behind a lane. Use below @token_required."""
+    LANES[lane_name]  # Fail at import time on a typo
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(user, *args, **kwargs):
+            if not enabled():
+                return f(user, *args, **kwargs)
+
+            wait = check(lane_name, user['id'], cost)
+            if wait:
+                return too_many_requests(max(1, math.ceil(wait)))
+
+            lane = get_lane(lane_name)
+            if not lane.acquire():
+                return too_many_requests(1, "Server is busy, please retry shortly")
+            try:
+                return f(user, *args, **kwargs)
+            finally:
+                lane.release()
+
+        return decorated
+
+    return decorator
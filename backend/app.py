@@ -5,21 +5,32 @@ import os
 import uuid
 from werkzeug.utils import secure_filename
 import db
-import jwt
+import hashing
+import admission
+import assignment
+import metrics
+import providers
+import jsonfast
+import compression
+import events
+import scheduler
+import sla
+import threading
 from datetime import datetime, timedelta
 from functools import wraps
-import google.generativeai as genai
-import smtplib
-from email.message import EmailMessage
 from dotenv import load_dotenv
 
 load_dotenv()
 
-genai.configure(api_key="YOUR_API_KEY")
+# google.generativeai, jwt, smtplib and email are loaded on first use
+# through providers.get() to keep worker and CLI startup fast
 
 app = Flask(__name__)
 # i want to allow all origins
 CORS(app, supports_credentials=True, origins='*')
+metrics.init_app(app)
+jsonfast.init_app(app)
+compression.init_app(app)
 
 # JWT Configuration
 app.config['SECRET_KEY'] = 'your_secret_key'
@@ -31,6 +42,9 @@ ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'doc', 'docx'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload
 
+# List pages larger than this are streamed instead of built in memory
+STREAM_ROWS = 1000
+
 
 def process_attachments(attachments):
     """
@@ -54,8 +68,127 @@ def process_attachments(attachments):
             print(f"Error processing attachment: {e}")
     return processed_attachments
 
+@app.route('/health', methods=['GET'])
+def health_check():
+    """Simple health check endpoint"""
+    return jsonify({"status": "healthy"}), 200
+
+# Application lifecycle
+_ai_model = None
+_shutdown_hooks = [hashing.shutdown, events.shutdown, db.shutdown, scheduler.shutdown]
+
+def get_ai_model():
+    """Return the shared Gemini model client"""
+    global _ai_model
+    if _ai_model is None:
+        _ai_model = providers.get('genai').GenerativeModel('gemini-1.5-flash')
+    return _ai_model
+
+def init_storage():
+    """Create the schema and upload folder. Run once, before serving."""
+    db.init_db()
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+# Building the Gemini client imports google.generativeai, which is slow and
+# optional; by default that happens on the first AI request. WARM_AI_CLIENT=1
+# builds it in warm_up() instead.
+def warm_up():
+    """Pull the database into the page cache (and optionally build the AI client) before taking traffic"""
+    db.warm_up()
+    assignment.warm_up()
+    if os.environ.get('WARM_AI_CLIENT', '').lower() in ('1', 'true', 'yes'):
+        try:
+            get_ai_model()
+        except ImportError as e:
+            # A missing optional dependency must not keep the worker from serving
+            print(f"AI client not available: {e}")
+    scheduler.start()
+
+def on_shutdown(fn):
+    """Register a function to run when the server drains (last registered runs first)"""
+    _shutdown_hooks.append(fn)
+    return fn
+
+def shutdown():
+    """Stop background work after in-flight requests have finished"""
+    for fn in reversed(_shutdown_hooks):
+        try:
+            fn()
+        except Exception as e:
+            app.logger.error(f"Error during shutdown in {fn.__name__}: {e}")
+
+def create_app(init=True, warm=False):
+    """Application factory: prepare storage (and optionally warm up) and return the app"""
+    if init:
+        init_storage()
+    if warm:
+        warm_up()
+    return app
+
+@app.errorhandler(hashing.HasherBusy)
+def hasher_busy(e):
+    """Fail fast when the password hashing pool is saturated"""
+    response = jsonify({"error": str(e)})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+# Helper functions
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def get_ai_insights(grievance_text):
+    return "AI summary", "AI recommendation"
+
+def generate_token(user_id):
+    """Generate a new JWT token for a user"""
+    payload = {
+        'user_id': user_id,
+        'exp': datetime.utcnow() + timedelta(seconds=JWT_EXPIRATION)
+    }
+    return providers.get('jwt').encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
+
+def authenticate(token):
+    """Return (user, None) for a valid token, or (None, error response)"""
+    jwt = providers.get('jwt')
+    if not token:
+        return None, (jsonify({"error": "Token is missing"}), 401)
+    
+    try:
+        payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+        user_id = payload['user_id']
+    except jwt.ExpiredSignatureError:
+        return None, (jsonify({"error": "Token has expired"}), 401)
+    except jwt.InvalidTokenError:
+        return None, (jsonify({"error": "Invalid token"}), 401)
+    
+    # Check if user exists
+    user = db.get_user_by_id(user_id)
+    if not user:
+        return None, (jsonify({"error": "User not found"}), 404)
+    return user, None
+
+def token_required(f):
+    """Decorator to check for valid token"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = None
+        auth_header = request.headers.get('Authorization')
+        
+        if auth_header and auth_header.startswith('Bearer '):
+            token = auth_header.split(' ')[1]
+        
+        user, error = authenticate(token)
+        if error:
+            return error
+            
+        return f(user, *args, **kwargs)
+    
+    return decorated
+
 @app.route('/api/ai-analyze-grievance', methods=['POST'])
-def analyze_grievance():
+@token_required
+@admission.admit('ai')
+def analyze_grievance(user):
     """
     Endpoint for AI analysis of grievance data
     """
@@ -128,8 +261,9 @@ Key Observations:
 Recommendations should be concise, clear, and directly actionable."""
         
         # Use Gemini Pro model for text generation
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(prompt)
+        model = get_ai_model()
+        with metrics.track('ai'):
+            response = model.generate_content(prompt)
         
         # Extract category and priority from the response
         try:
@@ -156,63 +290,6 @@ Recommendations should be concise, clear, and directly actionable."""
             "error": "Failed to process AI analysis",
             "details": str(e)
         }), 500
-    
-@app.route('/health', methods=['GET'])
-def health_check():
-    """Simple health check endpoint"""
-    return jsonify({"status": "healthy"}), 200
-
-@app.before_request
-def setup():
-    if not hasattr(app, 'setup_done'):
-        db.init_db()
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-        app.setup_done = True  # Ensures it runs only once
-
-# Helper functions
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def get_ai_insights(grievance_text):
-    return "AI summary", "AI recommendation"
-
-def generate_token(user_id):
-    """Generate a new JWT token for a user"""
-    payload = {
-        'user_id': user_id,
-        'exp': datetime.utcnow() + timedelta(seconds=JWT_EXPIRATION)
-    }
-    return jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
-
-def token_required(f):
-    """Decorator to check for valid token"""
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = None
-        auth_header = request.headers.get('Authorization')
-        
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-        
-        if not token:
-            return jsonify({"error": "Token is missing"}), 401
-        
-        try:
-            payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            user_id = payload['user_id']
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token has expired"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token"}), 401
-        
-        # Check if user exists
-        user = db.get_user_by_id(user_id)
-        if not user:
-            return jsonify({"error": "User not found"}), 404
-            
-        return f(user, *args, **kwargs)
-    
-    return decorated
 
 # User authentication routes
 @app.route('/api/users/register', methods=['POST'])
@@ -282,15 +359,18 @@ def get_current_user(user):
 @app.route('/api/users/department/<department>', methods=['GET'])
 @token_required
 def get_department_users(user, department):
-    users = db.get_users_by_department(department)
-    return jsonify({"users": users}), 200
+    # Served from the directory cache; unchanged lists get a 304
+    etag, users = db.get_department_directory(department)
+    response = jsonify({"users": users})
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
 
 # Grievance routes
 @app.route('/api/grievances', methods=['POST'])
 @token_required
 def create_grievance(user):
     data = request.json
-    print(data)
     # Validate required fields
     required_fields = ['title', 'description', 'category', 'priority']
     for field in required_fields:
@@ -305,7 +385,8 @@ def create_grievance(user):
         grievance_text = f"Title: {data['title']}\nDescription: {data['description']}\nCategory: {data['category']}"
         ai_summary, ai_recommendation = get_ai_insights(grievance_text)
     
-    # Create grievance
+    # Create grievance, assigned to the least loaded staff member of the department it's routed to
+    assignee = assignment.choose(data['category'], user.get('department'))
     grievance, error = db.create_grievance(
         data['title'],
         data['description'],
@@ -313,10 +394,13 @@ def create_grievance(user):
         data['priority'],
         user['id'],
         ai_summary,
-        ai_recommendation
+        ai_recommendation,
+        assigned_to=assignee,
+        department=user.get('department')
     )
     
     if error:
+        assignment.release(assignee)
         return jsonify({"error": error}), 400
     
     return jsonify({"message": "Grievance created successfully", "grievance": grievance}), 200
@@ -328,10 +412,15 @@ def get_grievances(user):
     limit = int(request.args.get('limit', 50))
     offset = int(request.args.get('offset', 0))
     
+    # Archived grievances are included unless ?archived=0
+    include_archived = request.args.get('archived', '').lower() not in ('0', 'false')
+    
     # Get grievances based on user role
-    grievances = db.get_user_grievances(user['id'], user['role'], limit, offset)
+    as_json = 'stream' if limit > STREAM_ROWS else True
+    grievances = db.get_user_grievances(user['id'], user['role'], limit, offset, as_json=as_json,
+                                         department=user.get('department'), include_archived=include_archived)
     
-    return jsonify({"grievances": grievances}), 200
+    return jsonfast.response(app, {"grievances": grievances})
 
 @app.route('/api/grievances/filter', methods=['GET'])
 @token_required
@@ -346,9 +435,51 @@ def filter_grievances(user):
     limit = int(request.args.get('limit', 50))
     offset = int(request.args.get('offset', 0))
     
-    grievances = db.get_grievances(filters, limit, offset)
+    # Archived grievances are searched too unless ?archived=0
+    include_archived = request.args.get('archived', '').lower() not in ('0', 'false')
+    
+    as_json = 'stream' if limit > STREAM_ROWS else True
+    grievances = db.get_grievances(filters, limit, offset, as_json=as_json, include_archived=include_archived)
+    fields = {"grievances": grievances}
     
-    return jsonify({"grievances": grievances}), 200
+    # ?facets=status,category,priority adds counts for the current filters
+    if request.args.get('facets'):
+        facets = db.get_grievance_facets(filters, request.args.get('facets').split(','))
+        fields["facets"] = jsonfast.dumps(facets)
+    
+    return jsonfast.response(app, fields)
+
+@app.route('/api/events', methods=['GET'])
+def grievance_events():
+    """Server-sent stream of grievance changes visible to the user.
+
+    EventSource can't set headers, so the token may also be passed as
+    ?token=. Reconnecting clients resume from the Last-Event-ID header.
+    """
+    token = request.args.get('token')
+    auth_header = request.headers.get('Authorization')
+    if auth_header and auth_header.startswith('Bearer '):
+        token = auth_header.split(' ')[1]
+    user, error = authenticate(token)
+    if error:
+        return error
+    
+    # Servers that support it hand the connection to the events broadcaster,
+    # so idle streams don't occupy a request thread
+    hijack = request.environ.get('server.hijack')
+    if not events.reserve(threaded=hijack is None):
+        response = jsonify({"error": "Too many live connections, please retry shortly"})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    
+    last_id = events.parse_id(request.headers.get('Last-Event-ID') or request.args.get('lastEventId'))
+    
+    # The stream releases its slot when the server closes it
+    response = app.response_class(events.Stream(user, last_id, hijack), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+    return response
 
 @app.route('/api/grievances/<grievance_id>', methods=['GET'])
 @token_required
@@ -358,9 +489,10 @@ def get_grievance(user, grievance_id):
     if not grievance:
         return jsonify({"error": "Grievance not found"}), 404
     
-    # Get comments and attachments
-    comments = db.get_grievance_comments(grievance_id)
-    attachments = db.get_grievance_attachments(grievance_id)
+    # Newest page of comments (older ones via GET .../comments?before=) and attachments (as JSON text)
+    archived = grievance.get('archived', False)
+    page = db.get_comment_page(grievance_id, archived=archived)
+    attachments = db.get_grievance_attachments(grievance_id, as_json=True, archived=archived)
     
     # Add submitter and assignee details
     submitter = db.get_user_by_id(grievance['submitted_by'])
@@ -374,11 +506,13 @@ def get_grievance(user, grievance_id):
             assignee.pop('password', None)
             grievance['assignee'] = assignee
     
-    return jsonify({
-        "grievance": grievance,
-        "comments": comments,
+    return jsonfast.response(app, {
+        "grievance": jsonfast.dumps(grievance),
+        "comments": jsonfast.dumps(page['comments']),
+        "comments_next_cursor": jsonfast.dumps(page['next_cursor']),
+        "comments_prev_cursor": jsonfast.dumps(page['prev_cursor']),
         "attachments": attachments
-    }), 200
+    })
 
 
 
@@ -389,6 +523,8 @@ def update_grievance(user, grievance_id):
     
     if not grievance:
         return jsonify({"error": "Grievance not found"}), 404
+    if grievance.get('archived'):
+        return jsonify({"error": "Archived grievances are read-only"}), 409
     
     # Check if user has permission to update
     user_role = user.get('role', '').lower()
@@ -397,19 +533,15 @@ def update_grievance(user, grievance_id):
     
     data = request.json
 
-    print(data)
-    print(grievance['submitted_by'])
-
     # get user email address
     user_email = db.get_user_by_id(grievance['submitted_by'])['email']
-    print(user_email)
 
     if data.get('status') == 'Resolved':
         send_email_about_status(user_email, grievance_id)
     elif data.get('status') == 'Closed':
         send_email_about_status(user_email, grievance_id, "closed")
 
-    updated_grievance, error = db.update_grievance(grievance_id, data)
+    updated_grievance, error = db.update_grievance(grievance_id, data, changed_by=user['id'])
     
     if error:
         return jsonify({"error": error}), 400
@@ -423,6 +555,8 @@ def add_comment(user, grievance_id):
     grievance = db.get_grievance(grievance_id)
     if not grievance:
         return jsonify({"error": "Grievance not found"}), 404
+    if grievance.get('archived'):
+        return jsonify({"error": "Archived grievances are read-only"}), 409
     
     data = request.json
     if not data.get('content'):
@@ -442,9 +576,19 @@ def get_comments(user, grievance_id):
     if not grievance:
         return jsonify({"error": "Grievance not found"}), 404
     
-    comments = db.get_grievance_comments(grievance_id)
+    # ?since=<next_cursor> for new comments only; ?before=<prev_cursor> for older ones
+    try:
+        page = db.get_comment_page(
+            grievance_id,
+            since=request.args.get('since'),
+            before=request.args.get('before'),
+            limit=int(request.args.get('limit', db.COMMENT_PAGE_SIZE)),
+            archived=grievance.get('archived', False)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    return jsonify({"comments": comments}), 200
+    return jsonify(page), 200
 
 @app.route('/images/<path:filename>', methods=['GET'])
 def get_image(filename):
@@ -474,10 +618,13 @@ def get_image(filename):
 # Attachment routes
 @app.route('/api/grievances/<grievance_id>/attachments', methods=['POST'])
 @token_required
+@admission.admit('upload')
 def upload_attachment(user, grievance_id):
     grievance = db.get_grievance(grievance_id)
     if not grievance:
         return jsonify({"error": "Grievance not found"}), 404
+    if grievance.get('archived'):
+        return jsonify({"error": "Archived grievances are read-only"}), 409
     
     if 'file' not in request.files:
         return jsonify({"error": "No file part"}), 400
@@ -516,9 +663,9 @@ def get_attachments(user, grievance_id):
     if not grievance:
         return jsonify({"error": "Grievance not found"}), 404
     
-    attachments = db.get_grievance_attachments(grievance_id)
+    attachments = db.get_grievance_attachments(grievance_id, as_json=True, archived=grievance.get('archived', False))
     
-    return jsonify({"attachments": attachments}), 200
+    return jsonfast.response(app, {"attachments": attachments})
 
 @app.route('/api/uploads/<filename>', methods=['GET'])
 @token_required
@@ -527,77 +674,32 @@ def download_file(user, filename):
 
 @app.route('/api/statistics', methods=['GET'])
 @token_required
+@admission.admit('statistics')
 def get_statistics(user):
-    conn = db.get_db_connection()
-    
     try:
-        # Safely extract user details
-        user_id = user.get('id')
-        user_role = user.get('role', '').lower()
-        
-        # Determine base query condition
-        if user_role == 'admin':
-            base_query = '1=1'
-            params = ()
-        else:
-            base_query = 'submitted_by = ?'
-            params = (user_id,)
-        
-        # Total grievances
-        total_query = conn.execute(f'''
-            SELECT COUNT(*) as count 
-            FROM grievances 
-            WHERE {base_query}
-        ''', params).fetchone()['count']
-        
-        # Grievances by status
-        status_counts = conn.execute(f'''
-            SELECT status, COUNT(*) as count 
-            FROM grievances 
-            WHERE {base_query}
-            GROUP BY status
-        ''', params).fetchall()
-        
-        # Grievances by category
-        category_counts = conn.execute(f'''
-            SELECT category, COUNT(*) as count 
-            FROM grievances 
-            WHERE {base_query}
-            GROUP BY category
-        ''', params).fetchall()
-        
-        # Grievances by priority
-        priority_counts = conn.execute(f'''
-            SELECT priority, COUNT(*) as count 
-            FROM grievances 
-            WHERE {base_query}
-            GROUP BY priority
-        ''', params).fetchall()
-        
-        # Recent grievances
-        recent = conn.execute(f'''
-            SELECT id, title, status, priority, created_at
-            FROM grievances
-            WHERE {base_query}
-            ORDER BY created_at DESC
-            LIMIT 5
-        ''', params).fetchall()
-        
-        return jsonify({
-            "total_grievances": total_query,
-            "by_status": [dict(item) for item in status_counts],
-            "by_category": [dict(item) for item in category_counts],
-            "by_priority": [dict(item) for item in priority_counts],
-            "recent_grievances": [dict(item) for item in recent]
-        }), 200
+        # Admins see everything, everyone else their own grievances
+        submitted_by = None if user.get('role', '').lower() == 'admin' else user.get('id')
+        return jsonify(db.get_grievance_statistics(submitted_by)), 200
     
     except Exception as e:
         # Log the error 
         print(f"Error in get_statistics: {e}")
         return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/api/statistics/sla', methods=['GET'])
+@token_required
+@admission.admit('statistics')
+def get_sla_statistics(user):
+    """Resolution and time-in-status percentiles, read from maintained aggregates"""
+    if user.get('role', '').lower() not in ['admin', 'manager', 'staff']:
+        return jsonify({"error": "Unauthorized to view SLA statistics"}), 403
     
+    conns = [db.get_shard_connection(shard) for shard in db.shard_ids()]
+    try:
+        return jsonify(sla.summary(conns)), 200
     finally:
-        conn.close()
+        for conn in conns:
+            conn.close()
 
 @app.route('/api/users/<user_id>', methods=['PUT'])
 @token_required
@@ -616,7 +718,6 @@ def update_profile(current_user, user_id):
 @app.route("/forgot/<id>", methods=["POST"])
 def forgot_password(id):
     data = request.get_json()
-    print(data)
     user = db.get_user_by_id(id)
     if not user:
         return jsonify({"error": "User not found"}), 404
@@ -647,6 +748,8 @@ def send_email_about_status(recipient_email, grievance_id, emailType="resolved")
     email_password = os.environ.get("EMAIL_PASSWORD") # Get password from environment variable
 
     subject = "Your Grievance is Resolved"
+    if emailType == "escalated":
+        subject = "Grievance Escalated: SLA Deadline Missed"
 
     # read the grievance from the database
 
@@ -759,7 +862,7 @@ def send_email_about_status(recipient_email, grievance_id, emailType="resolved")
             </head>
             <body>
                 <div class="container">
-                    <h2>Your Grievance is Resolved</h2>
+                    <h2>{subject}</h2>
                     <p><strong>Title:</strong> {title}</p>
                     <p><strong>Description:</strong> {description}</p>
                     <div class="footer">
@@ -772,7 +875,7 @@ def send_email_about_status(recipient_email, grievance_id, emailType="resolved")
 
     print(recipient_email)
 
-    msg = EmailMessage()
+    msg = providers.get('email.message').EmailMessage()
     msg["Subject"] = subject
     msg["From"] = email_address
     msg["To"] = recipient_email
@@ -780,7 +883,8 @@ def send_email_about_status(recipient_email, grievance_id, emailType="resolved")
     msg.add_alternative(body, subtype="html")  # HTML content
 
     try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
+        smtplib = providers.get('smtplib')
+        with metrics.track('smtp'), smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
             smtp.login(email_address, email_password)
             smtp.send_message(msg)
         print("Test email sent successfully!")
@@ -788,47 +892,20 @@ def send_email_about_status(recipient_email, grievance_id, emailType="resolved")
         print(f"Error sending email: {e}")
 
 
-# Authentication decorator
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = None
-        
-        # Check for token in Authorization header
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split(' ')[1]
-        
-        if not token:
-            return jsonify({
-                'error': 'Token is missing',
-                'status': 'error'
-            }), 401
-        
-        try:
-            # Verify token
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user = {
-                'id': data['id'],
-                'name': data['name'],
-                'email': data['email'],
-                'role': data['role']
-            }
-        except jwt.ExpiredSignatureError:
-            return jsonify({
-                'error': 'Token has expired',
-                'status': 'error'
-            }), 401
-        except jwt.InvalidTokenError:
-            return jsonify({
-                'error': 'Invalid token',
-                'status': 'error'
-            }), 401
-        
-        return f(current_user, *args, **kwargs)
-    
-    return decorated
+@scheduler.on_escalation
+def notify_escalation(grievance):
+    """Email the assignee of an escalated grievance, or the department's managers if unassigned"""
+    if grievance.get('assigned_to'):
+        assignee = db.get_user_by_id(grievance['assigned_to'])
+        recipients = [assignee['email']] if assignee else []
+    else:
+        recipients = [u['email'] for u in db.get_users_by_department(grievance.get('submitter_department'))
+                      if u['role'] == 'manager']
+    for email in recipients:
+        # Off the scheduler thread, so the next deadline still fires on time
+        threading.Thread(target=send_email_about_status, args=(email, grievance['id'], "escalated"),
+                         daemon=True).start()
+
 
 # API Endpoints for Feedback
 @app.route('/api/feedback', methods=['POST'])
@@ -862,44 +939,19 @@ def create_feedback(current_user):
                 'status': 'error'
             }), 400
         
-        # Generate unique ID
-        feedback_id = str(uuid.uuid4())
-        
-        # Current timestamp
-        now = datetime.now().isoformat()
-        
-        # Insert feedback into database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-        INSERT INTO feedback (id, user_id, user_name, message, rating, category, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            feedback_id,
-            current_user['id'],
+        feedback, error = db.create_feedback(
             current_user['name'],
-            data['message'],
+            current_user['id'],
             data['rating'],
             data['category'],
-            now,
-            now
-        ))
-        
-        conn.commit()
-        conn.close()
+            data['message']
+        )
+        if error:
+            return jsonify({'error': error, 'status': 'error'}), 500
         
-        # Return the created feedback
         return jsonify({
             'status': 'success',
-            'feedback': {
-                'id': feedback_id,
-                'userId': current_user['id'],
-                'userName': current_user['name'],
-                'message': data['message'],
-                'rating': data['rating'],
-                'category': data['category'],
-                'createdAt': now
-            }
+            'feedback': feedback
         }), 201
     
     except Exception as e:
@@ -913,66 +965,52 @@ def create_feedback(current_user):
 @app.route('/api/feedback', methods=['GET'])
 @token_required
 def get_feedback(current_user):
-    """Get all feedback entries with optional filtering"""
+    """Feedback entries, newest first, a page at a time.
+
+    ?category= and ?rating= filter, ?fields=id,rating,... projects, ?limit=
+    sets the page size and ?cursor=<next_cursor> fetches the following page.
+    """
     try:
-        # Get query parameters
         category = request.args.get('category')
         rating = request.args.get('rating')
+        fields = request.args.get('fields')
         
-        # Build query
-        query = "SELECT * FROM feedback"
-        params = []
-        
-        # Add WHERE clauses if filters are provided
-        where_clauses = []
-        
+        filters = {}
         if category and category != 'all':
-            where_clauses.append("category = ?")
-            params.append(category)
-        
+            filters['category'] = category
         if rating:
-            where_clauses.append("rating = ?")
-            params.append(int(rating))
+            filters['rating'] = int(rating)
         
-        # Add role-based filtering
         # Admin and managers can see all feedback
         # Regular users can only see their own feedback
         if current_user['role'] not in ['admin', 'manager']:
-            where_clauses.append("user_id = ?")
-            params.append(current_user['id'])
-        
-        # Combine WHERE clauses if any
-        if where_clauses:
-            query += " WHERE " + " AND ".join(where_clauses)
+            filters['userId'] = current_user['id']
         
-        # Add order by created_at desc
-        query += " ORDER BY created_at DESC"
-        
-        # Execute query
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        
-        # Get results
-        feedback_rows = cursor.fetchall()
-        conn.close()
-        
-        # Convert to list of dictionaries
-        feedback_list = []
-        for row in feedback_rows:
-            feedback_list.append({
-                'id': row['id'],
-                'userId': row['user_id'],
-                'userName': row['user_name'],
-                'message': row['message'],
-                'rating': row['rating'],
-                'category': row['category'],
-                'createdAt': row['created_at']
-            })
+        if fields:
+            fields = [field.strip() for field in fields.split(',') if field.strip()]
+            unknown = [field for field in fields if field not in db.FEEDBACK_FIELDS]
+            if unknown:
+                return jsonify({
+                    'error': f'Unknown fields: {", ".join(unknown)}. Must be among: {", ".join(db.FEEDBACK_FIELDS)}',
+                    'status': 'error'
+                }), 400
         
-        return jsonify({
-            'status': 'success',
-            'feedback': feedback_list
+        try:
+            feedback, next_cursor = db.get_feedback_page(
+                filters,
+                cursor=request.args.get('cursor'),
+                limit=int(request.args.get('limit', db.FEEDBACK_PAGE_SIZE)),
+                fields=fields,
+                as_json='stream'
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 400
+        
+        # Rows are encoded by SQLite and streamed as they are read
+        return jsonfast.response(app, {
+            'status': jsonfast.dumps('success'),
+            'next_cursor': jsonfast.dumps(next_cursor),
+            'feedback': feedback
         })
     
     except Exception as e:
@@ -988,50 +1026,9 @@ def get_feedback(current_user):
 def get_feedback_statistics(current_user):
     """Get statistics about feedback"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get total count
-        cursor.execute("SELECT COUNT(*) as total FROM feedback")
-        total_count = cursor.fetchone()['total']
-        
-        # Get average rating
-        cursor.execute("SELECT AVG(rating) as avg_rating FROM feedback")
-        avg_rating_row = cursor.fetchone()
-        avg_rating = round(avg_rating_row['avg_rating'], 1) if avg_rating_row['avg_rating'] is not None else 0
-        
-        # Get category counts
-        cursor.execute("""
-        SELECT category, COUNT(*) as count 
-        FROM feedback 
-        GROUP BY category
-        ORDER BY count DESC
-        """)
-        category_counts = {}
-        for row in cursor.fetchall():
-            category_counts[row['category']] = row['count']
-        
-        # Get rating distribution
-        cursor.execute("""
-        SELECT rating, COUNT(*) as count 
-        FROM feedback 
-        GROUP BY rating
-        ORDER BY rating
-        """)
-        rating_distribution = {}
-        for row in cursor.fetchall():
-            rating_distribution[row['rating']] = row['count']
-        
-        conn.close()
-        
         return jsonify({
             'status': 'success',
-            'statistics': {
-                'totalCount': total_count,
-                'averageRating': avg_rating,
-                'categoryCount': category_counts,
-                'ratingDistribution': rating_distribution
-            }
+            'statistics': db.get_feedback_statistics()
         })
     
     except Exception as e:
@@ -1062,7 +1059,7 @@ def get_feedback_by_id(current_user, feedback_id):
             }), 404
         
         # Check permission - only admins, managers, or the owner can view
-        if current_user['role'] not in ['admin', 'manager'] and current_user['id'] != feedback['user_id']:
+        if current_user['role'] not in ['admin', 'manager'] and current_user['id'] != feedback['userId']:
             return jsonify({
                 'error': 'Permission denied',
                 'status': 'error'
@@ -1070,15 +1067,7 @@ def get_feedback_by_id(current_user, feedback_id):
         
         return jsonify({
             'status': 'success',
-            'feedback': {
-                'id': feedback['id'],
-                'userId': feedback['user_id'],
-                'userName': feedback['user_name'],
-                'message': feedback['message'],
-                'rating': feedback['rating'],
-                'category': feedback['category'],
-                'createdAt': feedback['created_at']
-            }
+            'feedback': dict(feedback)
         })
     
     except Exception as e:
@@ -1110,7 +1099,7 @@ def update_feedback(current_user, feedback_id):
             }), 404
         
         # Check permission - only admins, managers, or the owner can update
-        if current_user['role'] not in ['admin', 'manager'] and current_user['id'] != feedback['user_id']:
+        if current_user['role'] not in ['admin', 'manager'] and current_user['id'] != feedback['userId']:
             conn.close()
             return jsonify({
                 'error': 'Permission denied',
@@ -1152,9 +1141,6 @@ def update_feedback(current_user, feedback_id):
                 'message': 'No changes made'
             })
         
-        # Add updated_at timestamp
-        updates['updated_at'] = datetime.now().isoformat()
-        
         # Build update query
         query = "UPDATE feedback SET "
         query += ", ".join([f"{key} = ?" for key in updates.keys()])
@@ -1171,16 +1157,7 @@ def update_feedback(current_user, feedback_id):
         
         return jsonify({
             'status': 'success',
-            'feedback': {
-                'id': updated_feedback['id'],
-                'userId': updated_feedback['user_id'],
-                'userName': updated_feedback['user_name'],
-                'message': updated_feedback['message'],
-                'rating': updated_feedback['rating'],
-                'category': updated_feedback['category'],
-                'createdAt': updated_feedback['created_at'],
-                'updatedAt': updated_feedback['updated_at']
-            }
+            'feedback': dict(updated_feedback)
         })
     
     except Exception as e:
@@ -1210,7 +1187,7 @@ def delete_feedback(current_user, feedback_id):
             }), 404
         
         # Check permission - only admins, managers, or the owner can delete
-        if current_user['role'] not in ['admin', 'manager'] and current_user['id'] != feedback['user_id']:
+        if current_user['role'] not in ['admin', 'manager'] and current_user['id'] != feedback['userId']:
             conn.close()
             return jsonify({
                 'error': 'Permission denied',
@@ -1237,4 +1214,7 @@ def delete_feedback(current_user, feedback_id):
 
 
 if __name__ == '__main__':
-    app.run(host="0.0.0.0",port=5000,debug=True)
\ No newline at end of file
+    # Development server; use server.py for production. With debug on, the
+    # reloader re-runs this file in a child process, which is the one serving,
+    # so only that one warms up and starts the scheduler
+    create_app(warm=os.environ.get('WERKZEUG_RUN_MAIN') == 'true').run(host="0.0.0.0",port=5000,debug=True)
\ No newline at end of file
@@ -0,0 +1,160 @@
+"""Move old Closed/Resolved grievances into the archive database.
+
+Grievances whose status is Closed or Resolved and that haven't been updated
+for the retention window are copied, with their comments, attachment rows
+and field history (grievance_events), into a separate SQLite file
+(db.archive_path()) and deleted from the main one, a batch per transaction,
+so the hot B-trees that writes and statistics touch stay bounded. Reads fall
+through: db.get_grievance and the comment/attachment readers look in the
+archive when a grievance isn't in the main file, and listings and search
+read both unless the caller opts out (include_archived=False, ?archived=0).
+Statistics, facets and sla.py --rebuild only count the main file.
+
+    python archive.py                  # default retention (ARCHIVE_RETENTION_DAYS, 365)
+    python archive.py --days 180 --batch 500 --dry-run
+
+With sharded storage (db.py) each shard has its own archive file next to it
+(db.archive_path(shard)) and the job runs over the shards in turn.
+
+Both files are written in one transaction per batch. In WAL mode that is
+atomic per file only, so a crash can leave a batch in both; rows are copied
+with INSERT OR REPLACE and the main database is read first, so re-running
+the job is safe.
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+import db
+
+ARCHIVED_STATUSES = ('Closed', 'Resolved')
+# (table, column linking it to the grievance)
+TABLES = (('grievances', 'id'), ('comments', 'grievance_id'), ('attachments', 'grievance_id'),
+          ('grievance_events', 'grievance_id'))
+INDEXES = (
+    ('grievances', 'submitted_by, created_at'),
+    ('comments', 'grievance_id, created_at'),
+    ('attachments', 'grievance_id, created_at'),
+    ('grievance_events', 'grievance_id, field'),
+)
+
+
+def retention_days():
+    return int(os.environ.get('ARCHIVE_RETENTION_DAYS', 365))
+
+
+def connect(shard=0):
+    """Shard (main) database connection with its archive attached (created if missing)"""
+    conn = db.open_shard(shard)
+    conn.isolation_level = None  # Batches manage their own transactions
+    conn.execute('ATTACH DATABASE ? AS archive', (db.archive_path(shard),))
+    conn.execute('PRAGMA archive.journal_mode=WAL')
+    return conn
+
+
+def ensure_schema(conn):
+    """Create archive tables mirroring the main ones, adding any newer columns"""
+    for table, _ in TABLES:
+        columns = list(conn.execute(f'PRAGMA main.table_info({table})'))
+        existing = {row[1] for row in conn.execute(f'PRAGMA archive.table_info({table})')}
+        if not existing:
+            definition = ', '.join(
+                f"{row[1]} {row[2]}{' PRIMARY KEY' if row[5] else ''}" for row in columns
+            )
+            conn.execute(f'CREATE TABLE archive.{table} ({definition})')
+        else:
+            for row in columns:
+                if row[1] not in existing:
+                    conn.execute(f'ALTER TABLE archive.{table} ADD COLUMN {row[1]} {row[2]}')
+    for table, columns in INDEXES:
+        name = f"idx_{table}_{columns.split(',')[0]}"
+        conn.execute(f'CREATE INDEX IF NOT EXISTS archive.{name} ON {table} ({columns})')
+
+
+def candidates(conn, cutoff, limit):
+    placeholders = ', '.join('?' for _ in ARCHIVED_STATUSES)
+    return [row[0] for row in conn.execute(
+        f'SELECT id FROM main.grievances WHERE status IN ({placeholders}) AND updated_at < ? LIMIT ?',
+        (*ARCHIVED_STATUSES, cutoff, limit)
+    )]
+
+
+def move_batch(conn, ids):
+    """Copy one batch of grievances and their rows to the archive, then delete them"""
+    moved = {}
+    placeholders = ', '.join('?' for _ in ids)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for table, key in TABLES:
+            columns = ', '.join(row[1] for row in conn.execute(f'PRAGMA main.table_info({table})'))
+            conn.execute(
+                f'INSERT OR REPLACE INTO archive.{table} ({columns}) '
+                f'SELECT {columns} FROM main.{table} WHERE {key} IN ({placeholders})', ids
+            )
+            moved[table] = conn.execute(f'DELETE FROM main.{table} WHERE {key} IN ({placeholders})', ids).rowcount
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return moved
+
+
+def run(days=None, batch_size=500, pause=0.05, dry_run=False):
+    """Archive everything past the retention window; returns counts per table"""
+    days = retention_days() if days is None else days
+    cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+    report = {'cutoff': cutoff, 'batches': 0, 'moved': {table: 0 for table, _ in TABLES}}
+
+    if dry_run:
+        report['eligible'] = 0
+    start = time.perf_counter()
+    try:
+        for shard in db.shard_ids():
+            _run_shard(shard, cutoff, batch_size, pause, dry_run, report)
+    finally:
+        report['seconds'] = round(time.perf_counter() - start, 2)
+    return report
+
+
+def _run_shard(shard, cutoff, batch_size, pause, dry_run, report):
+    conn = connect(shard)
+    try:
+        ensure_schema(conn)
+        if dry_run:
+            placeholders = ', '.join('?' for _ in ARCHIVED_STATUSES)
+            report['eligible'] += conn.execute(
+                f'SELECT COUNT(*) FROM main.grievances WHERE status IN ({placeholders}) AND updated_at < ?',
+                (*ARCHIVED_STATUSES, cutoff)
+            ).fetchone()[0]
+            return
+
+        while True:
+            ids = candidates(conn, cutoff, batch_size)
+            if not ids:
+                break
+            for table, count in move_batch(conn, ids).items():
+                report['moved'][table] += count
+            report['batches'] += 1
+            # Let the writer thread and other processes take the lock between batches
+            time.sleep(pause)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Move old Closed/Resolved grievances to the archive database')
+    parser.add_argument('--days', type=int, default=None, help='Retention window (default ARCHIVE_RETENTION_DAYS or 365)')
+    parser.add_argument('--batch', type=int, default=500, help='Grievances per transaction')
+    parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between batches')
+    parser.add_argument('--dry-run', action='store_true', help='Only count eligible grievances')
+    args = parser.parse_args()
+
+    report = run(args.days, args.batch, args.pause, args.dry_run)
+    print(f"Archive: {', '.join(db.archive_path(shard) for shard in db.shard_ids())}")
+    for key, value in report.items():
+        print(f"  {key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
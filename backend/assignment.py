@@ -0,0 +1,273 @@
+"""Automatic, load-balanced assignment of new grievances.
+
+A new grievance is routed to a department by its category when
+ASSIGNMENT_ROUTES="Category=Department;..." names one, otherwise to the
+submitter's department, and assigned to that department's staff member with
+the fewest open grievances. Departments are free text, so there are no
+default routes; warm_up() warns about routes to departments without staff.
+
+Workloads are kept in memory: per department, a min-heap of (open count,
+staff id). Choosing an assignee is a heap peek plus a push (O(log n)) and
+never queries the database. Counts follow committed changes through
+db.on_change (each change that moves an open grievance between assignees
+carries data['workload'] = [from, to]), and are rebuilt from the database
+every ASSIGNMENT_RESYNC seconds to pick up staff changes and writes made by
+other worker processes.
+
+    python assignment.py                    # show workloads
+    python assignment.py --rebalance        # move unstarted grievances until loads differ by at most one
+    python assignment.py --rebalance --department Health --dry-run
+
+    ASSIGNMENT=0          leave new grievances unassigned
+    ASSIGNMENT_ROUTES     category to department routes, e.g. "Healthcare & Medical Services=Health"
+"""
+import argparse
+import heapq
+import os
+import threading
+import time
+
+import db
+import metrics
+
+RESYNC = float(os.environ.get('ASSIGNMENT_RESYNC', 60))
+
+
+def enabled():
+    return os.environ.get('ASSIGNMENT', '1').lower() not in ('0', 'false', 'off')
+
+
+def _routes():
+    routes = {}
+    for item in os.environ.get('ASSIGNMENT_ROUTES', '').split(';'):
+        if '=' in item:
+            category, department = item.split('=', 1)
+            routes[category.strip()] = department.strip()
+    return routes
+
+
+ROUTES = _routes()
+
+
+class Workload:
+    """Open-grievance counts of one department's staff, least loaded on top.
+
+    Heap entries go stale when a count changes (a fresh one is pushed); stale
+    ones are dropped when they reach the top.
+    """
+
+    def __init__(self, counts):
+        self.counts = dict(counts)
+        self.reserved = {}  # chosen but not yet committed
+        self.heap = [(count, staff) for staff, count in self.counts.items()]
+        heapq.heapify(self.heap)
+
+    def load(self, staff):
+        return self.counts[staff] + self.reserved.get(staff, 0)
+
+    def _push(self, staff):
+        heapq.heappush(self.heap, (self.load(staff), staff))
+        if len(self.heap) > 4 * len(self.counts) + 16:
+            self.heap = [(self.load(s), s) for s in self.counts]
+            heapq.heapify(self.heap)
+
+    def least(self):
+        while self.heap:
+            load, staff = self.heap[0]
+            if staff in self.counts and load == self.load(staff):
+                return staff
+            heapq.heappop(self.heap)
+        return None
+
+    def add(self, staff, delta):
+        self.counts[staff] += delta
+        self._push(staff)
+
+    def reserve(self, staff, delta):
+        self.reserved[staff] = self.reserved.get(staff, 0) + delta
+        self._push(staff)
+
+    def commit(self, staff):
+        """A grievance was assigned to staff: use up a reservation if there is one"""
+        if self.reserved.get(staff):
+            self.reserved[staff] -= 1
+            self.counts[staff] += 1  # Load unchanged, the heap entry stays valid
+        else:
+            self.add(staff, 1)
+
+
+class Engine:
+    def __init__(self):
+        self.departments = {}  # department -> Workload
+        self.staff = {}        # staff id -> department
+        self.loaded_at = None
+        self.lock = threading.Lock()
+        self.loading = threading.Lock()
+
+    def rebuild(self):
+        """Reload staff and open counts from the database"""
+        with self.loading:
+            self._load()
+
+    def _load(self):
+        staff, counts = db.get_workloads()
+        departments = {}
+        for staff_id, department in staff.items():
+            departments.setdefault(department, {})[staff_id] = counts.get(staff_id, 0)
+        with self.lock:
+            previous = self.departments
+            self.departments = {name: Workload(members) for name, members in departments.items()}
+            # Keep choices that haven't been committed yet
+            for name, workload in previous.items():
+                for staff_id, reserved in workload.reserved.items():
+                    if reserved and staff.get(staff_id) == name:
+                        self.departments[name].reserve(staff_id, reserved)
+            self.staff = staff
+            self.loaded_at = time.monotonic()
+
+    def _stale(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > RESYNC
+
+    def choose(self, category, department=None):
+        """Reserve the least loaded staff member for a new grievance; None if there is nobody.
+
+        Call release() if the grievance is then not created.
+        """
+        # One thread reloads; the others carry on with the current counts
+        if self._stale() and self.loading.acquire(blocking=self.loaded_at is None):
+            try:
+                if self._stale():
+                    self._load()
+            finally:
+                self.loading.release()
+        with self.lock:
+            for route, name in (('category', ROUTES.get(category)), ('submitter', department)):
+                workload = self.departments.get(name)
+                staff = workload.least() if workload else None
+                if staff:
+                    workload.reserve(staff, 1)
+                    metrics.inc('assignments_total', (('route', route),))
+                    return staff
+        metrics.inc('assignments_total', (('route', 'none'),))
+        return None
+
+    def release(self, staff):
+        with self.lock:
+            workload = self.departments.get(self.staff.get(staff))
+            if workload and workload.reserved.get(staff):
+                workload.reserve(staff, -1)
+
+    def moved(self, old, new):
+        """An open grievance moved from old to new (either may be None)"""
+        with self.lock:
+            if old in self.staff and self.staff[old] in self.departments:
+                self.departments[self.staff[old]].add(old, -1)
+            if new in self.staff and self.staff[new] in self.departments:
+                self.departments[self.staff[new]].commit(new)
+
+    def snapshot(self):
+        """{department: {staff id: open count}}"""
+        with self.lock:
+            return {name: dict(workload.counts) for name, workload in self.departments.items()}
+
+
+engine = Engine()
+
+
+def choose(category, department=None):
+    if not enabled():
+        return None
+    return engine.choose(category, department)
+
+
+def release(staff):
+    if staff:
+        engine.release(staff)
+
+
+def unknown_routes():
+    """Departments ROUTES sends grievances to that have no staff"""
+    with engine.lock:
+        known = set(engine.departments)
+    return sorted({name for name in ROUTES.values() if name not in known})
+
+
+def warm_up():
+    """Load workloads before taking traffic and warn about routes nobody can take"""
+    if not enabled():
+        return
+    engine.rebuild()
+    for name in unknown_routes():
+        print(f"ASSIGNMENT_ROUTES: no staff in department {name!r}, its grievances go to the submitter's department")
+
+
+@db.on_change
+def _changed(kind, grievance_id, data):
+    if 'workload' in data and engine.loaded_at is not None:
+        engine.moved(*data['workload'])
+
+
+# Rebalancing
+
+def rebalance(department=None, dry_run=False):
+    """Move unstarted (New) grievances from the busiest to the least busy staff of each
+    department until their open counts differ by at most one; returns the moves made"""
+    engine.rebuild()
+    moves = []
+    for name, counts in engine.snapshot().items():
+        if department and name != department:
+            continue
+        lowest = [(count, staff) for staff, count in counts.items()]
+        highest = [(-count, staff) for staff, count in counts.items()]
+        heapq.heapify(lowest)
+        heapq.heapify(highest)
+        movable = {}
+        while lowest and highest:
+            low, target = lowest[0]
+            high, source = -highest[0][0], highest[0][1]
+            if high - low <= 1:
+                break
+            if source not in movable:
+                movable[source] = db.get_movable_grievances(source, high - low)
+            if not movable[source]:
+                heapq.heappop(highest)  # Nothing left that may be moved
+                continue
+            grievance_id = movable[source].pop(0)
+            if not dry_run:
+                _, error = db.update_grievance(grievance_id, {'assigned_to': target}, changed_by='system')
+                if error:
+                    print(f"Could not move {grievance_id}: {error}")
+                    continue
+            moves.append((name, grievance_id, source, target))
+            heapq.heapreplace(lowest, (low + 1, target))
+            heapq.heapreplace(highest, (-(high - 1), source))
+    return moves
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grievance workloads and rebalancing')
+    parser.add_argument('--rebalance', action='store_true', help='Even out open grievances within departments')
+    parser.add_argument('--department', help='Only this department')
+    parser.add_argument('--dry-run', action='store_true', help='Show the moves without making them')
+    args = parser.parse_args()
+
+    if args.rebalance:
+        moves = rebalance(args.department, args.dry_run)
+        for name, grievance_id, source, target in moves:
+            print(f"{name}: {grievance_id} {source} -> {target}")
+        print(f"{len(moves)} grievances {'would be ' if args.dry_run else ''}moved")
+        if not args.dry_run:
+            db.shutdown()
+
+    engine.rebuild()
+    for name in unknown_routes():
+        print(f"{name}: routed to but no staff")
+    for name, counts in sorted(engine.snapshot().items()):
+        if args.department and name != args.department:
+            continue
+        loads = sorted(counts.values())
+        print(f"{name}: {len(loads)} staff, open min {loads[0]} / max {loads[-1]}" if loads else f"{name}: no staff")
+
+
+if __name__ == '__main__':
+    main()
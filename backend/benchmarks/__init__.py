@@ -0,0 +1,4 @@
+"""Benchmarks for the grievance backend.
+
+Run from the backend directory, e.g. ``python -m benchmarks.login_throughput``.
+"""
@@ -0,0 +1,86 @@
+"""Choosing an assignee: a workload query per insert vs. assignment.py's heaps.
+
+For each data size, times picking the least loaded staff member of a
+department both ways: the query a per-insert implementation would run
+(count every staff member's open grievances) and assignment.choose(), which
+reads in-memory heaps. Each engine choice is released again so loads stay
+put between runs. The engine should stay flat as the table grows:
+
+    python -m benchmarks.auto_assign --sizes 10k,100k,1m
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+import assignment
+import db
+from benchmarks import datagen
+from benchmarks.common import write_report
+from benchmarks.db_micro import fixture, measure
+
+CATEGORY = "Healthcare & Medical Services"
+DEPARTMENT = 'Health'  # the submitter's, unless ASSIGNMENT_ROUTES routes CATEGORY elsewhere
+
+QUERY_PER_INSERT = '''SELECT u.id, COUNT(g.id) AS open FROM users u
+    LEFT JOIN grievances g ON g.assigned_to = u.id AND g.status NOT IN ('Resolved', 'Closed')
+    WHERE u.department = ? AND u.role = 'staff'
+    GROUP BY u.id ORDER BY open LIMIT 1'''
+
+
+def query(department):
+    conn = db.get_db_connection()
+    row = conn.execute(QUERY_PER_INSERT, (department,)).fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+def engine(category, department):
+    assignment.release(assignment.choose(category, department))
+
+
+def run(sizes, fixtures_dir, seed, min_time):
+    report = {'seed': seed, 'results': {}}
+    original = db.DATABASE_NAME
+    workdir = tempfile.mkdtemp(prefix='grievance-assign-')
+    try:
+        for scale in sizes:
+            grievances = datagen.SCALES.get(scale.lower()) or int(scale)
+            path = os.path.join(workdir, f'{scale}.db')
+            shutil.copyfile(fixture(fixtures_dir, scale, grievances, seed), path)
+            db.DATABASE_NAME = path
+            db.init_db()
+            assignment.engine.rebuild()
+
+            department = assignment.ROUTES.get(CATEGORY, DEPARTMENT)
+            result = {
+                'staff': len(assignment.engine.snapshot().get(department, {})),
+                'query': measure(query, (department,), path, False, min_time, 3),
+                'engine': measure(engine, (CATEGORY, department), path, False, min_time, 3),
+            }
+            result['speedup'] = round(result['query']['mean_ms'] / result['engine']['mean_ms'], 1)
+            report['results'][scale] = result
+            print(f"{scale:>5} staff {result['staff']:>5} query {result['query']['mean_ms']} ms "
+                  f"engine {result['engine']['mean_ms']} ms ({result['speedup']}x)")
+            os.remove(path)
+    finally:
+        db.DATABASE_NAME = original
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare assignee selection by query and by in-memory heaps')
+    parser.add_argument('--sizes', default='1k,10k,100k', help='Comma separated scales (see benchmarks.datagen)')
+    parser.add_argument('--fixtures', default=os.path.join(tempfile.gettempdir(), 'grievance-fixtures'))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--min-time', type=float, default=2.0, help='Seconds per method and size')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    os.makedirs(args.fixtures, exist_ok=True)
+    write_report(run(args.sizes.split(','), args.fixtures, args.seed, args.min_time), args.output)
+
+
+if __name__ == '__main__':
+    main()
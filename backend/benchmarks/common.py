@@ -0,0 +1,69 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+import db
+
+
+def percentile(samples, pct):
+    """Return the pct-th percentile (0-100) of a list of numbers"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def summarize(latencies, elapsed):
+    """Summarize a list of latencies (seconds) measured over elapsed seconds"""
+    return {
+        'count': len(latencies),
+        'throughput': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+@contextmanager
+def temp_database(path=None):
+    """Point db at a scratch database file for the duration of a benchmark"""
+    workdir = None
+    if path is None:
+        workdir = tempfile.mkdtemp(prefix='grievance-bench-')
+        path = os.path.join(workdir, 'bench.db')
+
+    original = db.DATABASE_NAME
+    db.DATABASE_NAME = path
+    try:
+        db.init_db()
+        yield path
+    finally:
+        db.DATABASE_NAME = original
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+class Timer:
+    """Context manager measuring wall time in seconds"""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def write_report(report, output=None):
+    """Print a report and optionally save it as JSON"""
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
@@ -0,0 +1,286 @@
+"""Seeded synthetic data generator.
+
+Fills a database with realistic users, grievances, comments, attachments and
+feedback through db.bulk_insert:
+
+    python -m benchmarks.datagen --scale 100k --output bench-100k.db
+
+Every run with the same seed and scale produces the same rows. Ids are
+UUIDv7 built from each row's created_at (ids.Generator, with random bits from
+a seeded RNG), as the app makes them. They carry no shard: shards.py --split
+sets those bits when the database is split. All users share the password in
+PASSWORD so the load driver can log in as anyone.
+"""
+import argparse
+import functools
+import os
+import random
+from datetime import datetime, timedelta
+
+import db
+import hashing
+import ids
+import sla
+from benchmarks.common import Timer, write_report
+
+PASSWORD = 'password123'
+
+# Grievance counts; everything else is derived from these
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+CATEGORIES = [
+    "Public Infrastructure & Utilities",
+    "Government Services & Administration",
+    "Consumer Rights & Product Issues",
+    "Workplace & Employment Issues",
+    "Education & Student Concerns",
+    "Healthcare & Medical Services",
+    "Law Enforcement & Justice",
+    "Environmental & Safety Issues",
+    "Housing & Real Estate",
+    "Transportation & Public Safety",
+    "Financial & Banking Issues",
+    "Other",
+]
+PRIORITIES = [('Low', 35), ('Medium', 40), ('High', 18), ('Critical', 7)]
+STATUSES = [('New', 20), ('In Progress', 25), ('Resolved', 30), ('Closed', 25)]
+DEPARTMENTS = ['Public Works', 'Health', 'Education', 'Transport', 'Housing', 'Finance', 'Police', 'Administration']
+FEEDBACK_CATEGORIES = ['usability', 'performance', 'features', 'design', 'other']
+FILE_TYPES = ['jpg', 'png', 'pdf', 'docx', 'txt']
+WORDS = (
+    'road water supply broken street light garbage collection delayed complaint office staff '
+    'response payment refund hospital appointment school fees bus route pothole drainage '
+    'electricity outage noise pollution permit application pending weeks months repeated '
+    'request officer visit no action taken urgent residents affected daily issue area ward'
+).split()
+
+START = datetime(2023, 1, 1)
+SPAN = timedelta(days=730)
+
+
+def counts_for(grievances):
+    return {
+        'users': max(50, grievances // 20),
+        'grievances': grievances,
+        'comments': grievances * 3,
+        'attachments': grievances // 2,
+        'feedback': grievances // 10,
+    }
+
+
+def role_for(index, users):
+    if index == 0:
+        return 'admin'
+    if index < max(2, users // 50):
+        return 'manager'
+    if index < max(5, users // 8):
+        return 'staff'
+    return 'user'
+
+
+def grievance_created_at(index, grievances):
+    """Grievances are spread evenly over SPAN in index order"""
+    return START + SPAN * (index / grievances)
+
+
+def user_created_at(counts, seed):
+    rng = random.Random(f'{seed}-users')
+    return [START - timedelta(days=rng.randint(1, 365)) for _ in range(counts['users'])]
+
+
+def _milliseconds(created):
+    return int(created.timestamp() * 1000)
+
+
+def time_id(rng, created):
+    """Id of a row created at created (a datetime), with random bits from rng"""
+    return ids.Generator(rng).next(_milliseconds(created))
+
+
+@functools.lru_cache(maxsize=4)
+def _ids(kind, grievances, seed):
+    """Ids of every generated user or grievance, in index order"""
+    counts = counts_for(grievances)
+    if kind == 'user':
+        created = user_created_at(counts, seed)
+    else:
+        created = [grievance_created_at(i, grievances) for i in range(grievances)]
+    # One generator, fed in creation order, so rows created in the same millisecond still sort
+    generator = ids.Generator(random.Random(f'{seed}-{kind}-ids'))
+    keys = [None] * len(created)
+    for ms, i in sorted((_milliseconds(value), i) for i, value in enumerate(created)):
+        keys[i] = generator.next(ms)
+    return keys
+
+
+def make_id(kind, index, seed, grievances):
+    """Id of the index-th user or grievance generated at this scale (grievance count)"""
+    return _ids(kind, grievances, seed)[index]
+
+
+def _weighted(rng, choices):
+    return rng.choices([c for c, _ in choices], weights=[w for _, w in choices])[0]
+
+
+def _sentence(rng, low, high):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize() + '.'
+
+
+def user_rows(counts, seed, pwhash):
+    users = _ids('user', counts['grievances'], seed)
+    for i, created in enumerate(user_created_at(counts, seed)):
+        yield (
+            users[i], f'Bench User {i}', f'user{i}@bench.example', pwhash,
+            role_for(i, counts['users']), DEPARTMENTS[i % len(DEPARTMENTS)],
+            created.isoformat(),
+        )
+
+
+def _submitters(counts):
+    """Index range of plain users (the ones who submit grievances)"""
+    first = max(5, counts['users'] // 8)
+    return first, counts['users'] - 1
+
+
+def _staff(counts):
+    return 1, max(5, counts['users'] // 8) - 1
+
+
+def grievance_rows(counts, seed):
+    rng = random.Random(f'{seed}-grievances')
+    submit_lo, submit_hi = _submitters(counts)
+    staff_lo, staff_hi = _staff(counts)
+    n = counts['grievances']
+    users, grievances = _ids('user', n, seed), _ids('grievance', n, seed)
+    for i in range(n):
+        created = grievance_created_at(i, n)
+        status = _weighted(rng, STATUSES)
+        category = rng.choice(CATEGORIES)
+        assigned = users[rng.randint(staff_lo, staff_hi)] if status != 'New' else None
+        has_ai = rng.random() < 0.4
+        # Drawn in the same order as before submitter_department existed
+        title = f'{category.split(" & ")[0]} issue: {_sentence(rng, 3, 7)[:-1]}'
+        description = _sentence(rng, 20, 80)
+        priority = _weighted(rng, PRIORITIES)
+        submitter = rng.randint(submit_lo, submit_hi)
+        yield (
+            grievances[i],
+            title,
+            description,
+            category,
+            priority,
+            status,
+            users[submitter],
+            assigned,
+            _sentence(rng, 10, 25) if has_ai else None,
+            _sentence(rng, 10, 25) if has_ai else None,
+            created.isoformat(),
+            (created + timedelta(hours=rng.randint(0, 24 * 30))).isoformat(),
+            DEPARTMENTS[submitter % len(DEPARTMENTS)],
+            sla.deadline(priority, status, created.isoformat()),
+        )
+
+
+def comment_rows(counts, seed):
+    rng = random.Random(f'{seed}-comments')
+    n = counts['grievances']
+    users, grievances = _ids('user', n, seed), _ids('grievance', n, seed)
+    for i in range(counts['comments']):
+        # A few grievances attract long threads, most have a handful of comments
+        g = int(n * rng.random() ** 2) if rng.random() < 0.3 else rng.randrange(n)
+        created = grievance_created_at(g, n) + timedelta(minutes=rng.randint(1, 60 * 24 * 60))
+        yield (
+            time_id(rng, created),
+            grievances[g],
+            users[rng.randrange(counts['users'])],
+            _sentence(rng, 5, 40),
+            created.isoformat(),
+        )
+
+
+def attachment_rows(counts, seed):
+    rng = random.Random(f'{seed}-attachments')
+    n = counts['grievances']
+    users, grievances = _ids('user', n, seed), _ids('grievance', n, seed)
+    for i in range(counts['attachments']):
+        g = rng.randrange(n)
+        name = f'evidence-{i}.{rng.choice(FILE_TYPES)}'
+        created = grievance_created_at(g, n) + timedelta(minutes=rng.randint(1, 600))
+        attachment_id = time_id(rng, created)
+        yield (
+            attachment_id, grievances[g], name, f'{attachment_id}_{name}',
+            users[rng.randrange(counts['users'])], created.isoformat(),
+        )
+
+
+def feedback_rows(counts, seed):
+    rng = random.Random(f'{seed}-feedback')
+    users = _ids('user', counts['grievances'], seed)
+    for i in range(counts['feedback']):
+        u = rng.randrange(counts['users'])
+        rating = rng.choices([1, 2, 3, 4, 5], weights=[5, 8, 20, 37, 30])[0]
+        category = rng.choice(FEEDBACK_CATEGORIES)
+        message = _sentence(rng, 5, 30)
+        created = START + SPAN * rng.random()
+        yield (time_id(rng, created), f'Bench User {u}', users[u], rating, category, message, created.isoformat())
+
+
+TABLES = [
+    ('users', ('id', 'name', 'email', 'password', 'role', 'department', 'created_at'), user_rows),
+    ('grievances', ('id', 'title', 'description', 'category', 'priority', 'status', 'submitted_by',
+                    'assigned_to', 'ai_summary', 'ai_recommendation', 'created_at', 'updated_at',
+                    'submitter_department', 'due_at'), grievance_rows),
+    ('comments', ('id', 'grievance_id', 'user_id', 'content', 'created_at'), comment_rows),
+    ('attachments', ('id', 'grievance_id', 'file_name', 'file_path', 'uploaded_by', 'created_at'), attachment_rows),
+    ('feedback', ('id', 'userName', 'userId', 'rating', 'category', 'message', 'createdAt'), feedback_rows),
+]
+
+
+def generate(grievances, seed=42):
+    """Populate db.DATABASE_NAME (which must already be initialized)"""
+    counts = counts_for(grievances)
+    pwhash = hashing.hash_password(PASSWORD)
+    report = {'seed': seed, 'counts': counts, 'seconds': {}}
+    for table, columns, rows in TABLES:
+        args = (counts, seed, pwhash) if table == 'users' else (counts, seed)
+        with Timer() as t:
+            db.bulk_insert(table, columns, rows(*args))
+        report['seconds'][table] = round(t.elapsed, 2)
+    # Bulk loading skips the writes that keep the per-grievance counts
+    with Timer() as t:
+        db.recount_activity()
+    report['seconds']['recount_activity'] = round(t.elapsed, 2)
+
+    conn = db.get_db_connection()
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+    return report
+
+
+def sample_users(seed, grievances, role=None, count=20):
+    """Ids of generated users (optionally of one role) for load drivers"""
+    users = counts_for(grievances)['users']
+    picked = [i for i in range(users) if role is None or role_for(i, users) == role]
+    rng = random.Random(f'{seed}-sample')
+    return [make_id('user', i, seed, grievances) for i in rng.sample(picked, min(count, len(picked)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic grievance database')
+    parser.add_argument('--scale', default='10k', help=f'One of {", ".join(SCALES)} or a grievance count')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', required=True, help='Database file to create')
+    args = parser.parse_args()
+
+    grievances = SCALES.get(args.scale.lower()) or int(args.scale)
+    if os.path.exists(args.output):
+        parser.error(f'{args.output} already exists')
+
+    db.DATABASE_NAME = args.output
+    db.init_db()
+    write_report(generate(grievances, args.seed))
+
+
+if __name__ == '__main__':
+    main()
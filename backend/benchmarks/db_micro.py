@@ -0,0 +1,195 @@
+"""Microbenchmarks for individual db.py functions across data sizes.
+
+Each case runs against fixture databases built by benchmarks.datagen (cached
+in --fixtures) in two modes:
+
+    warm  the database file stays in the OS page cache between calls
+    cold  the file's pages are dropped from the page cache before every call
+          (posix_fadvise DONTNEED; Linux only, otherwise reported as warm)
+
+db.py opens a fresh connection per call, so SQLite's own page cache is cold
+in both modes. Reports ops/sec, latency and tracemalloc figures per function:
+
+    python -m benchmarks.db_micro --sizes 1k,10k,100k --output micro.json
+    python -m benchmarks.db_micro --sizes 10k --baseline micro.json   # exit 1 on regressions
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import db
+from benchmarks import datagen
+from benchmarks.common import percentile, write_report
+
+
+def _cases(seed, grievances):
+    """(name, function, args, writes) for every benchmarked call"""
+    def user(role):
+        return datagen.sample_users(seed, grievances, role, 1)[0]
+
+    admin, manager, staff, plain = user('admin'), user('manager'), user('staff'), user('user')
+    # Index 0 attracts the longest comment thread in the generated data
+    popular = datagen.make_id('grievance', 0, seed, grievances)
+    some = datagen.make_id('grievance', grievances // 2, seed, grievances)
+
+    return [
+        ('get_user_grievances:admin', db.get_user_grievances, (admin, 'admin'), False),
+        ('get_user_grievances:manager', db.get_user_grievances, (manager, 'manager'), False),
+        ('get_user_grievances:staff', db.get_user_grievances,
+         (staff, 'staff', 50, 0, False, db.get_user_by_id(staff)['department']), False),
+        ('get_user_grievances:user', db.get_user_grievances, (plain, 'user'), False),
+        ('get_grievances:none', db.get_grievances, ({},), False),
+        ('get_grievances:status', db.get_grievances, ({'status': 'New'},), False),
+        ('get_grievances:status+priority', db.get_grievances, ({'status': 'New', 'priority': 'Critical'},), False),
+        ('get_grievances:category', db.get_grievances, ({'category': 'Other'},), False),
+        ('get_grievances:assigned_to', db.get_grievances, ({'assigned_to': staff},), False),
+        ('get_grievances:submitted_by', db.get_grievances, ({'submitted_by': plain},), False),
+        ('get_grievance_comments:popular', db.get_grievance_comments, (popular,), False),
+        ('get_grievance_comments:typical', db.get_grievance_comments, (some,), False),
+        ('get_comment_page:popular', db.get_comment_page, (popular,), False),
+        ('get_feedback:none', db.get_feedback, ({},), False),
+        ('get_feedback:category+rating', db.get_feedback, ({'category': 'performance', 'rating': 1},), False),
+        ('get_feedback_page:none', db.get_feedback_page, ({},), False),
+        ('get_feedback_page:category', db.get_feedback_page, ({'category': 'performance'},), False),
+        ('get_feedback_page:category+rating', db.get_feedback_page,
+         ({'category': 'performance', 'rating': 1},), False),
+        ('get_feedback_page:user', db.get_feedback_page, ({'userId': plain},), False),
+        ('create_grievance', db.create_grievance, ('Bench', 'Microbenchmark grievance', 'Other', 'Low', plain), True),
+        ('update_grievance', db.update_grievance, (some, {'status': 'In Progress'}), True),
+    ]
+
+
+def _drop_page_cache(path):
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    for name in (path, path + '-wal'):
+        if os.path.exists(name):
+            fd = os.open(name, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+    return True
+
+
+def measure(fn, args, path, cold, min_time, min_runs):
+    latencies = []
+    deadline = time.perf_counter() + min_time
+    while len(latencies) < min_runs or time.perf_counter() < deadline:
+        if cold:
+            _drop_page_cache(path)
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - start)
+
+    # Allocation figures come from a separate pass so tracing doesn't skew timings
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    result = fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    del result
+
+    total = sum(latencies)
+    return {
+        'runs': len(latencies),
+        'ops_per_sec': round(len(latencies) / total, 1) if total else 0.0,
+        'mean_ms': round(total / len(latencies) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'peak_kib': round(peak / 1024, 1),
+        'retained_blocks': retained,
+    }
+
+
+# Bump when datagen's rows change, so cached fixtures are generated again
+FIXTURE_VERSION = 2
+
+
+def fixture(fixtures_dir, scale, grievances, seed):
+    """Return the path of a cached fixture database, generating it if needed"""
+    path = os.path.join(fixtures_dir, f'fixture-{scale}-{seed}-v{FIXTURE_VERSION}.db')
+    if not os.path.exists(path):
+        print(f'Generating {path} ...')
+        db.DATABASE_NAME = path
+        db.init_db()
+        datagen.generate(grievances, seed)
+    return path
+
+
+def run(sizes, fixtures_dir, seed, modes, min_time, min_runs, only=None):
+    report = {'settings': {'seed': seed, 'modes': modes, 'min_time': min_time}, 'results': {}}
+    original = db.DATABASE_NAME
+    workdir = tempfile.mkdtemp(prefix='grievance-micro-')
+    try:
+        for scale in sizes:
+            grievances = datagen.SCALES.get(scale.lower()) or int(scale)
+            source = fixture(fixtures_dir, scale, grievances, seed)
+            # Always run on a scratch copy: migrations and write cases must not touch the fixture
+            path = os.path.join(workdir, f'{scale}.db')
+            shutil.copyfile(source, path)
+            db.DATABASE_NAME = path
+            db.init_db()
+
+            for name, fn, args, writes in _cases(seed, grievances):
+                if only and not any(name.startswith(o) for o in only):
+                    continue
+                for mode in modes:
+                    result = measure(fn, args, path, mode == 'cold', min_time, min_runs)
+                    report['results'].setdefault(name, {}).setdefault(scale, {})[mode] = result
+                    print(f"{name:36} {scale:>5} {mode:5} {result['ops_per_sec']:>10} ops/s")
+            os.remove(path)
+    finally:
+        db.DATABASE_NAME = original
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def regressions(report, baseline, tolerance):
+    """Cases whose ops/sec dropped by more than tolerance against a baseline"""
+    found = []
+    for name, scales in report['results'].items():
+        for scale, modes in scales.items():
+            for mode, result in modes.items():
+                old = baseline.get('results', {}).get(name, {}).get(scale, {}).get(mode)
+                if old and result['ops_per_sec'] < old['ops_per_sec'] * (1 - tolerance):
+                    found.append(f"{name} [{scale}, {mode}]: {old['ops_per_sec']} -> {result['ops_per_sec']} ops/s")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark db.py functions across data sizes')
+    parser.add_argument('--sizes', default='1k,10k', help='Comma separated scales (see benchmarks.datagen)')
+    parser.add_argument('--fixtures', default=os.path.join(tempfile.gettempdir(), 'grievance-fixtures'))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--modes', default='warm,cold')
+    parser.add_argument('--min-time', type=float, default=1.0, help='Seconds per case and mode')
+    parser.add_argument('--min-runs', type=int, default=5)
+    parser.add_argument('--only', help='Comma separated case name prefixes')
+    parser.add_argument('--baseline', help='Earlier JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed ops/sec drop (fraction)')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    os.makedirs(args.fixtures, exist_ok=True)
+    report = run(args.sizes.split(','), args.fixtures, args.seed, args.modes.split(','),
+                 args.min_time, args.min_runs, args.only.split(',') if args.only else None)
+    write_report(report, args.output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.tolerance)
+        for line in found:
+            print(f'REGRESSION {line}')
+        raise SystemExit(1 if found else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Primary key locality: random uuid4 keys vs. time-ordered ids (ids.py).
+
+For each key kind, inserts N comment-shaped rows into a fresh database in
+writer-sized transactions and reports rows/sec (overall and for the last
+tenth, when the index is largest), the primary key index's size, page count
+and fill (from dbstat), and the database file size:
+
+    uuid4       str(uuid.uuid4()), what every table used before ids.py
+    uuid7       ids.new_id() as TEXT, what the tables use now
+    uuid7-blob  ids.pack(ids.new_id()), the compact 16-byte form
+
+    python -m benchmarks.id_locality --rows 1000000 --output ids.json
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import uuid
+
+import ids
+from benchmarks.common import write_report
+
+KINDS = {
+    'uuid4': ('TEXT', lambda: str(uuid.uuid4())),
+    'uuid7': ('TEXT', ids.new_id),
+    'uuid7-blob': ('BLOB', lambda: ids.pack(ids.new_id())),
+}
+
+
+def _index_stats(conn):
+    row = conn.execute('''SELECT COUNT(*), SUM(pgsize), SUM(pgsize - unused) FROM dbstat
+                          WHERE name = 'sqlite_autoindex_comments_1' ''').fetchone()
+    pages, size, used = row
+    return {'index_pages': pages, 'index_mb': round(size / 1e6, 1), 'index_fill': round(used / size, 3)}
+
+
+def run_kind(kind, rows, batch, cache_mb, path):
+    column_type, make_id = KINDS[kind]
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(f'PRAGMA cache_size=-{int(cache_mb * 1024)}')
+    conn.execute(f'''CREATE TABLE comments (id {column_type} PRIMARY KEY, grievance_id TEXT NOT NULL,
+                     user_id TEXT NOT NULL, content TEXT NOT NULL, created_at TIMESTAMP)''')
+    sql = 'INSERT INTO comments (id, grievance_id, user_id, content, created_at) VALUES (?, ?, ?, ?, ?)'
+    grievance, user = str(uuid.uuid4()), str(uuid.uuid4())
+    tail_from = rows - rows // 10
+    start = time.perf_counter()
+    tail_start = start
+    done = 0
+    while done < rows:
+        if done >= tail_from and tail_start == start:
+            tail_start = time.perf_counter()
+        count = min(batch, rows - done)
+        now = time.strftime('%Y-%m-%dT%H:%M:%S')
+        conn.execute('BEGIN')
+        conn.executemany(sql, ((make_id(), grievance, user, 'Benchmark comment', now) for _ in range(count)))
+        conn.execute('COMMIT')
+        done += count
+    end = time.perf_counter()
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    result = {
+        'rows_per_sec': round(rows / (end - start)),
+        'last_tenth_rows_per_sec': round((rows - tail_from) / (end - tail_start)) if end > tail_start else None,
+        **_index_stats(conn),
+        'file_mb': round(os.path.getsize(path) / 1e6, 1),
+    }
+    conn.close()
+    return result
+
+
+def run(rows, batch, cache_mb, kinds):
+    report = {'rows': rows, 'batch': batch, 'cache_mb': cache_mb, 'results': {}}
+    workdir = tempfile.mkdtemp(prefix='grievance-ids-')
+    try:
+        for kind in kinds:
+            path = os.path.join(workdir, f'{kind}.db')
+            result = run_kind(kind, rows, batch, cache_mb, path)
+            report['results'][kind] = result
+            print(f"{kind:>10} {result['rows_per_sec']:>8} rows/s (last tenth {result['last_tenth_rows_per_sec']}) "
+                  f"index {result['index_mb']} MB, {result['index_pages']} pages, fill {result['index_fill']}")
+            os.remove(path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare insert locality of random and time-ordered keys')
+    parser.add_argument('--rows', type=int, default=1000000, help='Rows inserted per key kind')
+    parser.add_argument('--batch', type=int, default=100, help='Rows per transaction')
+    parser.add_argument('--cache-mb', type=float, default=2.0, help='SQLite page cache per connection (its default is 2)')
+    parser.add_argument('--kinds', default=','.join(KINDS), help='Comma separated key kinds')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    write_report(run(args.rows, args.batch, args.cache_mb, args.kinds.split(',')), args.output)
+
+
+if __name__ == '__main__':
+    main()
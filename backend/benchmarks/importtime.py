@@ -0,0 +1,100 @@
+"""Import-time and memory report for the backend's entry points.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter for
+each module and reports total import time, peak RSS and the heaviest imports,
+so startup regressions (e.g. an eager google.generativeai import) show up:
+
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --modules app,db --top 15 --output imports.json
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+from benchmarks.common import percentile, write_report
+
+_line = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+
+_PROBE = (
+    'import resource, sys, time\n'
+    'start = time.perf_counter()\n'
+    'import {module}\n'
+    'elapsed = time.perf_counter() - start\n'
+    'rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n'
+    'print("RESULT", elapsed, rss, len(sys.modules))\n'
+)
+
+
+def profile(module, cwd):
+    """Import a module in a fresh interpreter and parse the importtime log"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PROBE.format(module=module)],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1] if result.stderr else 'import failed'}
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = _line.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            depth = (len(indent) - 1) // 2
+            imports.append({'name': name, 'self_us': int(self_us), 'cumulative_us': int(cumulative_us), 'depth': depth})
+
+    summary = next(line for line in result.stdout.splitlines() if line.startswith('RESULT'))
+    _, elapsed, rss, modules = summary.split()
+    return {
+        'import_ms': round(float(elapsed) * 1000, 1),
+        'max_rss_kib': int(rss),
+        'modules_loaded': int(modules),
+        'imports': imports,
+    }
+
+
+def direct_imports(imports, module):
+    """Imports made directly by module (importtime lists children before parents)"""
+    end = max(i for i, entry in enumerate(imports) if entry['depth'] == 0 and entry['name'] == module)
+    start = end
+    while start > 0 and imports[start - 1]['depth'] > 0:
+        start -= 1
+    return [entry for entry in imports[start:end] if entry['depth'] == 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report import time of backend modules')
+    parser.add_argument('--modules', default='app,db,admin', help='Comma separated modules to import')
+    parser.add_argument('--top', type=int, default=10, help='Heaviest imports to list per module')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per module (median is reported)')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    report = {}
+    for module in args.modules.split(','):
+        runs = [profile(module, cwd) for _ in range(args.runs)]
+        if 'error' in runs[0]:
+            report[module] = runs[0]
+            continue
+        last = runs[-1]
+        direct = direct_imports(last['imports'], module)
+        report[module] = {
+            'import_ms': round(percentile([r['import_ms'] for r in runs], 50), 1),
+            'max_rss_kib': last['max_rss_kib'],
+            'modules_loaded': last['modules_loaded'],
+            'heaviest_direct': [
+                {'name': i['name'], 'cumulative_ms': round(i['cumulative_us'] / 1000, 1)}
+                for i in sorted(direct, key=lambda i: i['cumulative_us'], reverse=True)
+            ][:args.top],
+            'heaviest_self': [
+                {'name': i['name'], 'self_ms': round(i['self_us'] / 1000, 1)}
+                for i in sorted(last['imports'], key=lambda i: i['self_us'], reverse=True)
+            ][:args.top],
+        }
+    write_report(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
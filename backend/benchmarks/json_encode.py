@@ -0,0 +1,78 @@
+"""List-response serialization: dict rows + jsonify vs. direct row JSON.
+
+Compares, for several page sizes of /api/grievances-style responses:
+
+    dicts+stdlib   dict(row) per row, jsonify with Flask's default provider (old path)
+    dicts+fast     dict(row) per row, jsonify with jsonfast.FastJSONProvider
+    direct         db as_json=True (SQLite json_object) + jsonfast.response
+    stream         db as_json='stream', response body consumed chunk by chunk
+
+    python -m benchmarks.json_encode --rows 50,500,5000
+"""
+import argparse
+import time
+
+from flask.json.provider import DefaultJSONProvider
+
+import db
+import jsonfast
+from benchmarks import datagen
+from benchmarks.common import temp_database, write_report
+
+
+def _time(fn, min_time):
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time and runs >= 3:
+            return round(elapsed / runs * 1000, 3)
+
+
+def run(rows_list, min_time):
+    import app as app_module
+    flask_app = app_module.app
+    stdlib = DefaultJSONProvider(flask_app)
+    fast = jsonfast.FastJSONProvider(flask_app)
+
+    report = {'orjson': jsonfast.orjson is not None, 'ms_per_response': {}}
+    with flask_app.app_context():
+        for rows in rows_list:
+            def dicts_stdlib():
+                return stdlib.response({"grievances": db.get_grievances({}, rows)}).get_data()
+
+            def dicts_fast():
+                return fast.response({"grievances": db.get_grievances({}, rows)}).get_data()
+
+            def direct():
+                return jsonfast.response(flask_app, {"grievances": db.get_grievances({}, rows, as_json=True)}).get_data()
+
+            def stream():
+                response = jsonfast.response(flask_app, {"grievances": db.get_grievances({}, rows, as_json='stream')})
+                return sum(len(chunk) for chunk in response.response)
+
+            results = {fn.__name__: _time(fn, min_time) for fn in (dicts_stdlib, dicts_fast, direct, stream)}
+            results['speedup_direct'] = round(results['dicts_stdlib'] / results['direct'], 2)
+            report['ms_per_response'][str(rows)] = results
+            print(rows, results)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare list serialization paths')
+    parser.add_argument('--rows', default='50,500,5000', help='Comma separated page sizes')
+    parser.add_argument('--min-time', type=float, default=1.0)
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    rows_list = [int(r) for r in args.rows.split(',')]
+    with temp_database():
+        datagen.generate(max(rows_list) * 2)
+        report = run(rows_list, args.min_time)
+    write_report(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
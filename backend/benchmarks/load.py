@@ -0,0 +1,272 @@
+"""End-to-end HTTP load driver.
+
+Exercises login, listing, filtering, detail, update, comment, statistics and
+feedback routes at a configurable concurrency and writes per-route
+p50/p95/p99 latency, throughput and response status counts as JSON, so runs
+can be diffed (routes that answered anything but 2xx are also printed):
+
+    python -m benchmarks.datagen --scale 10k --output bench-10k.db
+    python -m benchmarks.load --database bench-10k.db --scale 10k --threads 16 --output before.json
+
+By default requests go through the Flask test client (no sockets). With
+--server a local threaded WSGI server is started and driven over HTTP.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+from benchmarks import datagen
+from benchmarks.common import summarize, write_report
+
+# route name -> relative weight in the request mix
+DEFAULT_MIX = {
+    'login': 2,
+    'list': 25,
+    'filter': 15,
+    'detail': 25,
+    'update': 5,
+    'comment': 8,
+    'statistics': 10,
+    'feedback': 10,
+}
+
+
+class TestClientTransport:
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def request(self, method, path, body=None, headers=None):
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_data()
+
+
+class HTTPTransport:
+    def __init__(self, host, port):
+        self.conn = http.client.HTTPConnection(host, port, timeout=30)
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.conn.request(method, path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+        except (http.client.HTTPException, ConnectionError):
+            # The server closed the keep-alive connection; reconnect once
+            self.conn.close()
+            self.conn.request(method, path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+        return response.status, response.read()
+
+
+class Scenario:
+    """Builds one request per call according to the weighted mix"""
+
+    def __init__(self, app_module, seed, grievances, mix):
+        import db
+
+        self.mix_names = list(mix)
+        self.mix_weights = [mix[name] for name in self.mix_names]
+        self.grievances = grievances
+        self.seed = seed
+
+        admins = datagen.sample_users(seed, grievances, 'admin', 1)
+        users = datagen.sample_users(seed, grievances, 'user', 10)
+        self.tokens = {
+            role: [app_module.generate_token(uid) for uid in datagen.sample_users(seed, grievances, role, 10)]
+            for role in ('staff', 'manager')
+        }
+        self.tokens['user'] = [app_module.generate_token(uid) for uid in users]
+        self.tokens['admin'] = [app_module.generate_token(uid) for uid in admins]
+        self.users = datagen.counts_for(grievances)['users']
+        # Plain users may only update their own grievances: (token, [grievance ids]) per sampled user
+        self.owners = []
+        for uid, token in zip(users, self.tokens['user']):
+            own = [row['id'] for row in db.get_user_grievances(uid, 'user', limit=20)]
+            if own:
+                self.owners.append((token, own))
+
+    def next(self, rng):
+        name = rng.choices(self.mix_names, weights=self.mix_weights)[0]
+        role = rng.choices(['user', 'staff', 'manager', 'admin'], weights=[60, 25, 10, 5])[0]
+        headers = {'Authorization': f'Bearer {rng.choice(self.tokens[role])}'}
+        grievance = datagen.make_id('grievance', rng.randrange(self.grievances), self.seed, self.grievances)
+
+        if name == 'login':
+            user = rng.randrange(self.users)
+            return name, 'POST', '/api/users/login', {'email': f'user{user}@bench.example', 'password': datagen.PASSWORD}, None
+        if name == 'list':
+            return name, 'GET', '/api/grievances?limit=50', None, headers
+        if name == 'filter':
+            status = rng.choice(['New', 'In Progress', 'Resolved', 'Closed'])
+            priority = rng.choice(['Low', 'Medium', 'High', 'Critical'])
+            query = urlencode({'status': status, 'priority': priority, 'limit': 50})
+            return name, 'GET', f'/api/grievances/filter?{query}', None, headers
+        if name == 'detail':
+            return name, 'GET', f'/api/grievances/{grievance}', None, headers
+        if name == 'update':
+            if role == 'user':
+                if self.owners:
+                    token, own = rng.choice(self.owners)
+                    headers, grievance = {'Authorization': f'Bearer {token}'}, rng.choice(own)
+                else:
+                    headers = {'Authorization': f'Bearer {rng.choice(self.tokens["staff"])}'}
+            # Only statuses that don't trigger the notification email
+            body = {'status': rng.choice(['New', 'In Progress']), 'priority': rng.choice(['Low', 'Medium', 'High'])}
+            return name, 'PUT', f'/api/grievances/{grievance}', body, headers
+        if name == 'comment':
+            return name, 'POST', f'/api/grievances/{grievance}/comments', {'content': 'Load test comment'}, headers
+        if name == 'statistics':
+            return name, 'GET', '/api/statistics', None, headers
+        return name, 'GET', '/api/feedback', None, headers
+
+
+def _worker(transport, scenario, seed, deadline, max_requests, results, lock, counter):
+    rng = random.Random(seed)
+    local = {}
+    while time.perf_counter() < deadline:
+        with lock:
+            if counter[0] >= max_requests:
+                break
+            counter[0] += 1
+        name, method, path, body, headers = scenario.next(rng)
+        start = time.perf_counter()
+        try:
+            status, data = transport.request(method, path, body, headers)
+            nbytes = len(data)
+        except Exception:
+            status, nbytes = 'error', 0
+        elapsed = time.perf_counter() - start
+        latencies, statuses, sizes = local.setdefault(name, ([], {}, [0]))
+        latencies.append(elapsed)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        sizes[0] += nbytes
+
+    with lock:
+        for name, (latencies, statuses, sizes) in local.items():
+            total = results.setdefault(name, ([], {}, [0]))
+            total[0].extend(latencies)
+            for status, count in statuses.items():
+                total[1][status] = total[1].get(status, 0) + count
+            total[2][0] += sizes[0]
+
+
+def run(database, grievances, threads, duration, max_requests, mix, seed=42, server=False):
+    import app as app_module
+    import db
+
+    db.DATABASE_NAME = database
+    scenario = Scenario(app_module, seed, grievances, mix)
+
+    httpd = None
+    if server:
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class KeepAliveHandler(WSGIRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_request(self, *args):
+                pass
+
+        httpd = make_server('127.0.0.1', 0, app_module.app, threaded=True, request_handler=KeepAliveHandler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        make_transport = lambda: HTTPTransport('127.0.0.1', httpd.server_port)
+    else:
+        make_transport = lambda: TestClientTransport(app_module.app)
+
+    results = {}
+    lock = threading.Lock()
+    counter = [0]
+    deadline = time.perf_counter() + duration
+    workers = [
+        threading.Thread(target=_worker, args=(make_transport(), scenario, seed + i, deadline,
+                                               max_requests, results, lock, counter))
+        for i in range(threads)
+    ]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    if httpd:
+        httpd.shutdown()
+
+    routes = {}
+    all_latencies = []
+    failed = 0
+    for name, (latencies, statuses, sizes) in sorted(results.items()):
+        routes[name] = summarize(latencies, elapsed)
+        routes[name]['statuses'] = statuses
+        routes[name]['non_2xx'] = sum(count for status, count in statuses.items() if not status.startswith('2'))
+        routes[name]['bytes'] = sizes[0]
+        all_latencies.extend(latencies)
+        failed += routes[name]['non_2xx']
+
+    total = summarize(all_latencies, elapsed)
+    total['non_2xx'] = failed
+    return {
+        'settings': {'grievances': grievances, 'threads': threads, 'seed': seed,
+                     'transport': 'http' if server else 'test_client', 'mix': mix},
+        'elapsed_seconds': round(elapsed, 2),
+        'total': total,
+        'routes': routes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive the API with a mixed workload')
+    parser.add_argument('--database', help='Database built by benchmarks.datagen (generated into a temp file if omitted)')
+    parser.add_argument('--scale', default='10k', help='Scale the database was generated with')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--requests', type=int, default=10 ** 9, help='Stop after this many requests')
+    parser.add_argument('--mix', help='JSON object overriding route weights, e.g. \'{"login": 0}\'')
+    parser.add_argument('--server', action='store_true', help='Drive a local WSGI server over HTTP')
+    parser.add_argument('--admission', action='store_true', help='Keep admission control enabled')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    grievances = datagen.SCALES.get(args.scale.lower()) or int(args.scale)
+    mix = dict(DEFAULT_MIX, **json.loads(args.mix)) if args.mix else DEFAULT_MIX
+    if not args.admission:
+        # Rate limits would otherwise dominate the results
+        os.environ['ADMISSION_ENABLED'] = '0'
+
+    workdir = None
+    database = args.database
+    if database is None:
+        import db
+        workdir = tempfile.mkdtemp(prefix='grievance-load-')
+        database = db.DATABASE_NAME = os.path.join(workdir, 'load.db')
+        db.init_db()
+        datagen.generate(grievances, args.seed)
+    else:
+        # Work on a copy so update/comment traffic doesn't change the fixture
+        workdir = tempfile.mkdtemp(prefix='grievance-load-')
+        copy = os.path.join(workdir, 'load.db')
+        shutil.copyfile(database, copy)
+        database = copy
+
+    try:
+        report = run(database, grievances, args.threads, args.duration, args.requests, mix, args.seed, args.server)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    for name, route in report['routes'].items():
+        if route['non_2xx']:
+            print(f"{name}: {route['non_2xx']} of {route['count']} non-2xx {route['statuses']}")
+    write_report(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
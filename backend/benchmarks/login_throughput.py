@@ -0,0 +1,102 @@
+"""Login throughput and its effect on concurrent grievance reads.
+
+Runs a burst of logins alongside readers of /api/grievances and reports
+throughput and latency for both. Compare the hashing pool against inline
+hashing with ``--pool-size 0``:
+
+    python -m benchmarks.login_throughput --pool-size 0
+    python -m benchmarks.login_throughput --pool-size 4
+"""
+import argparse
+import os
+import threading
+import time
+
+from benchmarks.common import summarize, temp_database, write_report
+
+PASSWORD = 'benchmark-password'
+
+
+def _worker(client_factory, request_fn, deadline, latencies, statuses):
+    client = client_factory()
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        status = request_fn(client)
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+
+
+def run(users, login_threads, read_threads, duration):
+    import app as app_module
+    import db
+
+    emails = []
+    for i in range(users):
+        user, error = db.create_user(f'Bench User {i}', f'bench{i}@example.com', PASSWORD, 'user', 'Bench')
+        if error:
+            raise RuntimeError(error)
+        emails.append(user['email'])
+
+    reader = emails[0]
+    reader_id = db.get_user_by_email(reader)['id']
+    for i in range(200):
+        db.create_grievance(f'Grievance {i}', 'Benchmark grievance', 'Other', 'Low', reader_id)
+
+    flask_app = app_module.app
+    token = app_module.generate_token(reader_id)
+    headers = {'Authorization': f'Bearer {token}'}
+    counter = iter(range(10 ** 9))
+
+    def login(client):
+        email = emails[next(counter) % len(emails)]
+        return client.post('/api/users/login', json={'email': email, 'password': PASSWORD}).status_code
+
+    def read(client):
+        return client.get('/api/grievances', headers=headers).status_code
+
+    results = {'login': ([], {}), 'read': ([], {})}
+    deadline = time.perf_counter() + duration
+    threads = []
+    for _ in range(login_threads):
+        threads.append(threading.Thread(target=_worker, args=(flask_app.test_client, login, deadline, *results['login'])))
+    for _ in range(read_threads):
+        threads.append(threading.Thread(target=_worker, args=(flask_app.test_client, read, deadline, *results['read'])))
+
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    report = {}
+    for name, (latencies, statuses) in results.items():
+        report[name] = summarize(latencies, elapsed)
+        report[name]['statuses'] = statuses
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--login-threads', type=int, default=8)
+    parser.add_argument('--read-threads', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--pool-size', type=int, help='PASSWORD_POOL_SIZE (0 hashes inline)')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    if args.pool_size is not None:
+        os.environ['PASSWORD_POOL_SIZE'] = str(args.pool_size)
+
+    import hashing
+    with temp_database():
+        report = run(args.users, args.login_threads, args.read_threads, args.duration)
+    hashing.shutdown()
+
+    report['settings'] = hashing.get_settings()
+    write_report(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
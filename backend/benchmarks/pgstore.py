@@ -0,0 +1,421 @@
+"""PostgreSQL storage backend for the storage suite (see storage.py).
+
+The tables and columns are the SQLite schema's, with ids from ids.py and
+timestamps as ISO text in the "C" collation, so rows come back the same from
+either backend and sort bytewise like SQLite's.
+
+Connections come from a psycopg_pool.ConnectionPool of at most PG_POOL_MAX;
+when all are busy a call waits up to PG_POOL_TIMEOUT for one rather than
+opening more. Each call runs in one transaction on one pooled connection.
+Inserts return their row with RETURNING instead of selecting it again,
+updates lock the row with SELECT ... FOR UPDATE, and exports read through a
+server-side (named) cursor, so a large result stays on the server and
+arrives batch_size rows at a time.
+
+The change feed, SLA aggregates, archive and sharding are SQLite-side
+features with no equivalent here yet. Status history (grievance_events) is
+recorded, so SLA aggregates can be rebuilt from it later.
+
+Needs psycopg 3 and psycopg_pool (pip install "psycopg[binary]" psycopg_pool).
+"""
+import os
+from datetime import datetime
+
+import db
+import hashing
+import ids
+import providers
+import sla
+from benchmarks import storage
+
+ID = 'TEXT COLLATE "C"'
+TIME = 'TEXT COLLATE "C"'
+NOW = """to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS')"""  # SQLite's CURRENT_TIMESTAMP
+
+SCHEMA = (
+    f'''CREATE TABLE IF NOT EXISTS users (
+        id {ID} PRIMARY KEY,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        role TEXT NOT NULL,
+        department TEXT NOT NULL,
+        created_at {TIME} DEFAULT {NOW}
+    )''',
+    f'''CREATE TABLE IF NOT EXISTS grievances (
+        id {ID} PRIMARY KEY,
+        title TEXT NOT NULL,
+        description TEXT NOT NULL,
+        category TEXT NOT NULL,
+        priority TEXT NOT NULL,
+        status TEXT NOT NULL,
+        submitted_by {ID} NOT NULL REFERENCES users (id),
+        assigned_to {ID} REFERENCES users (id),
+        ai_summary TEXT,
+        ai_recommendation TEXT,
+        created_at {TIME} DEFAULT {NOW},
+        updated_at {TIME} DEFAULT {NOW},
+        submitter_department TEXT,
+        due_at {TIME},
+        escalated_at {TIME},
+        comment_count INTEGER NOT NULL DEFAULT 0,
+        attachment_count INTEGER NOT NULL DEFAULT 0,
+        last_activity_at {TIME}
+    )''',
+    f'''CREATE TABLE IF NOT EXISTS comments (
+        id {ID} PRIMARY KEY,
+        grievance_id {ID} NOT NULL REFERENCES grievances (id),
+        user_id {ID} NOT NULL REFERENCES users (id),
+        content TEXT NOT NULL,
+        created_at {TIME} DEFAULT {NOW}
+    )''',
+    f'''CREATE TABLE IF NOT EXISTS attachments (
+        id {ID} PRIMARY KEY,
+        grievance_id {ID} NOT NULL REFERENCES grievances (id),
+        file_name TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        uploaded_by {ID} NOT NULL REFERENCES users (id),
+        created_at {TIME} DEFAULT {NOW}
+    )''',
+    f'''CREATE TABLE IF NOT EXISTS feedback (
+        id {ID} PRIMARY KEY,
+        "userName" TEXT NOT NULL,
+        "userId" {ID} REFERENCES users (id),
+        rating INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        message TEXT NOT NULL,
+        "createdAt" {TIME} DEFAULT {NOW}
+    )''',
+    f'''CREATE TABLE IF NOT EXISTS grievance_events (
+        id BIGSERIAL PRIMARY KEY,
+        grievance_id {ID} NOT NULL,
+        field TEXT NOT NULL,
+        old_value TEXT,
+        new_value TEXT,
+        changed_by {ID},
+        created_at {TIME} NOT NULL
+    )''',
+    # The same listing indexes as the SQLite schema
+    'CREATE INDEX IF NOT EXISTS idx_users_department ON users (department, role)',
+    'CREATE INDEX IF NOT EXISTS idx_grievances_created_at ON grievances (created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_grievances_submitted_by ON grievances (submitted_by, created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_grievances_assigned_to ON grievances (assigned_to, created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_grievances_department ON grievances (submitter_department, created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_grievances_facets ON grievances (status, category, priority)',
+    'CREATE INDEX IF NOT EXISTS idx_grievances_due ON grievances (due_at)',
+    'CREATE INDEX IF NOT EXISTS idx_comments_grievance ON comments (grievance_id, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_attachments_grievance ON attachments (grievance_id, created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_grievance_events_grievance ON grievance_events (grievance_id, field)',
+    'CREATE INDEX IF NOT EXISTS idx_feedback_user ON feedback ("userId", "createdAt")',
+    'CREATE INDEX IF NOT EXISTS idx_feedback_category ON feedback (category, rating, "createdAt")',
+    'CREATE INDEX IF NOT EXISTS idx_feedback_created ON feedback ("createdAt", id)',
+)
+
+
+class PostgresStorage(storage.Storage):
+    """storage.Storage on a bounded psycopg connection pool"""
+
+    name = 'postgres'
+
+    def __init__(self, dsn, min_size=None, max_size=None, timeout=None):
+        if not dsn:
+            raise ValueError("DATABASE_URL is not set")
+        pool = providers.get('psycopg_pool')
+        self.pool = pool.ConnectionPool(
+            dsn,
+            min_size=min_size or int(os.environ.get('PG_POOL_MIN', 1)),
+            max_size=max_size or int(os.environ.get('PG_POOL_MAX', 10)),
+            timeout=timeout or float(os.environ.get('PG_POOL_TIMEOUT', 30)),
+            kwargs={'row_factory': providers.get('psycopg.rows').dict_row},
+            open=True,
+        )
+
+    def init(self):
+        with self.pool.connection() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    def close(self):
+        self.pool.close()
+
+    def _one(self, query, params=()):
+        with self.pool.connection() as conn:
+            return conn.execute(query, params).fetchone()
+
+    def _all(self, query, params=()):
+        with self.pool.connection() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def _write(self, mutation, missing_error):
+        """Run mutation(conn) in one transaction; (row, error) like db._write"""
+        try:
+            with self.pool.connection() as conn:
+                row = mutation(conn)
+        except Exception as e:
+            return None, str(e)
+        if row:
+            return row, None
+        return None, missing_error
+
+    # Users
+
+    def create_user(self, name, email, password, role, department):
+        if self.get_user_by_email(email):
+            return None, "Email already registered"
+        hashed_password = hashing.hash_password(password)
+
+        def mutation(conn):
+            # A concurrent registration of the same email inserts nothing
+            return conn.execute(
+                '''INSERT INTO users (id, name, email, password, role, department)
+                   VALUES (%s, %s, %s, %s, %s, %s) ON CONFLICT (email) DO NOTHING RETURNING *''',
+                (ids.new_id(), name, email, hashed_password, role, department)
+            ).fetchone()
+
+        user, error = self._write(mutation, "Email already registered")
+        if user:
+            user.pop('password')
+        return user, error
+
+    def get_user_by_email(self, email):
+        return self._one('SELECT * FROM users WHERE email = %s', (email,))
+
+    def get_user_by_id(self, user_id):
+        return self._one('SELECT * FROM users WHERE id = %s', (user_id,))
+
+    def get_users_by_department(self, department):
+        return self._all('SELECT id, name, email, role, department FROM users WHERE department = %s', (department,))
+
+    # Grievances
+
+    def create_grievance(self, title, description, category, priority, user_id, ai_summary=None,
+                         ai_recommendation=None, assigned_to=None, department=None):
+        if department is None:
+            user = self.get_user_by_id(user_id)
+            department = user.get('department') if user else None
+
+        def mutation(conn):
+            now = datetime.now().isoformat()
+            row = conn.execute(
+                '''INSERT INTO grievances
+                   (id, title, description, category, priority, status, submitted_by, assigned_to,
+                    ai_summary, ai_recommendation, created_at, updated_at, last_activity_at, due_at, submitter_department)
+                   VALUES (%s, %s, %s, %s, %s, 'New', %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING *''',
+                (ids.new_id(), title, description, category, priority, user_id, assigned_to,
+                 ai_summary, ai_recommendation, now, now, now, sla.deadline(priority, 'New', now), department)
+            ).fetchone()
+            conn.execute(
+                'INSERT INTO grievance_events (grievance_id, field, old_value, new_value, changed_by, created_at) '
+                "VALUES (%s, 'status', NULL, 'New', %s, %s)",
+                (row['id'], user_id, now)
+            )
+            return row
+
+        return self._write(mutation, "Failed to create grievance")
+
+    def get_grievance(self, grievance_id):
+        return self._one('SELECT * FROM grievances WHERE id = %s', (grievance_id,))
+
+    def update_grievance(self, grievance_id, updates, changed_by=None):
+        filtered_updates = {k: v for k, v in updates.items() if k in db.UPDATABLE_FIELDS}
+        if not filtered_updates:
+            return None, "No valid fields to update"
+
+        def mutation(conn):
+            before = conn.execute('SELECT * FROM grievances WHERE id = %s FOR UPDATE', (grievance_id,)).fetchone()
+            if before is None:
+                return None
+            now = datetime.now().isoformat()
+            after = dict(before, **filtered_updates)
+            changes = dict(filtered_updates, updated_at=now, last_activity_at=now)
+            if 'priority' in filtered_updates or 'status' in filtered_updates:
+                changes['due_at'] = sla.deadline(after['priority'], after['status'],
+                                                 after['escalated_at'] or after['created_at'])
+            set_clause = ', '.join(f"{field} = %s" for field in changes)
+            row = conn.execute(f"UPDATE grievances SET {set_clause} WHERE id = %s RETURNING *",
+                               (*changes.values(), grievance_id)).fetchone()
+            events = [(grievance_id, field, before[field], filtered_updates[field], changed_by, now)
+                      for field in db.TRACKED_FIELDS
+                      if field in filtered_updates and filtered_updates[field] != before[field]]
+            if events:
+                conn.cursor().executemany(
+                    'INSERT INTO grievance_events (grievance_id, field, old_value, new_value, changed_by, created_at) '
+                    'VALUES (%s, %s, %s, %s, %s, %s)', events)
+            return row
+
+        return self._write(mutation, "Grievance not found")
+
+    def _filters(self, filters):
+        conditions, params = [], []
+        for key, value in (filters or {}).items():
+            if key in db.GRIEVANCE_FILTERS:
+                conditions.append(f"{key} = %s")
+                params.append(value)
+        return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), params
+
+    def get_grievances(self, filters=None, limit=50, offset=0):
+        where, params = self._filters(filters)
+        return self._all(f'SELECT * FROM grievances{where} ORDER BY created_at DESC LIMIT %s OFFSET %s',
+                         (*params, limit, offset))
+
+    def get_user_grievances(self, user_id, role, limit=50, offset=0, department=None):
+        if role.lower() in ['admin', 'manager']:
+            return self.get_grievances(None, limit, offset)
+        if role.lower() != 'staff':
+            return self.get_grievances({'submitted_by': user_id}, limit, offset)
+        if department is None:
+            user = self.get_user_by_id(user_id)
+            if not user:
+                return []
+            department = user.get('department')
+        # As in db.get_user_grievances: two disjoint indexed branches, each cut to the page's end
+        window = limit + offset
+        return self._all(
+            '''SELECT * FROM (
+                   (SELECT * FROM grievances WHERE assigned_to = %s ORDER BY created_at DESC LIMIT %s)
+                   UNION ALL
+                   (SELECT * FROM grievances
+                    WHERE submitter_department = %s AND status != 'Closed'
+                      AND (assigned_to IS NULL OR assigned_to != %s)
+                    ORDER BY created_at DESC LIMIT %s)
+               ) g
+               ORDER BY g.created_at DESC LIMIT %s OFFSET %s''',
+            (user_id, window, department, user_id, window, limit, offset)
+        )
+
+    def get_grievance_statistics(self, submitted_by=None):
+        where, params = self._filters({'submitted_by': submitted_by} if submitted_by else None)
+        rollup = self._all(f"SELECT {', '.join(db.FACETS)}, COUNT(*) AS n FROM grievances{where} "
+                           f"GROUP BY {', '.join(db.FACETS)}", params)
+        by_facet = {facet: {} for facet in db.FACETS}
+        for row in rollup:
+            for facet in db.FACETS:
+                by_facet[facet][row[facet]] = by_facet[facet].get(row[facet], 0) + row['n']
+        recent = self._all(f'SELECT id, title, status, priority, created_at FROM grievances{where} '
+                           'ORDER BY created_at DESC LIMIT 5', params)
+        return {
+            'total_grievances': sum(row['n'] for row in rollup),
+            **{f'by_{facet}': [{facet: value, 'count': count} for value, count in sorted(counts.items())]
+               for facet, counts in by_facet.items()},
+            'recent_grievances': recent,
+        }
+
+    def export_grievances(self, filters=None, batch_size=storage.EXPORT_BATCH):
+        where, params = self._filters(filters)
+        with self.pool.connection() as conn:
+            # Named, so the result stays on the server and is fetched itersize rows at a time
+            with conn.cursor(name='grievance_export') as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(f'SELECT * FROM grievances{where} ORDER BY created_at', params)
+                yield from cursor
+
+    # Comments and attachments
+
+    def add_comment(self, grievance_id, user_id, content):
+        def mutation(conn):
+            now = datetime.now().isoformat()
+            comment = conn.execute(
+                'INSERT INTO comments (id, grievance_id, user_id, content, created_at) '
+                'VALUES (%s, %s, %s, %s, %s) RETURNING *',
+                (ids.new_id(), grievance_id, user_id, content, now)
+            ).fetchone()
+            conn.execute('UPDATE grievances SET comment_count = comment_count + 1, last_activity_at = %s WHERE id = %s',
+                         (now, grievance_id))
+            return comment
+
+        return self._write(mutation, "Failed to add comment")
+
+    def get_comment_page(self, grievance_id, since=None, before=None, limit=db.COMMENT_PAGE_SIZE):
+        limit = max(1, min(int(limit), db.COMMENT_PAGE_MAX))
+        clauses, params = ['c.grievance_id = %s'], [grievance_id]
+        if since:
+            clauses.append('(c.created_at, c.id) > (%s, %s)')
+            params += db.decode_cursor(since)
+        if before:
+            clauses.append('(c.created_at, c.id) < (%s, %s)')
+            params += db.decode_cursor(before)
+        # Without since, the page is the newest comments (one extra tells whether there are older ones)
+        order = 'ASC' if since else 'DESC'
+        rows = self._all(
+            f'''SELECT c.*, u.name AS user_name FROM comments c LEFT JOIN users u ON u.id = c.user_id
+                WHERE {' AND '.join(clauses)} ORDER BY c.created_at {order}, c.id {order} LIMIT %s''',
+            (*params, limit if since else limit + 1)
+        )
+        if order == 'DESC':
+            rows.reverse()
+        more_before = False
+        if not since and len(rows) > limit:
+            rows = rows[1:]
+            more_before = True
+        return {
+            'comments': rows,
+            'next_cursor': db.encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if rows else since,
+            'prev_cursor': db.encode_cursor(rows[0]['created_at'], rows[0]['id']) if more_before else None,
+            'has_more': bool(since) and len(rows) == limit,
+        }
+
+    def add_attachment(self, grievance_id, file_name, file_path, user_id):
+        def mutation(conn):
+            now = datetime.now().isoformat()
+            attachment = conn.execute(
+                'INSERT INTO attachments (id, grievance_id, file_name, file_path, uploaded_by, created_at) '
+                'VALUES (%s, %s, %s, %s, %s, %s) RETURNING *',
+                (ids.new_id(), grievance_id, file_name, file_path, user_id, now)
+            ).fetchone()
+            conn.execute('UPDATE grievances SET attachment_count = attachment_count + 1, last_activity_at = %s '
+                         'WHERE id = %s', (now, grievance_id))
+            return attachment
+
+        return self._write(mutation, "Failed to add attachment")
+
+    def get_grievance_attachments(self, grievance_id):
+        return self._all('SELECT * FROM attachments WHERE grievance_id = %s ORDER BY created_at DESC', (grievance_id,))
+
+    # Feedback (camelCase columns as in SQLite, hence the quoting)
+
+    def create_feedback(self, user_name, user_id, rating, category, message):
+        def mutation(conn):
+            return conn.execute(
+                'INSERT INTO feedback (id, "userName", "userId", rating, category, message, "createdAt") '
+                'VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING *',
+                (ids.new_id(), user_name, user_id, rating, category, message, datetime.now().isoformat())
+            ).fetchone()
+
+        return self._write(mutation, "Failed to create feedback")
+
+    def get_feedback(self, feedback_id):
+        return self._one('SELECT * FROM feedback WHERE id = %s', (feedback_id,))
+
+    def get_feedback_page(self, filters=None, cursor=None, limit=db.FEEDBACK_PAGE_SIZE):
+        limit = max(1, min(int(limit), db.FEEDBACK_PAGE_MAX))
+        clauses, params = [], []
+        for key in ('userId', 'category', 'rating'):
+            if filters and filters.get(key) is not None:
+                clauses.append(f'"{key}" = %s')
+                params.append(filters[key])
+        if cursor:
+            clauses.append('("createdAt", id) < (%s, %s)')
+            params += db.decode_cursor(cursor)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._all(f'SELECT * FROM feedback{where} ORDER BY "createdAt" DESC, id DESC LIMIT %s',
+                         (*params, limit + 1))
+        next_cursor = db.encode_cursor(rows[limit - 1]['createdAt'], rows[limit - 1]['id']) if len(rows) > limit else None
+        return rows[:limit], next_cursor
+
+    def delete_feedback(self, feedback_id):
+        with self.pool.connection() as conn:
+            return conn.execute('DELETE FROM feedback WHERE id = %s', (feedback_id,)).rowcount > 0
+
+    def get_feedback_statistics(self):
+        with self.pool.connection() as conn:
+            total = conn.execute('SELECT COUNT(*) AS total, AVG(rating) AS average FROM feedback').fetchone()
+            categories = conn.execute(
+                'SELECT category, COUNT(*) AS count FROM feedback GROUP BY category ORDER BY count DESC').fetchall()
+            ratings = conn.execute(
+                'SELECT rating, COUNT(*) AS count FROM feedback GROUP BY rating ORDER BY rating').fetchall()
+        return {
+            'totalCount': total['total'],
+            'averageRating': round(float(total['average']), 1) if total['average'] is not None else 0,
+            'categoryCount': {row['category']: row['count'] for row in categories},
+            'ratingDistribution': {row['rating']: row['count'] for row in ratings},
+        }
@@ -0,0 +1,113 @@
+"""Write throughput by shard count (DB_SHARDS, see db.py).
+
+For each shard count, P processes (like gunicorn workers, each with its own
+writer threads) of T threads create grievances for submitters spread over
+every department and comment on the ones they created, against a fresh
+database, each write waiting for its commit. With one shard every process
+queues for the same file lock; with more, departments on different shards
+commit independently. Reports writes/sec, latency and errors per shard count:
+
+    python -m benchmarks.shard_writes --shards 1,2,4,8 --processes 4 --threads 8 --seconds 5
+"""
+import argparse
+import multiprocessing
+import threading
+import time
+
+import db
+from benchmarks import datagen
+from benchmarks.common import summarize, temp_database, write_report
+
+
+def _worker(users, deadline, latencies, errors):
+    created = []
+    i = 0
+    while time.perf_counter() < deadline:
+        user_id, department = users[i % len(users)]
+        start = time.perf_counter()
+        if i % 2 and created:
+            _, error = db.add_comment(created[i % len(created)], user_id, 'Benchmark comment')
+        else:
+            row, error = db.create_grievance('Bench', 'Shard write grievance', 'Other', 'Low', user_id,
+                                             department=department)
+            if row:
+                created.append(row['id'])
+        latencies.append(time.perf_counter() - start)
+        if error:
+            errors.append(error)
+        i += 1
+
+
+def _process(users, threads, seconds, results):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + seconds
+    workers = [threading.Thread(target=_worker, args=(users[i::threads], deadline, latencies, errors))
+               for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    db.shutdown()
+    results.put((latencies, errors))
+
+
+def measure(processes, threads, seconds, users):
+    # Forked, so the children see the benchmark's db.DATABASE_NAME and db.SHARDS
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [context.Process(target=_process, args=(users[i::processes], threads, seconds, results))
+               for i in range(processes)]
+    start = time.perf_counter()
+    for p in workers:
+        p.start()
+    latencies, errors = [], []
+    for _ in workers:
+        process_latencies, process_errors = results.get()
+        latencies += process_latencies
+        errors += process_errors
+    for p in workers:
+        p.join()
+    result = summarize(latencies, time.perf_counter() - start)
+    result['errors'] = len(errors)
+    if errors:
+        result['first_error'] = errors[0]
+    return result
+
+
+def run(shard_counts, processes, threads, seconds, grievances):
+    report = {'processes': processes, 'threads': threads, 'writes_per_sec': {}}
+    original = db.SHARDS
+    try:
+        for shards in shard_counts:
+            db.SHARDS = shards
+            with temp_database():
+                datagen.generate(grievances)
+                conn = db.get_db_connection()
+                users = [tuple(row) for row in conn.execute(
+                    "SELECT id, department FROM users WHERE role = 'user' ORDER BY department, id")]
+                conn.close()
+                result = measure(processes, threads, seconds, users)
+            report['writes_per_sec'][str(shards)] = result
+            print(f"{shards:>3} shards {result['throughput']:>9} writes/s "
+                  f"p95 {result['p95_ms']} ms errors {result['errors']}")
+    finally:
+        db.SHARDS = original
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare write throughput across shard counts')
+    parser.add_argument('--shards', default='1,2,4,8', help='Comma separated shard counts')
+    parser.add_argument('--processes', type=int, default=4, help='Writing processes')
+    parser.add_argument('--threads', type=int, default=8, help='Writing threads per process')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Duration per shard count')
+    parser.add_argument('--grievances', type=int, default=1000, help='Scale of the generated users (see datagen)')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    shard_counts = [int(s) for s in args.shards.split(',')]
+    write_report(run(shard_counts, args.processes, args.threads, args.seconds, args.grievances), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Staff grievance listing: OR-across-a-join vs. the indexed UNION plan.
+
+Times the first page of db.get_user_grievances(..., 'staff') for a few staff
+users at each data size, next to the query it replaced (a get_user_by_id
+lookup plus JOIN users ... WHERE assigned_to = ? OR u.department = ?).
+Two kinds of staff user are measured: "typical" ones from a department
+whose members submit grievances, and "quiet" ones moved to a department that
+submits none, where the old plan walks most of the table to fill a page. The
+new plan should stay roughly flat as the table grows:
+
+    python -m benchmarks.staff_scope --sizes 10k,100k,1m
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+import db
+from benchmarks import datagen
+from benchmarks.common import write_report
+from benchmarks.db_micro import fixture, measure
+
+QUIET_DEPARTMENT = 'Benchmark (no submitters)'
+
+LEGACY_QUERY = '''SELECT g.* FROM grievances g
+    JOIN users u ON g.submitted_by = u.id
+    WHERE g.assigned_to = ? OR (u.department = ? AND g.status != 'Closed')
+    ORDER BY g.created_at DESC LIMIT ? OFFSET ?'''
+
+
+def legacy(user_id, limit=50, offset=0):
+    """The staff branch as it was before submitter_department"""
+    user = db.get_user_by_id(user_id)
+    conn = db.get_db_connection()
+    rows = conn.execute(LEGACY_QUERY, (user_id, user['department'], limit, offset)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def current(user_id, department, limit=50, offset=0):
+    return db.get_user_grievances(user_id, 'staff', limit, offset, department=department)
+
+
+def run(sizes, fixtures_dir, seed, users, min_time):
+    report = {'seed': seed, 'results': {}}
+    original = db.DATABASE_NAME
+    workdir = tempfile.mkdtemp(prefix='grievance-staff-')
+    try:
+        for scale in sizes:
+            grievances = datagen.SCALES.get(scale.lower()) or int(scale)
+            path = os.path.join(workdir, f'{scale}.db')
+            shutil.copyfile(fixture(fixtures_dir, scale, grievances, seed), path)
+            db.DATABASE_NAME = path
+            db.init_db()  # Adds and backfills submitter_department on older fixtures
+
+            sampled = datagen.sample_users(seed, grievances, 'staff', users * 2)
+            half = len(sampled) // 2
+            quiet = sampled[half:]
+            for uid in quiet:
+                db.update_profile(uid, {'department': QUIET_DEPARTMENT})
+
+            for kind, ids in (('typical', sampled[:half]), ('quiet', quiet)):
+                staff = [db.get_user_by_id(uid) for uid in ids]
+                result = {}
+                for name, fn, args in (
+                    ('legacy', legacy, lambda u: (u['id'],)),
+                    ('union', current, lambda u: (u['id'], u['department'])),
+                ):
+                    runs = [measure(fn, args(u), path, False, min_time / len(staff), 3) for u in staff]
+                    result[name] = {
+                        'mean_ms': round(sum(r['mean_ms'] for r in runs) / len(runs), 3),
+                        'worst_p95_ms': max(r['p95_ms'] for r in runs),
+                    }
+                result['speedup'] = round(result['legacy']['mean_ms'] / result['union']['mean_ms'], 1)
+                report['results'].setdefault(kind, {})[scale] = result
+                print(f'{kind:8} {scale:>5} {result}')
+            os.remove(path)
+    finally:
+        db.DATABASE_NAME = original
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare staff listing query plans across data sizes')
+    parser.add_argument('--sizes', default='1k,10k,100k', help='Comma separated scales (see benchmarks.datagen)')
+    parser.add_argument('--fixtures', default=os.path.join(tempfile.gettempdir(), 'grievance-fixtures'))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--users', type=int, default=5, help='Staff users sampled per size')
+    parser.add_argument('--min-time', type=float, default=2.0, help='Seconds per query plan and size')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    os.makedirs(args.fixtures, exist_ok=True)
+    write_report(run(args.sizes.split(','), args.fixtures, args.seed, args.users, args.min_time), args.output)
+
+
+if __name__ == '__main__':
+    main()
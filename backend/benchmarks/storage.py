@@ -0,0 +1,247 @@
+"""Storage backends for the conformance and performance suite (storage_suite.py).
+
+This is a benchmark adapter, not an app setting: the API calls db.py
+directly, and the change feed, SLA aggregates, archive and sharding only
+exist for SQLite. It measures what moving the user, grievance, comment,
+attachment and feedback operations to PostgreSQL would give.
+
+Storage lists those operations with db.py's contracts: writes return
+(row, error), lookups return a dict or None, and listings return lists of
+dicts, newest first. There are two backends, opened by name with
+open_backend():
+
+    sqlite     SQLiteStorage: db.py itself (writer thread, shards, archive, change feed)
+    postgres   pgstore.PostgresStorage: a bounded psycopg connection pool, RETURNING
+               on inserts and server-side cursors for exports
+
+Configuration (environment):
+
+    DATABASE_URL      PostgreSQL connection string (postgres)
+    PG_POOL_MIN       connections the pool keeps open (default 1)
+    PG_POOL_MAX       most connections it opens (default 10)
+    PG_POOL_TIMEOUT   seconds to wait for a free connection (default 30)
+"""
+import importlib
+import os
+from abc import ABC, abstractmethod
+
+import db
+
+EXPORT_BATCH = 1000
+
+
+class Storage(ABC):
+    """Operations every backend implements"""
+
+    name = None
+
+    @abstractmethod
+    def init(self):
+        """Create the schema if missing"""
+
+    def close(self):
+        """Release connections"""
+
+    # Users
+
+    @abstractmethod
+    def create_user(self, name, email, password, role, department):
+        """(user without password, error); error if the email is taken"""
+
+    @abstractmethod
+    def get_user_by_email(self, email):
+        """The user row (with its password hash), or None"""
+
+    @abstractmethod
+    def get_user_by_id(self, user_id):
+        """The user row, or None"""
+
+    @abstractmethod
+    def get_users_by_department(self, department):
+        """The department's users, without passwords"""
+
+    # Grievances
+
+    @abstractmethod
+    def create_grievance(self, title, description, category, priority, user_id, ai_summary=None,
+                         ai_recommendation=None, assigned_to=None, department=None):
+        """(grievance, error); status New, with its SLA deadline"""
+
+    @abstractmethod
+    def get_grievance(self, grievance_id):
+        """The grievance row, or None"""
+
+    @abstractmethod
+    def update_grievance(self, grievance_id, updates, changed_by=None):
+        """(grievance, error); records status and assignment changes"""
+
+    @abstractmethod
+    def get_grievances(self, filters=None, limit=50, offset=0):
+        """A page of grievances matching db.GRIEVANCE_FILTERS, newest first"""
+
+    @abstractmethod
+    def get_user_grievances(self, user_id, role, limit=50, offset=0, department=None):
+        """A page of the grievances user_id may see in role (see db.get_user_grievances)"""
+
+    @abstractmethod
+    def get_grievance_statistics(self, submitted_by=None):
+        """Counts by status, category and priority"""
+
+    @abstractmethod
+    def export_grievances(self, filters=None, batch_size=EXPORT_BATCH):
+        """Every matching grievance, oldest first, as a generator holding at most
+        batch_size rows in memory"""
+
+    # Comments and attachments
+
+    @abstractmethod
+    def add_comment(self, grievance_id, user_id, content):
+        """(comment, error); bumps the grievance's comment count and last activity"""
+
+    @abstractmethod
+    def get_comment_page(self, grievance_id, since=None, before=None, limit=db.COMMENT_PAGE_SIZE):
+        """Same page shape and cursors as db.get_comment_page"""
+
+    @abstractmethod
+    def add_attachment(self, grievance_id, file_name, file_path, user_id):
+        """(attachment, error); bumps the grievance's attachment count and last activity"""
+
+    @abstractmethod
+    def get_grievance_attachments(self, grievance_id):
+        """The grievance's attachments, newest first"""
+
+    # Feedback
+
+    @abstractmethod
+    def create_feedback(self, user_name, user_id, rating, category, message):
+        """(feedback, error)"""
+
+    @abstractmethod
+    def get_feedback(self, feedback_id):
+        """The feedback row, or None"""
+
+    @abstractmethod
+    def get_feedback_page(self, filters=None, cursor=None, limit=db.FEEDBACK_PAGE_SIZE):
+        """(rows, next_cursor) like db.get_feedback_page; filters may hold userId,
+        category and rating. Raises ValueError for a malformed cursor."""
+
+    @abstractmethod
+    def delete_feedback(self, feedback_id):
+        """True if it existed"""
+
+    @abstractmethod
+    def get_feedback_statistics(self):
+        """totalCount, averageRating, categoryCount and ratingDistribution, as
+        GET /api/feedback/statistics returns them"""
+
+
+class SQLiteStorage(Storage):
+    """db.py's functions"""
+
+    name = 'sqlite'
+
+    def init(self):
+        db.init_db()
+
+    def close(self):
+        db.shutdown()
+
+    def create_user(self, name, email, password, role, department):
+        return db.create_user(name, email, password, role, department)
+
+    def get_user_by_email(self, email):
+        return db.get_user_by_email(email)
+
+    def get_user_by_id(self, user_id):
+        return db.get_user_by_id(user_id)
+
+    def get_users_by_department(self, department):
+        return db.get_users_by_department(department)
+
+    def create_grievance(self, title, description, category, priority, user_id, ai_summary=None,
+                         ai_recommendation=None, assigned_to=None, department=None):
+        return db.create_grievance(title, description, category, priority, user_id, ai_summary,
+                                   ai_recommendation, assigned_to=assigned_to, department=department)
+
+    def get_grievance(self, grievance_id):
+        return db.get_grievance(grievance_id)
+
+    def update_grievance(self, grievance_id, updates, changed_by=None):
+        return db.update_grievance(grievance_id, updates, changed_by=changed_by)
+
+    def get_grievances(self, filters=None, limit=50, offset=0):
+        return db.get_grievances(filters, limit, offset)
+
+    def get_user_grievances(self, user_id, role, limit=50, offset=0, department=None):
+        return db.get_user_grievances(user_id, role, limit, offset, department=department)
+
+    def get_grievance_statistics(self, submitted_by=None):
+        return db.get_grievance_statistics(submitted_by)
+
+    def export_grievances(self, filters=None, batch_size=EXPORT_BATCH):
+        conditions, params = [], []
+        for key, value in (filters or {}).items():
+            if key in db.GRIEVANCE_FILTERS:
+                conditions.append(f'{key} = ?')
+                params.append(value)
+        query = 'SELECT * FROM grievances'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        # Shard by shard: export order is only by time within a shard
+        for shard in db.shard_ids():
+            conn = db.get_shard_connection(shard)
+            try:
+                cursor = conn.execute(query + ' ORDER BY created_at', params)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield dict(row)
+            finally:
+                conn.close()
+
+    def add_comment(self, grievance_id, user_id, content):
+        return db.add_comment(grievance_id, user_id, content)
+
+    def get_comment_page(self, grievance_id, since=None, before=None, limit=db.COMMENT_PAGE_SIZE):
+        return db.get_comment_page(grievance_id, since, before, limit)
+
+    def add_attachment(self, grievance_id, file_name, file_path, user_id):
+        return db.add_attachment(grievance_id, file_name, file_path, user_id)
+
+    def get_grievance_attachments(self, grievance_id):
+        return db.get_grievance_attachments(grievance_id)
+
+    def create_feedback(self, user_name, user_id, rating, category, message):
+        return db.create_feedback(user_name, user_id, rating, category, message)
+
+    def get_feedback(self, feedback_id):
+        return db.get_feedback_by_id(feedback_id)
+
+    def get_feedback_page(self, filters=None, cursor=None, limit=db.FEEDBACK_PAGE_SIZE):
+        return db.get_feedback_page(filters, cursor, limit)
+
+    def delete_feedback(self, feedback_id):
+        return db.delete_feedback(feedback_id)
+
+    def get_feedback_statistics(self):
+        return db.get_feedback_statistics()
+
+
+def _postgres(**options):
+    pgstore = importlib.import_module('benchmarks.pgstore')
+    return pgstore.PostgresStorage(options.pop('dsn', None) or os.environ.get('DATABASE_URL'), **options)
+
+
+BACKENDS = {
+    'sqlite': lambda **options: SQLiteStorage(),
+    'postgres': _postgres,
+}
+
+
+def open_backend(name, **options):
+    """A new backend instance (options: pgstore.PostgresStorage's pool settings and dsn)"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend: {name}")
+    return BACKENDS[name](**options)
@@ -0,0 +1,397 @@
+"""Storage backend conformance and performance suite (see benchmarks/storage.py).
+
+Runs the same checks against each backend: the (row, error) contracts,
+newest-first listings and paging, role scoping, comment cursors, activity
+counts, statistics, exports and feedback. Then it times the hot operations with
+concurrent threads. SQLite runs against a scratch file. PostgreSQL runs
+against --dsn, or against a server launched for the run with the
+initdb/pg_ctl found in PG_BIN or on PATH, in a scratch directory that is
+removed afterwards:
+
+    python -m benchmarks.storage_suite                          # sqlite and a local postgres
+    python -m benchmarks.storage_suite --backends sqlite --ops 2000
+    python -m benchmarks.storage_suite --backends postgres --dsn postgresql://localhost/grievance_test
+
+Checks only read rows they created, so a --dsn database can be reused. The
+exit status is non-zero if any check fails.
+"""
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+import ids
+from benchmarks import storage
+from benchmarks.common import summarize, temp_database, write_report
+
+CHECKS = []
+
+
+def check(fn):
+    CHECKS.append(fn)
+    return fn
+
+
+def _user(store, role='user', department='Public Works'):
+    user, error = store.create_user(f'Suite {role}', f'suite-{ids.new_id()}@example.com', 'Passw0rd!', role,
+                                    department)
+    assert error is None, error
+    return user
+
+
+def _grievances(store, user, count, **fields):
+    rows = []
+    for i in range(count):
+        row, error = store.create_grievance(f'Suite grievance {i}', 'Conformance suite', 'Other', 'Low',
+                                            user['id'], department=user['department'], **fields)
+        assert error is None, error
+        rows.append(row)
+        # Distinct created_at values, so newest-first order is fully determined
+        time.sleep(0.002)
+    return rows
+
+
+@check
+def users(store):
+    user = _user(store)
+    assert 'password' not in user
+    assert user['department'] == 'Public Works'
+    duplicate, error = store.create_user('Again', user['email'], 'Passw0rd!', 'user', 'Public Works')
+    assert duplicate is None and error == "Email already registered", error
+    assert store.get_user_by_email(user['email'])['id'] == user['id']
+    assert store.get_user_by_id(user['id'])['password'] != 'Passw0rd!', 'password stored unhashed'
+    assert store.get_user_by_id(ids.new_id()) is None
+    department = f'Suite {ids.new_id()}'
+    staff = _user(store, 'staff', department)
+    listed = store.get_users_by_department(department)
+    assert [row['id'] for row in listed] == [staff['id']]
+    assert set(listed[0]) == {'id', 'name', 'email', 'role', 'department'}
+
+
+@check
+def create_and_get(store):
+    user = _user(store)
+    row, error = store.create_grievance('Title', 'Description', 'Other', 'High', user['id'])
+    assert error is None, error
+    assert row['status'] == 'New' and row['priority'] == 'High'
+    assert row['submitter_department'] == user['department'], 'department not looked up'
+    assert row['due_at'] and row['comment_count'] == 0 and row['attachment_count'] == 0
+    assert row['last_activity_at'] == row['created_at']
+    assert ids.timestamp(row['id']) is not None, 'not a time-ordered id'
+    assert store.get_grievance(row['id']) == row
+    assert store.get_grievance(ids.new_id()) is None
+
+
+@check
+def update(store):
+    user = _user(store)
+    staff = _user(store, 'staff')
+    row = _grievances(store, user, 1)[0]
+    assert store.update_grievance(row['id'], {'id': 'x'}) == (None, "No valid fields to update")
+    assert store.update_grievance(ids.new_id(), {'status': 'Closed'}) == (None, "Grievance not found")
+    updated, error = store.update_grievance(row['id'], {'status': 'In Progress', 'assigned_to': staff['id'],
+                                                         'submitted_by': staff['id']}, changed_by=staff['id'])
+    assert error is None, error
+    assert updated['status'] == 'In Progress' and updated['assigned_to'] == staff['id']
+    assert updated['submitted_by'] == user['id'], 'updated a field that is not updatable'
+    assert updated['updated_at'] >= row['updated_at'] and updated['last_activity_at'] == updated['updated_at']
+    resolved, _ = store.update_grievance(row['id'], {'status': 'Resolved'})
+    assert resolved['due_at'] is None, 'resolved grievance kept its deadline'
+    assert store.get_grievance(row['id']) == resolved
+
+
+@check
+def listings(store):
+    user = _user(store)
+    created = _grievances(store, user, 7)
+    newest_first = [row['id'] for row in reversed(created)]
+    own = store.get_user_grievances(user['id'], 'user', limit=50)
+    assert [row['id'] for row in own] == newest_first
+    pages = [store.get_user_grievances(user['id'], 'user', limit=3, offset=offset) for offset in (0, 3, 6)]
+    assert [row['id'] for page in pages for row in page] == newest_first, 'pages overlap or skip'
+    filtered = store.get_grievances({'submitted_by': user['id'], 'bogus': 1}, limit=4, offset=2)
+    assert [row['id'] for row in filtered] == newest_first[2:6]
+    admin = store.get_user_grievances(_user(store, 'admin')['id'], 'admin', limit=500)
+    times = [row['created_at'] for row in admin]
+    assert times == sorted(times, reverse=True), 'admin listing not newest first'
+
+
+@check
+def staff_scope(store):
+    department = f'Suite {ids.new_id()}'
+    submitter = _user(store, 'user', department)
+    staff = _user(store, 'staff', department)
+    elsewhere = _user(store, 'user', 'Elsewhere')
+    mine = _grievances(store, elsewhere, 1, assigned_to=staff['id'])[0]
+    from_department = _grievances(store, submitter, 2)
+    closed, _ = store.update_grievance(from_department[0]['id'], {'status': 'Closed'})
+    other = _grievances(store, elsewhere, 1)[0]
+    seen = [row['id'] for row in store.get_user_grievances(staff['id'], 'staff', department=department)]
+    assert seen == [from_department[1]['id'], mine['id']], seen
+    assert closed['id'] not in seen and other['id'] not in seen
+    # Without the department given it is looked up
+    assert [row['id'] for row in store.get_user_grievances(staff['id'], 'staff')] == seen
+
+
+@check
+def comments(store):
+    user = _user(store)
+    grievance = _grievances(store, user, 1)[0]
+    added = []
+    for i in range(5):
+        comment, error = store.add_comment(grievance['id'], user['id'], f'Comment {i}')
+        assert error is None, error
+        assert comment['content'] == f'Comment {i}'
+        added.append(comment['id'])
+    newest = store.get_comment_page(grievance['id'], limit=2)
+    assert [c['id'] for c in newest['comments']] == added[3:]
+    assert newest['comments'][0]['user_name'] == user['name']
+    assert newest['prev_cursor'] and not newest['has_more']
+    older = store.get_comment_page(grievance['id'], before=newest['prev_cursor'], limit=2)
+    assert [c['id'] for c in older['comments']] == added[1:3]
+    after = store.get_comment_page(grievance['id'], since=older['next_cursor'], limit=2)
+    assert [c['id'] for c in after['comments']] == added[3:] and after['has_more']
+    empty = store.get_comment_page(grievance['id'], since=newest['next_cursor'])
+    assert empty['comments'] == [] and empty['next_cursor'] == newest['next_cursor']
+    try:
+        store.get_comment_page(grievance['id'], since='not-a-cursor')
+        raise AssertionError('malformed cursor accepted')
+    except ValueError:
+        pass
+    assert store.get_grievance(grievance['id'])['comment_count'] == 5
+
+
+@check
+def attachments(store):
+    user = _user(store)
+    grievance = _grievances(store, user, 1)[0]
+    first, error = store.add_attachment(grievance['id'], 'a.pdf', '/uploads/a.pdf', user['id'])
+    assert error is None, error
+    time.sleep(0.002)
+    second, _ = store.add_attachment(grievance['id'], 'b.pdf', '/uploads/b.pdf', user['id'])
+    listed = store.get_grievance_attachments(grievance['id'])
+    assert [row['id'] for row in listed] == [second['id'], first['id']]
+    row = store.get_grievance(grievance['id'])
+    assert row['attachment_count'] == 2 and row['last_activity_at'] == second['created_at']
+
+
+@check
+def statistics(store):
+    user = _user(store)
+    created = _grievances(store, user, 6)
+    store.update_grievance(created[0]['id'], {'status': 'Resolved', 'priority': 'High'})
+    stats = store.get_grievance_statistics(user['id'])
+    assert stats['total_grievances'] == 6
+    assert {row['status']: row['count'] for row in stats['by_status']} == {'New': 5, 'Resolved': 1}
+    assert {row['priority']: row['count'] for row in stats['by_priority']} == {'High': 1, 'Low': 5}
+    assert [row['id'] for row in stats['recent_grievances']] == [row['id'] for row in reversed(created[1:])]
+    assert set(stats['recent_grievances'][0]) == {'id', 'title', 'status', 'priority', 'created_at'}
+
+
+@check
+def export(store):
+    user = _user(store)
+    created = _grievances(store, user, 5)
+    exported = list(store.export_grievances({'submitted_by': user['id']}, batch_size=2))
+    assert [row['id'] for row in exported] == [row['id'] for row in created]
+    assert exported[0] == store.get_grievance(created[0]['id'])
+    # Abandoning an export part way must release its connection
+    for _ in range(20):
+        partial = store.export_grievances({'submitted_by': user['id']}, batch_size=2)
+        next(partial)
+        partial.close()
+    assert store.get_grievance(created[0]['id']) is not None
+
+
+@check
+def feedback(store):
+    user = _user(store)
+    before = store.get_feedback_statistics()
+    created = []
+    for i in range(5):
+        row, error = store.create_feedback(user['name'], user['id'], i % 2 + 4, 'usability' if i < 3 else 'design',
+                                           f'Suite feedback {i}')
+        assert error is None, error
+        created.append(row)
+        time.sleep(0.002)
+    assert store.get_feedback(created[0]['id']) == created[0]
+
+    # Newest first, page by page, through the cursor
+    seen, cursor = [], None
+    while True:
+        rows, cursor = store.get_feedback_page({'userId': user['id']}, cursor, limit=2)
+        seen += [row['id'] for row in rows]
+        if cursor is None:
+            break
+    assert seen == [row['id'] for row in reversed(created)]
+    rows, _ = store.get_feedback_page({'userId': user['id'], 'category': 'design', 'rating': 4})
+    assert [row['id'] for row in rows] == [created[4]['id']]
+    try:
+        store.get_feedback_page({'userId': user['id']}, 'not-a-cursor')
+        raise AssertionError('malformed cursor accepted')
+    except ValueError:
+        pass
+
+    stats = store.get_feedback_statistics()
+    assert stats['totalCount'] - before['totalCount'] == 5
+    assert stats['categoryCount']['usability'] - before['categoryCount'].get('usability', 0) == 3
+    assert stats['ratingDistribution'][5] - before['ratingDistribution'].get(5, 0) == 2
+
+    assert store.delete_feedback(created[0]['id']) is True
+    assert store.delete_feedback(created[0]['id']) is False
+    assert store.get_feedback(created[0]['id']) is None
+
+
+def conformance(store):
+    results = {}
+    for fn in CHECKS:
+        try:
+            fn(store)
+            results[fn.__name__] = 'ok'
+        except Exception as e:
+            results[fn.__name__] = f'FAILED: {e!r}'
+            traceback.print_exc()
+        print(f"  {fn.__name__:<16} {results[fn.__name__]}")
+    return results
+
+
+# Performance
+
+def _timed(threads, ops, fn):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(count):
+        mine = []
+        for i in range(count):
+            start = time.perf_counter()
+            fn(i)
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    workers = [threading.Thread(target=worker, args=(ops // threads,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def performance(store, threads, ops):
+    users = [_user(store, 'user', f'Suite perf {i % 4}') for i in range(threads)]
+    admin = _user(store, 'admin')
+    created = []
+
+    def create(i):
+        user = users[i % len(users)]
+        row, _ = store.create_grievance('Perf', 'Performance suite', 'Other', 'Low', user['id'],
+                                        department=user['department'])
+        created.append(row['id'])
+
+    results = {'create_grievance': _timed(threads, ops, create)}
+    results['get_grievance'] = _timed(threads, ops, lambda i: store.get_grievance(created[i % len(created)]))
+    results['add_comment'] = _timed(threads, ops, lambda i: store.add_comment(
+        created[i % len(created)], users[i % len(users)]['id'], 'Performance comment'))
+    results['list_page'] = _timed(threads, max(ops // 10, threads), lambda i: store.get_user_grievances(
+        admin['id'], 'admin', limit=50, offset=(i % 10) * 50))
+    start = time.perf_counter()
+    exported = sum(1 for _ in store.export_grievances())
+    results['export'] = {'rows': exported,
+                         'rows_per_sec': round(exported / (time.perf_counter() - start))}
+    return results
+
+
+# Backends
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def local_postgres():
+    """A throwaway PostgreSQL server in a scratch directory; yields its DSN"""
+    path = os.environ.get('PG_BIN') or os.environ.get('PATH')
+    initdb, pg_ctl = shutil.which('initdb', path=path), shutil.which('pg_ctl', path=path)
+    if not initdb or not pg_ctl:
+        raise RuntimeError("initdb/pg_ctl not found: install PostgreSQL, set PG_BIN or pass --dsn")
+    workdir = tempfile.mkdtemp(prefix='grievance-pg-')
+    data = os.path.join(workdir, 'data')
+    port = _free_port()
+    try:
+        subprocess.run([initdb, '-D', data, '-U', 'postgres', '--auth=trust', '-E', 'UTF8', '--no-locale'],
+                       check=True, capture_output=True)
+        # Unix socket in the scratch directory only, no TCP listener
+        subprocess.run([pg_ctl, '-D', data, '-l', os.path.join(workdir, 'server.log'), '-w',
+                        '-o', f"-p {port} -k {workdir} -c listen_addresses=''", 'start'],
+                       check=True, capture_output=True)
+        try:
+            yield f'postgresql://postgres@/postgres?host={workdir}&port={port}'
+        finally:
+            subprocess.run([pg_ctl, '-D', data, '-m', 'fast', '-w', 'stop'], capture_output=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@contextmanager
+def backend(name, dsn=None, pool_size=None):
+    if name == 'sqlite':
+        with temp_database():
+            store = storage.open_backend('sqlite')
+            try:
+                yield store
+            finally:
+                store.close()
+        return
+    server = local_postgres() if dsn is None else None
+    if server is not None:
+        dsn = server.__enter__()
+    try:
+        store = storage.open_backend(name, dsn=dsn, max_size=pool_size)
+        try:
+            yield store
+        finally:
+            store.close()
+    finally:
+        if server is not None:
+            server.__exit__(*sys.exc_info())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the storage conformance and performance suite')
+    parser.add_argument('--backends', default=','.join(storage.BACKENDS), help='Comma separated backends')
+    parser.add_argument('--dsn', help='PostgreSQL to use instead of launching one')
+    parser.add_argument('--threads', type=int, default=8, help='Concurrent threads for the timings')
+    parser.add_argument('--ops', type=int, default=1000, help='Operations per timing')
+    parser.add_argument('--pool-size', type=int, help='PostgreSQL pool size (default PG_POOL_MAX)')
+    parser.add_argument('--skip-performance', action='store_true')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    report = {}
+    failed = False
+    for name in args.backends.split(','):
+        print(f"{name}:")
+        with backend(name, args.dsn, args.pool_size) as store:
+            store.init()
+            result = {'conformance': conformance(store)}
+            failed = failed or any(value != 'ok' for value in result['conformance'].values())
+            if not args.skip_performance:
+                result['performance'] = performance(store, args.threads, args.ops)
+        report[name] = result
+    write_report(report, args.output)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Concurrent write throughput: per-call commits vs. the group-committing writer.
+
+N threads each create grievances and add comments as fast as they can, first
+with DB_WRITER=0 (every call opens a connection and commits on its own, the
+old behaviour) and then through writer.py. Reports writes/sec, latency and
+errors ("database is locked") per thread count:
+
+    python -m benchmarks.write_throughput --threads 1,4,16,64 --seconds 5
+"""
+import argparse
+import os
+import threading
+import time
+
+import db
+from benchmarks import datagen
+from benchmarks.common import summarize, temp_database, write_report
+
+
+def _worker(users, grievances, deadline, latencies, errors):
+    i = 0
+    while time.perf_counter() < deadline:
+        user = users[i % len(users)]
+        start = time.perf_counter()
+        if i % 2:
+            _, error = db.add_comment(grievances[i % len(grievances)], user, 'Benchmark comment')
+        else:
+            _, error = db.create_grievance('Bench', 'Write throughput grievance', 'Other', 'Low', user)
+        latencies.append(time.perf_counter() - start)
+        if error:
+            errors.append(error)
+        i += 1
+
+
+def measure(threads, seconds, users, grievances):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + seconds
+    workers = [threading.Thread(target=_worker, args=(users, grievances, deadline, latencies, errors))
+               for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    result = summarize(latencies, time.perf_counter() - start)
+    result['errors'] = len(errors)
+    if errors:
+        result['first_error'] = errors[0]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare write throughput with and without the writer thread')
+    parser.add_argument('--threads', default='1,4,16,64', help='Comma separated thread counts')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Duration per thread count and mode')
+    parser.add_argument('--grievances', type=int, default=10000, help='Rows generated before measuring')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    report = {'writes_per_sec': {}}
+    original = os.environ.get('DB_WRITER')
+    with temp_database():
+        datagen.generate(args.grievances)
+        users = datagen.sample_users(42, args.grievances, 'user', 50)
+        grievances = [datagen.make_id('grievance', i, 42, args.grievances) for i in range(0, args.grievances, 97)]
+        try:
+            for mode, flag in (('per_call', '0'), ('writer', '1')):
+                os.environ['DB_WRITER'] = flag
+                for threads in [int(t) for t in args.threads.split(',')]:
+                    result = measure(threads, args.seconds, users, grievances)
+                    report['writes_per_sec'].setdefault(str(threads), {})[mode] = result
+                    print(f"{mode:8} {threads:>3} threads {result['throughput']:>9} writes/s "
+                          f"p95 {result['p95_ms']} ms errors {result['errors']}")
+        finally:
+            db.shutdown()
+            if original is None:
+                os.environ.pop('DB_WRITER', None)
+            else:
+                os.environ['DB_WRITER'] = original
+    write_report(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
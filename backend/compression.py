@@ -0,0 +1,126 @@
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # Optional dependency
+    brotli = None
+
+# Response compression (gzip, and brotli when installed).
+#
+# Only compressible content types are touched, so JPEG/PNG from /images and
+# other already-compressed files pass through as they are. Small bodies are
+# sent uncompressed; streamed bodies are compressed chunk by chunk with a
+# flush after each chunk so clients still receive them incrementally.
+
+# Config keys, overridable from the environment (e.g. COMPRESS_GZIP_LEVEL=9)
+DEFAULTS = {
+    'COMPRESS_ENABLED': True,
+    'COMPRESS_MIN_SIZE': 1024,       # bytes; smaller bodies aren't worth it
+    'COMPRESS_GZIP_LEVEL': 6,
+    'COMPRESS_BR_QUALITY': 4,        # brotli 0-11; above ~5 costs too much CPU per request
+    'COMPRESS_STREAMS': True,
+    'COMPRESS_MIMETYPES': (
+        'application/json', 'application/javascript', 'application/xml',
+        'image/svg+xml', 'text/html', 'text/plain', 'text/css', 'text/csv', 'text/xml',
+    ),
+}
+
+
+def _accepted(header):
+    """Encodings the client accepts, from an Accept-Encoding header"""
+    accepted = set()
+    for part in header.split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if token and q > 0:
+            accepted.add(token)
+    return accepted
+
+
+def choose_encoding(header):
+    accepted = _accepted(header or '')
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def _compressor(encoding, config):
+    """Return (process, flush, finish) callables for an incremental stream"""
+    if encoding == 'br':
+        c = brotli.Compressor(quality=config['COMPRESS_BR_QUALITY'])
+        return c.process, c.flush, c.finish
+    c = zlib.compressobj(config['COMPRESS_GZIP_LEVEL'], zlib.DEFLATED, 31)  # 31: gzip container
+    return c.compress, lambda: c.flush(zlib.Z_SYNC_FLUSH), c.flush
+
+
+def compress(data, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESS_BR_QUALITY'])
+    c = zlib.compressobj(config['COMPRESS_GZIP_LEVEL'], zlib.DEFLATED, 31)
+    return c.compress(data) + c.flush()
+
+
+def _compress_stream(chunks, encoding, config):
+    process, flush, finish = _compressor(encoding, config)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if chunk:
+                yield process(chunk) + flush()
+        yield finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+
+def init_app(app):
+    for key, value in DEFAULTS.items():
+        if key in os.environ and not isinstance(value, tuple):
+            raw = os.environ[key]
+            value = raw.lower() in ('1', 'true', 'yes') if isinstance(value, bool) else int(raw)
+        app.config.setdefault(key, value)
+
+    @app.after_request
+    def compress_response(response):
+        config = app.config
+        if (not config['COMPRESS_ENABLED'] or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or response.direct_passthrough
+                or response.mimetype not in config['COMPRESS_MIMETYPES']):
+            return response
+
+        from flask import request
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            if not config['COMPRESS_STREAMS']:
+                return response
+            response.response = _compress_stream(response.response, encoding, config)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < config['COMPRESS_MIN_SIZE']:
+                return response
+            response.set_data(compress(data, encoding, config))
+
+        response.headers['Content-Encoding'] = encoding
+        # The bytes differ from the identity representation now
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
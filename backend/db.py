@@ -1,20 +1,293 @@
+import base64
+import heapq
+import itertools
+import json
+import os
 import sqlite3
-import uuid
-from werkzeug.security import generate_password_hash, check_password_hash
+import time
+import zlib
 from datetime import datetime
+import hashing
+import ids
+import metrics
+import sla
+import sqltrace
+import writer
 
 # Database configuration
 DATABASE_NAME = 'grievance_system.db'
+ARCHIVE_NAME = None  # Defaults to <database>_archive.db next to DATABASE_NAME (see archive.py)
+BUSY_TIMEOUT = float(os.environ.get('DB_BUSY_TIMEOUT', 5))  # seconds to wait for a lock
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that reports query time to metrics"""
+
+    def execute(self, *args):
+        start = time.perf_counter()
+        try:
+            return super().execute(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.observe_dependency('sqlite', elapsed)
+            if sqltrace.enabled():
+                sqltrace.record(self.connection, args[0], args[1] if len(args) > 1 else (), elapsed)
+
+    def executemany(self, *args):
+        start = time.perf_counter()
+        try:
+            return super().executemany(*args)
+        finally:
+            metrics.observe_dependency('sqlite', time.perf_counter() - start)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            metrics.observe_dependency('sqlite', time.perf_counter() - start, calls=0)
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute) are timed"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # sqlite3's own Connection.execute bypasses cursor(), so route it here
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, factory=TimedConnection)
+    conn.row_factory = sqlite3.Row
+    if sqltrace.enabled():
+        sqltrace.install(conn)
+    return conn
 
 def get_db_connection():
     """Create and return a database connection with row factory"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    conn.row_factory = sqlite3.Row
+    return _connect(DATABASE_NAME)
+
+# Sharding
+#
+# With DB_SHARDS=N (N > 1) grievances and everything that hangs off them
+# (comments, attachments, status history, SLA aggregates, the change feed)
+# live in N files next to DATABASE_NAME, <name>_shard<k>.db, each with its own
+# writer thread and write lock, so a burst of writes to one department's
+# grievances doesn't queue everyone else's. Users and feedback stay in
+# DATABASE_NAME; shard read connections attach it as 'home' (unqualified
+# "users" resolves there). Writer connections don't attach it, since a write
+# transaction would then lock it too and serialize the shards again.
+#
+# A new grievance goes to the shard of its submitter's department (crc32 of
+# the name modulo N, or a DB_SHARD_MAP pin), which is written into its id
+# (ids.shard_of), so updates, comments, attachments and lookups by id go
+# straight to one file. Listings, statistics and the change feed read every
+# shard and merge. Existing databases are split with `python shards.py --split`.
+#
+#   DB_SHARDS      number of shard files, at most 64 (default 1: everything in DATABASE_NAME)
+#   DB_SHARD_MAP   "Department=shard;..." pins departments to shards
+SHARDS = max(1, min(int(os.environ.get('DB_SHARDS', 1)), ids.MAX_SHARDS))
+
+def _shard_map():
+    pins = {}
+    for item in os.environ.get('DB_SHARD_MAP', '').split(';'):
+        if '=' in item:
+            department, shard = item.rsplit('=', 1)
+            pins[department.strip()] = int(shard)
+    return pins
+
+SHARD_MAP = _shard_map()
+
+def sharded():
+    return SHARDS > 1
+
+def shard_ids():
+    return range(SHARDS)
+
+def shard_path(shard):
+    base, ext = os.path.splitext(DATABASE_NAME)
+    return f'{base}_shard{shard}{ext or ".db"}'
+
+def shard_database(shard):
+    """File holding a shard's grievance tables (the main database when not sharded)"""
+    return shard_path(shard) if sharded() else DATABASE_NAME
+
+def shard_for_department(department):
+    """Shard holding the grievances submitted from a department"""
+    if department in SHARD_MAP:
+        return SHARD_MAP[department] % SHARDS
+    return zlib.crc32((department or '').encode()) % SHARDS
+
+def shard_of(grievance_id):
+    """Shard holding a grievance, from its id (0 when not sharded or for malformed ids)"""
+    if not sharded():
+        return 0
+    try:
+        return ids.shard_of(grievance_id) % SHARDS
+    except (ValueError, TypeError, AttributeError):
+        return 0
+
+def get_shard_connection(shard):
+    """Read connection to a shard's grievance tables (the main database when not sharded)"""
+    if not sharded():
+        return get_db_connection()
+    conn = _connect(shard_path(shard))
+    conn.execute('ATTACH DATABASE ? AS home', (DATABASE_NAME,))
+    return conn
+
+def open_shard(shard):
+    """Connection to a shard's file alone, for writing: a write transaction locks
+    every attached database, so writers don't attach home"""
+    return _connect(shard_database(shard))
+
+def archive_path(shard=None):
+    if sharded() and shard is not None:
+        return os.path.splitext(shard_path(shard))[0] + '_archive.db'
+    return ARCHIVE_NAME or os.environ.get('ARCHIVE_DATABASE') or os.path.splitext(DATABASE_NAME)[0] + '_archive.db'
+
+def get_archive_connection(shard=None):
+    """Connection with the archive attached as schema 'archive', or None if there is no archive"""
+    path = archive_path(shard)
+    if not os.path.exists(path):
+        return None
+    conn = get_shard_connection(shard) if shard is not None else get_db_connection()
+    conn.execute('ATTACH DATABASE ? AS archive', (path,))
     return conn
 
+# Writes go through a single writer thread that group-commits them (writer.py),
+# one per shard when sharded
+_writer = writer.Writer(get_db_connection, lambda: DATABASE_NAME)
+_shard_writers = {}
+
+def _shard_writer(shard):
+    if not sharded():
+        return _writer
+    found = _shard_writers.get(shard)
+    if found is None:
+        found = _shard_writers.setdefault(
+            shard, writer.Writer(lambda: open_shard(shard), lambda: shard_path(shard)))
+    return found
+
+def _write(mutation, missing_error, wait=True, shard=None):
+    """Apply mutation(conn) in the writer's next group commit (shard's writer, if given).
+
+    Returns (row, error) like the other db functions, or with wait=False the
+    Future itself (its result is the row; failures are raised from result()).
+    """
+    future = (_writer if shard is None else _shard_writer(shard)).submit(mutation)
+    if not wait:
+        return future
+    try:
+        row = future.result()
+    except Exception as e:
+        return None, str(e)
+    if row:
+        return row, None
+    return None, missing_error
+
+def _row(conn, table, row_id):
+    row = conn.execute(f'SELECT * FROM {table} WHERE id = ?', (row_id,)).fetchone()
+    return dict(row) if row else None
+
+def shutdown():
+    """Apply queued writes and stop the writer threads"""
+    for shard_writer in list(_shard_writers.values()):
+        shard_writer.shutdown()
+    _writer.shutdown()
+
+# List results as JSON
+#
+# List functions take as_json: False returns dicts, True returns a JSON array
+# string and 'stream' returns a generator of JSON chunks (the connection is
+# closed when it is exhausted). The JSON is produced by SQLite's json_object(),
+# so rows never become Python dicts on the way out.
+STREAM_BATCH = 500
+_table_columns = {}
+_json_supported = None
+
+def _columns(conn, table):
+    """Column names of a table (cached; cleared by init_db)"""
+    columns = _table_columns.get(table)
+    if columns is None:
+        columns = _table_columns[table] = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+    return columns
+
+def _sqlite_json(conn):
+    global _json_supported
+    if _json_supported is None:
+        try:
+            conn.execute("SELECT json_object('a', 1)").fetchone()
+            _json_supported = True
+        except sqlite3.OperationalError:
+            _json_supported = False
+    return _json_supported
+
+def _select(conn, table, alias=None, as_json=False, extra=(), columns=None):
+    """Select list for a table: alias.* (or columns) plus extra (key, expression) pairs, or one json_object()"""
+    prefix = f'{alias}.' if alias else ''
+    if not as_json or not _sqlite_json(conn):
+        selected = [prefix + column for column in columns] if columns else [f'{prefix}*']
+        return ', '.join(selected + [f'{expr} as {key}' for key, expr in extra])
+    fields = [(column, prefix + column) for column in (columns or _columns(conn, table))] + list(extra)
+    return 'json_object(' + ', '.join(f"'{key}', {expr}" for key, expr in fields) + ')'
+
+def _empty(as_json):
+    if as_json == 'stream':
+        return iter(['[]'])
+    return '[]' if as_json else []
+
+def _fetch(conn, query, params, as_json=False):
+    """Run a list query built with _select() and close the connection"""
+    cursor = conn.execute(query, params)
+    if as_json and not _sqlite_json(conn):
+        # SQLite without JSON1: encode in Python
+        text = json.dumps([dict(row) for row in cursor.fetchall()])
+        conn.close()
+        return iter([text]) if as_json == 'stream' else text
+    if as_json == 'stream':
+        return _iter_json(cursor, conn)
+    try:
+        if as_json:
+            return '[' + ','.join(row[0] for row in cursor) + ']'
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+def _iter_json(cursor, conn):
+    try:
+        yield '['
+        first = True
+        while True:
+            rows = cursor.fetchmany(STREAM_BATCH)
+            if not rows:
+                break
+            chunk = ','.join(row[0] for row in rows)
+            yield chunk if first else ',' + chunk
+            first = False
+        yield ']'
+    finally:
+        conn.close()
+
+def _ensure_column(conn, table, column, definition):
+    """Add a column to an existing table; returns True if it was missing"""
+    existing = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+    if column in existing:
+        return False
+    conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return True
+
 def init_db():
-    """Initialize the database with required tables"""
+    """Initialize the database (and any shards) with required tables"""
+    _table_columns.clear()
+    _facet_rollups.clear()
+    _user_names.clear()
+    _directories.clear()
     conn = get_db_connection()
+    # WAL lets readers continue while the writer thread commits
+    conn.execute('PRAGMA journal_mode=WAL')
     
     # Users table
     conn.execute('''
@@ -29,6 +302,54 @@ def init_db():
     )
     ''')
     
+    # Feedback table
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS feedback (
+        id TEXT PRIMARY KEY,
+        userName TEXT NOT NULL,
+        userId TEXT,
+        rating INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        message TEXT NOT NULL,
+        createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (userId) REFERENCES users (id)
+    )
+    ''')
+
+    # The escalation scheduler's manager lookup, and the department directory
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_department ON users (department, role)')
+    # Bumped whenever a department's member list changes (see get_department_directory)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS department_versions (
+        department TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    )
+    ''')
+    # Feedback listing: a user's own feedback, the admin filters, and the unfiltered view
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_feedback_user ON feedback (userId, createdAt)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_feedback_category ON feedback (category, rating, createdAt)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_feedback_created ON feedback (createdAt)')
+
+    # Grievance tables: in use here unless sharded (then they only hold what
+    # shards.py --split hasn't moved yet), and in every shard
+    _init_grievance_tables(conn)
+    conn.commit()
+    conn.close()
+
+    if sharded():
+        for shard in shard_ids():
+            conn = _connect(shard_path(shard))
+            conn.execute('PRAGMA journal_mode=WAL')
+            _init_grievance_tables(conn)
+            conn.commit()
+            conn.close()
+        print(f"Database initialized: {DATABASE_NAME} ({SHARDS} shards)")
+    else:
+        print(f"Database initialized: {DATABASE_NAME}")
+
+
+def _init_grievance_tables(conn):
+    """Grievances and the tables that hang off them (everything a shard holds)"""
     # Grievances table
     conn.execute('''
     CREATE TABLE IF NOT EXISTS grievances (
@@ -44,6 +365,12 @@ def init_db():
         ai_recommendation TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        submitter_department TEXT,
+        due_at TIMESTAMP,
+        escalated_at TIMESTAMP,
+        comment_count INTEGER NOT NULL DEFAULT 0,
+        attachment_count INTEGER NOT NULL DEFAULT 0,
+        last_activity_at TIMESTAMP,
         FOREIGN KEY (submitted_by) REFERENCES users (id),
         FOREIGN KEY (assigned_to) REFERENCES users (id)
     )
@@ -62,20 +389,6 @@ def init_db():
     )
     ''')
 
-    # Feedback table
-    conn.execute('''
-    CREATE TABLE IF NOT EXISTS feedback (
-        id TEXT PRIMARY KEY,
-        userName TEXT NOT NULL,
-        userId TEXT,
-        rating INTEGER NOT NULL,
-        category TEXT NOT NULL,
-        message TEXT NOT NULL,
-        createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (userId) REFERENCES users (id)
-    )
-    ''')
-    
     # Attachments table
     conn.execute('''
     CREATE TABLE IF NOT EXISTS attachments (
@@ -89,36 +402,173 @@ def init_db():
         FOREIGN KEY (uploaded_by) REFERENCES users (id)
     )
     ''')
-    
-    conn.commit()
-    conn.close()
-    print(f"Database initialized: {DATABASE_NAME}")
 
+    # Copy of the submitter's department, so the staff listing can filter
+    # without joining users (kept in sync by update_profile)
+    if _ensure_column(conn, 'grievances', 'submitter_department', 'TEXT'):
+        conn.execute('''UPDATE grievances SET submitter_department =
+                        (SELECT department FROM users WHERE users.id = grievances.submitted_by)''')
 
+    # SLA deadline of open grievances (sla.deadline; NULL once resolved) and
+    # when the last escalation restarted it (see scheduler.py). Open grievances
+    # that predate the column get their window from now, so upgrading doesn't
+    # escalate the whole backlog at once.
+    _ensure_column(conn, 'grievances', 'escalated_at', 'TIMESTAMP')
+    if _ensure_column(conn, 'grievances', 'due_at', 'TIMESTAMP'):
+        cases = ' '.join('WHEN ? THEN ?' for _ in sla.DEADLINE_HOURS)
+        hours = [value for item in sla.DEADLINE_HOURS.items() for value in item]
+        placeholders = ', '.join('?' for _ in sla.RESOLVED_STATUSES)
+        conn.execute(f'''UPDATE grievances SET due_at = strftime('%Y-%m-%dT%H:%M:%f',
+                                 max(julianday(created_at), julianday(?)),
+                                 '+' || (CASE priority {cases} END) || ' hours')
+                         WHERE status NOT IN ({placeholders})''',
+                     (datetime.now().isoformat(), *hours, *sla.RESOLVED_STATUSES))
+
+    # Comment and attachment counts and the time of the latest update,
+    # comment or attachment, kept on the row by the writes that change them
+    # so listings show them without touching the child tables
+    added = [_ensure_column(conn, 'grievances', column, definition) for column, definition in (
+        ('comment_count', 'INTEGER NOT NULL DEFAULT 0'),
+        ('attachment_count', 'INTEGER NOT NULL DEFAULT 0'),
+        ('last_activity_at', 'TIMESTAMP'),
+    )]
+    if any(added):
+        recount_activity(conn)
+
+    # Indexes for the hot listing queries (see sqltrace.hot_queries)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_grievances_created_at ON grievances (created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_grievances_submitted_by ON grievances (submitted_by, created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_grievances_assigned_to ON grievances (assigned_to, created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_grievances_department ON grievances (submitter_department, created_at)')
+    # Covering index for the facet rollup (get_grievance_facets)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_grievances_facets ON grievances (status, category, priority)')
+    # Per-grievance lookups, and archive candidates (see archive.py)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_comments_grievance ON comments (grievance_id, created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_attachments_grievance ON attachments (grievance_id, created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_grievances_status_updated ON grievances (status, updated_at)')
+    # Upcoming deadlines for the escalation scheduler
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_grievances_due ON grievances (due_at)')
+    # Open grievances per assignee, for assignment.py's workload rebuild
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_grievances_workload ON grievances (assigned_to, status)')
+
+    # Append-only history of field changes (status, priority, ...) and the
+    # SLA aggregates maintained from it (see sla.py)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS grievance_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        grievance_id TEXT NOT NULL,
+        field TEXT NOT NULL,
+        old_value TEXT,
+        new_value TEXT,
+        changed_by TEXT,
+        created_at TIMESTAMP NOT NULL
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_grievance_events_grievance ON grievance_events (grievance_id, field)')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS sla_aggregates (
+        metric TEXT NOT NULL,
+        dimension TEXT NOT NULL,
+        value TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        total_seconds REAL NOT NULL,
+        max_seconds REAL NOT NULL,
+        sketch TEXT NOT NULL,
+        PRIMARY KEY (metric, dimension, value)
+    )
+    ''')
+
+    # Change feed for live updates (see events.py). AUTOINCREMENT keeps ids
+    # unique after old rows are pruned, since clients resume by id.
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS change_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        grievance_id TEXT NOT NULL,
+        submitted_by TEXT,
+        assigned_to TEXT,
+        department TEXT,
+        status TEXT,
+        data TEXT,
+        created_at TIMESTAMP NOT NULL
+    )
+    ''')
+
+
+def recount_activity(conn=None):
+    """Recompute comment_count, attachment_count and last_activity_at of every grievance
+    (after a migration or a bulk load that bypassed the writes keeping them)"""
+    if conn is None:
+        for shard in shard_ids():
+            conn = open_shard(shard)
+            try:
+                recount_activity(conn)
+                conn.commit()
+            finally:
+                conn.close()
+        return
+    conn.execute('''UPDATE grievances SET
+        comment_count = (SELECT COUNT(*) FROM comments WHERE grievance_id = grievances.id),
+        attachment_count = (SELECT COUNT(*) FROM attachments WHERE grievance_id = grievances.id),
+        last_activity_at = max(coalesce(updated_at, created_at),
+            coalesce((SELECT MAX(created_at) FROM comments WHERE grievance_id = grievances.id), ''),
+            coalesce((SELECT MAX(created_at) FROM attachments WHERE grievance_id = grievances.id), ''))''')
+
+
+def warm_up(max_bytes=256 * 1024 * 1024):
+    """Read the database file so its pages are in the OS page cache"""
+    read = 0
+    for path in (DATABASE_NAME, DATABASE_NAME + '-wal'):
+        if not os.path.exists(path):
+            continue
+        with open(path, 'rb') as f:
+            while read < max_bytes:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    break
+                read += len(chunk)
+    return read
+
+def bulk_insert(table, columns, rows, batch_size=10000):
+    """Insert many rows in large transactions (data loading and benchmarks).
+
+    rows may be any iterable of tuples; returns the number inserted.
+    """
+    placeholders = ', '.join('?' for _ in columns)
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
 
-# Feedback-related functions
-def create_feedback(userName, userId, rating, category, message):
-    """Create a new feedback entry"""
     conn = get_db_connection()
-    feedback_id = str(uuid.uuid4())
-    now = datetime.now().isoformat()
-    
+    count = 0
+    batch = []
     try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                conn.executemany(sql, batch)
+                conn.commit()
+                count += len(batch)
+                batch = []
+        if batch:
+            conn.executemany(sql, batch)
+            conn.commit()
+            count += len(batch)
+    finally:
+        conn.close()
+    return count
+
+
+# Feedback-related functions
+def create_feedback(userName, userId, rating, category, message, wait=True):
+    """Create a new feedback entry"""
+    def mutation(conn):
+        feedback_id = ids.new_id()
         conn.execute(
             'INSERT INTO feedback (id, userName, userId, rating, category, message, createdAt) VALUES (?, ?, ?, ?, ?, ?, ?)',
-            (feedback_id, userName, userId, rating, category, message, now)
+            (feedback_id, userName, userId, rating, category, message, datetime.now().isoformat())
         )
-        conn.commit()
-        
-        feedback = conn.execute('SELECT * FROM feedback WHERE id = ?', (feedback_id,)).fetchone()
-        conn.close()
-        
-        if feedback:
-            return dict(feedback), None
-        return None, "Failed to create feedback"
-    except Exception as e:
-        conn.close()
-        return None, str(e)
+        return _row(conn, 'feedback', feedback_id)
+    
+    return _write(mutation, "Failed to create feedback", wait)
 
 def get_feedback(filters=None, limit=50, offset=0):
     """Get feedback with optional filters"""
@@ -144,6 +594,51 @@ def get_feedback(filters=None, limit=50, offset=0):
     
     return [dict(f) for f in feedbacks]
 
+# Feedback listing pages are ordered newest first by (createdAt, rowid). Both
+# are in every feedback index, so finding a page reads only the index; the
+# rows themselves are then fetched by rowid.
+FEEDBACK_FIELDS = ('id', 'userName', 'userId', 'rating', 'category', 'message', 'createdAt')
+FEEDBACK_PAGE_SIZE = 50
+FEEDBACK_PAGE_MAX = 1000
+
+def get_feedback_page(filters=None, cursor=None, limit=FEEDBACK_PAGE_SIZE, fields=None, as_json=False):
+    """A page of feedback, newest first, and the cursor of the next page (None after the last).
+
+    filters may hold userId, category and rating; fields projects the
+    columns (default FEEDBACK_FIELDS). Raises ValueError for a malformed cursor.
+    """
+    limit = max(1, min(int(limit), FEEDBACK_PAGE_MAX))
+    clauses, params = [], []
+    for key in ('userId', 'category', 'rating'):
+        if filters and filters.get(key) is not None:
+            clauses.append(f'{key} = ?')
+            params.append(filters[key])
+    if cursor:
+        created_at, rowid = decode_cursor(cursor)
+        clauses.append('createdAt <= ? AND (createdAt < ? OR rowid < ?)')
+        params += [created_at, created_at, rowid]
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+    conn = get_db_connection()
+    keys = conn.execute(
+        f'SELECT rowid, createdAt FROM feedback {where} ORDER BY createdAt DESC, rowid DESC LIMIT ?',
+        (*params, limit + 1)
+    ).fetchall()
+    next_cursor = encode_cursor(keys[limit - 1][1], keys[limit - 1][0]) if len(keys) > limit else None
+    rowids = [row[0] for row in keys[:limit]]
+    if not rowids:
+        conn.close()
+        return _empty(as_json), None
+
+    placeholders = ', '.join('?' for _ in rowids)
+    rows = _fetch(
+        conn,
+        f'''SELECT {_select(conn, "feedback", as_json=as_json, columns=fields or FEEDBACK_FIELDS)}
+            FROM feedback WHERE rowid IN ({placeholders}) ORDER BY createdAt DESC, rowid DESC''',
+        rowids, as_json
+    )
+    return rows, next_cursor
+
 def get_category_counts():
     """Get counts of feedback by category"""
     conn = get_db_connection()
@@ -164,6 +659,39 @@ def get_average_rating():
     
     return result['avg_rating'] if result and result['avg_rating'] is not None else 0
 
+def get_feedback_by_id(feedback_id):
+    conn = get_db_connection()
+    try:
+        row = conn.execute('SELECT * FROM feedback WHERE id = ?', (feedback_id,)).fetchone()
+    finally:
+        conn.close()
+    return dict(row) if row else None
+
+def delete_feedback(feedback_id):
+    """True if the entry existed"""
+    def mutation(conn):
+        return conn.execute('DELETE FROM feedback WHERE id = ?', (feedback_id,)).rowcount > 0
+
+    deleted, _ = _write(mutation, "Feedback not found")
+    return bool(deleted)
+
+def get_feedback_statistics():
+    """Total, average rating, counts by category and the rating distribution"""
+    conn = get_db_connection()
+    try:
+        total, average = conn.execute('SELECT COUNT(*), AVG(rating) FROM feedback').fetchone()
+        categories = conn.execute(
+            'SELECT category, COUNT(*) AS count FROM feedback GROUP BY category ORDER BY count DESC').fetchall()
+        ratings = conn.execute('SELECT rating, COUNT(*) FROM feedback GROUP BY rating ORDER BY rating').fetchall()
+    finally:
+        conn.close()
+    return {
+        'totalCount': total,
+        'averageRating': round(average, 1) if average is not None else 0,
+        'categoryCount': {row[0]: row[1] for row in categories},
+        'ratingDistribution': {row[0]: row[1] for row in ratings},
+    }
+
 
 # User-related functions
 def create_user(name, email, password, role, department):
@@ -176,15 +704,20 @@ def create_user(name, email, password, role, department):
         conn.close()
         return None, "Email already registered"
     
-    # Hash password and create user
-    hashed_password = generate_password_hash(password)
-    user_id = str(uuid.uuid4())
+    # Hash password (in the hashing pool) and create user
+    try:
+        hashed_password = hashing.hash_password(password)
+    except hashing.HasherBusy:
+        conn.close()
+        raise
+    user_id = ids.new_id()
     
     try:
         conn.execute(
             'INSERT INTO users (id, name, email, password, role, department) VALUES (?, ?, ?, ?, ?, ?)',
             (user_id, name, email, hashed_password, role, department)
         )
+        _bump_directory(conn, department)
         conn.commit()
         
         # Fetch the created user
@@ -223,68 +756,213 @@ def get_user_by_id(user_id):
 def verify_user(email, password):
     """Verify user credentials and return the user if valid"""
     user = get_user_by_email(email)
-    
-    if user and check_password_hash(user['password'], password):
+    if not user:
+        return None, "Invalid email or password"
+
+    valid, outdated = hashing.verify_password(user['password'], password)
+    if valid:
+        if outdated:
+            # Transparently upgrade hashes made with older parameters
+            try:
+                set_password_hash(user['id'], hashing.hash_password(password))
+            except hashing.HasherBusy:
+                pass  # Try again on the next login
         user_copy = user.copy()
         user_copy.pop('password')  # Remove password from result
         return user_copy, None
     
     return None, "Invalid email or password"
 
+def set_password_hash(user_id, pwhash):
+    """Store an already-hashed password for a user"""
+    conn = get_db_connection()
+    conn.execute('UPDATE users SET password = ? WHERE id = ?', (pwhash, user_id))
+    conn.commit()
+    conn.close()
+
 def get_users_by_department(department):
     """Get all users from a specific department"""
+    return list(get_department_directory(department)[1])
+
+# Department directory
+#
+# Assignment dropdowns and escalation emails list a department's members.
+# Each list is cached per process along with the department's row in
+# department_versions, which create_user and update_profile bump in the
+# same transaction as the change, so a lookup reads one primary key row and
+# serves the cached list while the version matches, in every worker. The
+# ETag is the version plus a checksum of the list. Writes that bypass those
+# functions (admin.py, bulk loads) show up within DIRECTORY_CACHE_SECONDS.
+DIRECTORY_CACHE_SECONDS = 300
+_directories = {}
+
+def _bump_directory(conn, *departments):
+    for department in set(departments):
+        conn.execute('''INSERT INTO department_versions (department, version) VALUES (?, 1)
+                        ON CONFLICT (department) DO UPDATE SET version = version + 1''', (department,))
+
+def get_department_directory(department):
+    """(etag, users) of a department; the list is shared, don't modify it"""
     conn = get_db_connection()
-    users = conn.execute('SELECT id, name, email, role, department FROM users WHERE department = ?', 
-                        (department,)).fetchall()
+    try:
+        row = conn.execute('SELECT version FROM department_versions WHERE department = ?', (department,)).fetchone()
+        version = row[0] if row else 0
+        cached = _directories.get(department)
+        if cached and cached[0] == version and time.monotonic() - cached[1] < DIRECTORY_CACHE_SECONDS:
+            return cached[2], cached[3]
+        users = [dict(user) for user in conn.execute(
+            'SELECT id, name, email, role, department FROM users WHERE department = ? ORDER BY role, name',
+            (department,))]
+    finally:
+        conn.close()
+    etag = f'{version}-{zlib.crc32(json.dumps(users).encode()):08x}'
+    if len(_directories) >= 1024:
+        _directories.clear()
+    _directories[department] = (version, time.monotonic(), etag, users)
+    return etag, users
+
+# Change feed
+_change_listeners = []
+
+def on_change(fn):
+    """Register fn(kind, grievance_id, data), called after a change is committed"""
+    _change_listeners.append(fn)
+    return fn
+
+def _log_change(conn, kind, grievance_id, data=None):
+    """Append to change_events inside a writer mutation; listeners run after commit.
+
+    Who may see the change (submitter, assignee, submitter's department,
+    status) is copied onto the row so subscribers can be filtered without
+    further queries.
+    """
+    conn.execute(
+        '''INSERT INTO change_events
+           (kind, grievance_id, submitted_by, assigned_to, department, status, data, created_at)
+           SELECT ?, id, submitted_by, assigned_to, submitter_department, status, ?, ?
+           FROM grievances WHERE id = ?''',
+        (kind, json.dumps(data or {}), datetime.now().isoformat(), grievance_id)
+    )
+    conn.after_commit.append(lambda: _notify(kind, grievance_id, data or {}))
+
+def _notify(kind, grievance_id, data):
+    for fn in _change_listeners:
+        try:
+            fn(kind, grievance_id, data)
+        except Exception as e:
+            print(f"Change listener failed: {e}")
+
+def get_changes(after_id, limit=500, shard=0):
+    """A shard's change events with id > after_id, oldest first (ids count per shard)"""
+    conn = get_shard_connection(shard)
+    rows = conn.execute('SELECT * FROM change_events WHERE id > ? ORDER BY id LIMIT ?',
+                        (after_id, limit)).fetchall()
     conn.close()
-    
-    return [dict(user) for user in users]
+    return [dict(row, shard=shard) for row in rows]
+
+def latest_change_id(shard=0):
+    conn = get_shard_connection(shard)
+    row = conn.execute('SELECT MAX(id) FROM change_events').fetchone()
+    conn.close()
+    return row[0] or 0
+
+def prune_changes(keep):
+    """Delete all but the newest keep change events of each shard"""
+    for shard in shard_ids():
+        conn = get_shard_connection(shard)
+        try:
+            conn.execute('DELETE FROM change_events WHERE id <= (SELECT MAX(id) FROM change_events) - ?', (keep,))
+            conn.commit()
+        finally:
+            conn.close()
 
 # Grievance-related functions
-def create_grievance(title, description, category, priority, user_id, ai_summary=None, ai_recommendation=None):
-    """Create a new grievance"""
-    conn = get_db_connection()
-    grievance_id = str(uuid.uuid4())
-    now = datetime.now().isoformat()
-    
-    try:
+def create_grievance(title, description, category, priority, user_id, ai_summary=None, ai_recommendation=None,
+                     wait=True, assigned_to=None, department=None):
+    """Create a new grievance (department: the submitter's, looked up if not given)"""
+    if department is None:
+        user = get_user_by_id(user_id)
+        department = user.get('department') if user else None
+    shard = shard_for_department(department) if sharded() else None
+
+    def mutation(conn):
+        grievance_id = ids.new_id(shard)
+        now = datetime.now().isoformat()
+        due_at = sla.deadline(priority, 'New', now)
         conn.execute(
             '''INSERT INTO grievances 
-               (id, title, description, category, priority, status, submitted_by, 
-                ai_summary, ai_recommendation, created_at, updated_at) 
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-            (grievance_id, title, description, category, priority, 'New', user_id, 
-             ai_summary, ai_recommendation, now, now)
+               (id, title, description, category, priority, status, submitted_by, assigned_to,
+                ai_summary, ai_recommendation, created_at, updated_at, last_activity_at, due_at, submitter_department) 
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (grievance_id, title, description, category, priority, 'New', user_id, assigned_to,
+             ai_summary, ai_recommendation, now, now, now, due_at, department)
         )
-        conn.commit()
-        
-        grievance = conn.execute('SELECT * FROM grievances WHERE id = ?', (grievance_id,)).fetchone()
-        conn.close()
-        
-        if grievance:
-            return dict(grievance), None
-        return None, "Failed to create grievance"
-    except Exception as e:
-        conn.close()
-        return None, str(e)
+        conn.execute(
+            'INSERT INTO grievance_events (grievance_id, field, old_value, new_value, changed_by, created_at) '
+            "VALUES (?, 'status', NULL, 'New', ?, ?)",
+            (grievance_id, user_id, now)
+        )
+        data = {'due_at': due_at}
+        if assigned_to:
+            data['workload'] = [None, assigned_to]
+        _log_change(conn, 'grievance.created', grievance_id, data)
+        return _row(conn, 'grievances', grievance_id)
+    
+    return _write(mutation, "Failed to create grievance", wait, shard)
 
 def get_grievance(grievance_id):
-    """Get a grievance by ID"""
-    conn = get_db_connection()
+    """Get a grievance by ID, falling through to the archive"""
+    shard = shard_of(grievance_id)
+    conn = get_shard_connection(shard)
     grievance = conn.execute('SELECT * FROM grievances WHERE id = ?', (grievance_id,)).fetchone()
     conn.close()
     
     if grievance:
         return dict(grievance)
+    
+    conn = get_archive_connection(shard)
+    if conn is not None:
+        grievance = conn.execute('SELECT * FROM archive.grievances WHERE id = ?', (grievance_id,)).fetchone()
+        conn.close()
+        if grievance:
+            return dict(grievance, archived=True)
     return None
 
-def update_grievance(grievance_id, updates):
-    """Update a grievance"""
-    allowed_fields = ['title', 'description', 'category', 'priority', 'status', 'assigned_to', 
-                      'ai_summary', 'ai_recommendation']
-    
+def _workload(before, after):
+    """[previous, new] holder of an open grievance, or None if that didn't change
+    (resolving counts as leaving the assignee's workload; see assignment.py)"""
+    old = before['assigned_to'] if before['status'] not in sla.RESOLVED_STATUSES else None
+    new = after['assigned_to'] if after['status'] not in sla.RESOLVED_STATUSES else None
+    return [old, new] if old != new else None
+
+# Fields whose changes are kept in grievance_events
+TRACKED_FIELDS = ('status', 'priority', 'category', 'assigned_to')
+# Fields update_grievance accepts
+UPDATABLE_FIELDS = ('title', 'description', 'category', 'priority', 'status', 'assigned_to',
+                    'ai_summary', 'ai_recommendation')
+
+def _record_transitions(conn, before, updates, changed_by, now):
+    """Append history rows for tracked fields that changed, updating SLA aggregates"""
+    for field in TRACKED_FIELDS:
+        if field not in updates or updates[field] == before[field]:
+            continue
+        if field == 'status':
+            last = conn.execute(
+                "SELECT created_at FROM grievance_events WHERE grievance_id = ? AND field = 'status' "
+                "ORDER BY id DESC LIMIT 1", (before['id'],)
+            ).fetchone()
+            since = last[0] if last else before['created_at']
+            sla.observe_transition(conn, before, before['status'], updates['status'], since, now)
+        conn.execute(
+            'INSERT INTO grievance_events (grievance_id, field, old_value, new_value, changed_by, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (before['id'], field, before[field], updates[field], changed_by, now)
+        )
+
+def update_grievance(grievance_id, updates, wait=True, changed_by=None):
+    """Update a grievance, recording status and assignment changes"""
     # Filter out any fields that are not allowed to be updated
-    filtered_updates = {k: v for k, v in updates.items() if k in allowed_fields}
+    filtered_updates = {k: v for k, v in updates.items() if k in UPDATABLE_FIELDS}
     
     if not filtered_updates:
         return None, "No valid fields to update"
@@ -293,155 +971,466 @@ def update_grievance(grievance_id, updates):
     filtered_updates['updated_at'] = datetime.now().isoformat()
     
     # Build the SQL query
+    fields = [field for field in filtered_updates if field != 'updated_at']
+    filtered_updates['last_activity_at'] = filtered_updates['updated_at']
+    
     set_clause = ', '.join([f"{field} = ?" for field in filtered_updates.keys()])
     values = list(filtered_updates.values())
     values.append(grievance_id)  # For the WHERE clause
     
-    conn = get_db_connection()
-    try:
+    def mutation(conn):
+        before = _row(conn, 'grievances', grievance_id)
+        if before is None:
+            return None
         conn.execute(f"UPDATE grievances SET {set_clause} WHERE id = ?", values)
-        conn.commit()
-        
-        grievance = conn.execute('SELECT * FROM grievances WHERE id = ?', (grievance_id,)).fetchone()
+        _record_transitions(conn, before, filtered_updates, changed_by, filtered_updates['updated_at'])
+        data = {'fields': fields}
+        after = dict(before, **filtered_updates)
+        workload = _workload(before, after)
+        if workload:
+            data['workload'] = workload
+        if 'priority' in filtered_updates or 'status' in filtered_updates:
+            data['due_at'] = sla.deadline(after['priority'], after['status'],
+                                          after['escalated_at'] or after['created_at'])
+            if data['due_at'] != before['due_at']:
+                conn.execute('UPDATE grievances SET due_at = ? WHERE id = ?', (data['due_at'], grievance_id))
+        _log_change(conn, 'grievance.updated', grievance_id, data)
+        return _row(conn, 'grievances', grievance_id)
+    
+    return _write(mutation, "Grievance not found", wait, shard_of(grievance_id))
+
+def escalate_grievance(grievance_id, wait=True):
+    """Escalate a grievance whose SLA deadline has passed (see scheduler.py).
+
+    Below the top priority it moves up one step; at the top it is reassigned
+    to a manager of the submitter's department. Either way its deadline
+    restarts from now. Does nothing unless the deadline has passed, so when
+    several processes fire for the same grievance only the first escalates.
+    Returns (grievance with an 'escalation' action, error).
+    """
+    def mutation(conn):
+        before = _row(conn, 'grievances', grievance_id)
+        now = datetime.now().isoformat()
+        if before is None or before['due_at'] is None or before['due_at'] > now:
+            return None
+
+        updates = {'escalated_at': now, 'updated_at': now, 'last_activity_at': now}
+        priority = sla.next_priority(before['priority'])
+        if priority:
+            updates['priority'] = priority
+            action = 'priority'
+        else:
+            manager = _department_manager(conn, before['submitter_department'], before['assigned_to'])
+            if manager:
+                updates['assigned_to'] = manager[0]
+                action = 'reassigned'
+            else:
+                action = 'notified'
+        updates['due_at'] = sla.deadline(updates.get('priority', before['priority']), before['status'], now)
+
+        set_clause = ', '.join(f"{field} = ?" for field in updates)
+        conn.execute(f"UPDATE grievances SET {set_clause} WHERE id = ?", (*updates.values(), grievance_id))
+        _record_transitions(conn, before, updates, 'system', now)
+        data = {'action': action, 'due_at': updates['due_at']}
+        workload = _workload(before, dict(before, **updates))
+        if workload:
+            data['workload'] = workload
+        _log_change(conn, 'grievance.escalated', grievance_id, data)
+        return dict(_row(conn, 'grievances', grievance_id), escalation=action)
+
+    return _write(mutation, "Grievance is not overdue", wait, shard_of(grievance_id))
+
+def _department_manager(conn, department, exclude):
+    """A manager of department other than exclude (shard writers can't see users: read the main database)"""
+    query = "SELECT id FROM users WHERE department = ? AND role = 'manager' AND id IS NOT ? LIMIT 1"
+    if not sharded():
+        return conn.execute(query, (department, exclude)).fetchone()
+    home = get_db_connection()
+    try:
+        return home.execute(query, (department, exclude)).fetchone()
+    finally:
+        home.close()
+
+def get_workloads():
+    """({staff id: department}, {assignee id: open grievance count})"""
+    placeholders = ', '.join('?' for _ in sla.RESOLVED_STATUSES)
+    conn = get_db_connection()
+    staff = conn.execute("SELECT id, department FROM users WHERE role = 'staff'").fetchall()
+    conn.close()
+    counts = {}
+    for shard in shard_ids():
+        conn = get_shard_connection(shard)
+        for assignee, count in conn.execute(
+            f'''SELECT assigned_to, COUNT(*) FROM grievances
+                WHERE assigned_to IS NOT NULL AND status NOT IN ({placeholders}) GROUP BY assigned_to''',
+            sla.RESOLVED_STATUSES
+        ).fetchall():
+            counts[assignee] = counts.get(assignee, 0) + count
         conn.close()
-        
-        if grievance:
-            return dict(grievance), None
-        return None, "Grievance not found"
-    except Exception as e:
+    return {row[0]: row[1] for row in staff}, counts
+
+def get_movable_grievances(staff_id, limit):
+    """Newest grievances assigned to staff_id that nobody has started on (status New)"""
+    rows = []
+    for shard in shard_ids():
+        conn = get_shard_connection(shard)
+        rows += conn.execute(
+            "SELECT id, created_at FROM grievances WHERE assigned_to = ? AND status = 'New' ORDER BY created_at DESC LIMIT ?",
+            (staff_id, limit)
+        ).fetchall()
         conn.close()
-        return None, str(e)
+    rows.sort(key=lambda row: row[1] or '', reverse=True)
+    return [row[0] for row in rows[:limit]]
+
+def get_due_grievances(until):
+    """(id, due_at) of open grievances whose deadline is at or before until"""
+    due = []
+    for shard in shard_ids():
+        conn = get_shard_connection(shard)
+        due += [(row[0], row[1]) for row in
+                conn.execute('SELECT id, due_at FROM grievances WHERE due_at <= ?', (until,)).fetchall()]
+        conn.close()
+    return due
+
+def _grievance_source(conn, archived):
+    """What listings read grievances from: the table, or its union with the archive's"""
+    if not archived:
+        return 'grievances'
+    columns = _columns(conn, 'grievances')
+    # Columns added since the last archive run aren't in the archive yet
+    in_archive = {row[1] for row in conn.execute('PRAGMA archive.table_info(grievances)')}
+    return f"""(SELECT {', '.join(columns)} FROM main.grievances
+                UNION ALL SELECT {', '.join(c if c in in_archive else f'NULL AS {c}' for c in columns)}
+                FROM archive.grievances) grievances"""
+
+def _newest_first(query, params, limit, offset, as_json, alias=None, archived=False, columns=None):
+    """Run a grievance listing; query has {select} and {grievances} placeholders and
+    ends with ORDER BY created_at DESC.
+
+    Sharded, it runs on every shard, cut to limit + offset rows, and the
+    results are merged by created_at (k-way, one heap step per row) before
+    the page is cut from them.
+    """
+    if not sharded():
+        conn = get_archive_connection() if archived else None
+        with_archive = conn is not None
+        if conn is None:
+            conn = get_db_connection()
+        sql = query.format(select=_select(conn, 'grievances', alias, as_json, columns=columns),
+                           grievances=_grievance_source(conn, with_archive))
+        return _fetch(conn, sql + ' LIMIT ? OFFSET ?', (*params, limit, offset), as_json)
+
+    prefix = f'{alias}.' if alias else ''
+    window = limit + offset
+    results = []
+    use_json = False
+    for shard in shard_ids():
+        conn = get_archive_connection(shard) if archived else None
+        with_archive = conn is not None
+        if conn is None:
+            conn = get_shard_connection(shard)
+        try:
+            use_json = bool(as_json) and _sqlite_json(conn)
+            select = f'{prefix}created_at, ' + _select(conn, 'grievances', alias, as_json, columns=columns)
+            sql = query.format(select=select, grievances=_grievance_source(conn, with_archive))
+            results.append(conn.execute(sql + ' LIMIT ?', (*params, window)).fetchall())
+        finally:
+            conn.close()
+    page = itertools.islice(heapq.merge(*results, key=lambda row: row[0] or '', reverse=True), offset, window)
+    if use_json:
+        text = '[' + ','.join(row[1] for row in page) + ']'
+    else:
+        rows = [dict(row) for row in page]
+        if not as_json:
+            return rows
+        text = json.dumps(rows)
+    return iter([text]) if as_json == 'stream' else text
+
+# Columns the grievance listing filters on (equality)
+GRIEVANCE_FILTERS = ('status', 'category', 'priority', 'submitted_by', 'assigned_to')
 
-def get_grievances(filters=None, limit=50, offset=0):
-    """Get grievances with optional filters"""
-    query = "SELECT * FROM grievances"
+def get_grievances(filters=None, limit=50, offset=0, as_json=False, include_archived=True):
+    """Get grievances with optional filters, archived ones included unless include_archived=False"""
+    query = "SELECT {select} FROM {grievances}"
     params = []
     
     if filters:
         conditions = []
         for key, value in filters.items():
-            if key in ['status', 'category', 'priority', 'submitted_by', 'assigned_to']:
+            if key in GRIEVANCE_FILTERS:
                 conditions.append(f"{key} = ?")
                 params.append(value)
         
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
     
-    query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
-    params.extend([limit, offset])
+    query += " ORDER BY created_at DESC"
     
-    conn = get_db_connection()
-    grievances = conn.execute(query, params).fetchall()
-    conn.close()
-    
-    return [dict(g) for g in grievances]
+    return _newest_first(query, params, limit, offset, as_json, archived=include_archived)
 
-def get_user_grievances(user_id, role, limit=50, offset=0):
-    """Get grievances relevant to a user based on their role"""
-    conn = get_db_connection()
-    
+def get_user_grievances(user_id, role, limit=50, offset=0, as_json=False, department=None, include_archived=True):
+    """Get grievances relevant to a user based on their role (archived ones
+    included unless include_archived=False).
+
+    Staff callers should pass the department of the already loaded user;
+    otherwise it is looked up.
+    """
     if role.lower() in ['admin', 'manager']:
         # Admins and managers can see all grievances
-        grievances = conn.execute(
-            'SELECT * FROM grievances ORDER BY created_at DESC LIMIT ? OFFSET ?',
-            (limit, offset)
-        ).fetchall()
+        return _newest_first('SELECT {select} FROM {grievances} ORDER BY created_at DESC',
+                             (), limit, offset, as_json, archived=include_archived)
     elif role.lower() == 'staff':
         # Staff can see grievances assigned to them or from their department
-        user = get_user_by_id(user_id)
-        if not user:
-            conn.close()
-            return []
+        if department is None:
+            user = get_user_by_id(user_id)
+            if not user:
+                return _empty(as_json)
+            department = user.get('department')
         
-        grievances = conn.execute(
-            '''SELECT g.* FROM grievances g
-               JOIN users u ON g.submitted_by = u.id
-               WHERE g.assigned_to = ? OR (u.department = ? AND g.status != 'Closed')
-               ORDER BY g.created_at DESC LIMIT ? OFFSET ?''',
-            (user_id, user.get('department'), limit, offset)
-        ).fetchall()
+        # One indexed, newest-first branch per condition, each cut to the
+        # page's end, instead of an OR that scans the whole table. The
+        # branches are disjoint so no de-duplication pass is needed.
+        window = limit + offset
+        return _newest_first(
+            '''SELECT {select} FROM (
+                   SELECT * FROM (SELECT * FROM {grievances} WHERE assigned_to = ?
+                                  ORDER BY created_at DESC LIMIT ?)
+                   UNION ALL
+                   SELECT * FROM (SELECT * FROM {grievances}
+                                  WHERE submitter_department = ? AND status != 'Closed'
+                                    AND (assigned_to IS NULL OR assigned_to != ?)
+                                  ORDER BY created_at DESC LIMIT ?)
+               ) g
+               ORDER BY g.created_at DESC''',
+            (user_id, window, department, user_id, window), limit, offset, as_json, alias='g',
+            archived=include_archived
+        )
     else:
         # Regular users can only see their own grievances
-        grievances = conn.execute(
-            'SELECT * FROM grievances WHERE submitted_by = ? ORDER BY created_at DESC LIMIT ? OFFSET ?',
-            (user_id, limit, offset)
-        ).fetchall()
-    
-    conn.close()
-    return [dict(g) for g in grievances]
+        return _newest_first('SELECT {select} FROM {grievances} WHERE submitted_by = ? ORDER BY created_at DESC',
+                             (user_id,), limit, offset, as_json, archived=include_archived)
+
+# Facet counts for the filter UI
+FACETS = ('status', 'category', 'priority')
+FACET_CACHE_SECONDS = 60
+_facet_rollups = {}
+
+def _facet_rollup(scope):
+    """Grievance counts grouped by every facet column, for one scope.
+
+    The rollup doesn't depend on the facet filters themselves, so it is cached
+    per scope (submitted_by/assigned_to) until the change feed moves on, and
+    at most FACET_CACHE_SECONDS to cover writes that bypass it.
+    """
+    version = tuple(latest_change_id(shard) for shard in shard_ids())
+    key = tuple(sorted(scope.items()))
+    cached = _facet_rollups.get(key)
+    if cached and cached[0] == version and time.monotonic() - cached[1] < FACET_CACHE_SECONDS:
+        return cached[2]
+
+    query = f"SELECT {', '.join(FACETS)}, COUNT(*) AS n FROM grievances"
+    if scope:
+        query += " WHERE " + " AND ".join(f"{key} = ?" for key in scope)
+    totals = {}
+    for shard in shard_ids():
+        conn = get_shard_connection(shard)
+        for row in conn.execute(query + f" GROUP BY {', '.join(FACETS)}", list(scope.values())).fetchall():
+            totals[tuple(row[:-1])] = totals.get(tuple(row[:-1]), 0) + row[-1]
+        conn.close()
+
+    rollup = [(*values, count) for values, count in totals.items()]
+    if len(_facet_rollups) >= 256:
+        _facet_rollups.clear()
+    _facet_rollups[key] = (version, time.monotonic(), rollup)
+    return rollup
+
+def get_grievance_facets(filters=None, facets=FACETS):
+    """Counts per value of each requested facet under the current filters.
+
+    Each facet ignores its own filter (so the UI can show what selecting
+    another value would give) but honours all the others.
+    """
+    filters = filters or {}
+    facets = [facet for facet in facets if facet in FACETS]
+    scope = {key: value for key, value in filters.items() if key in ('submitted_by', 'assigned_to')}
+    active = [(FACETS.index(key), value) for key, value in filters.items() if key in FACETS]
+
+    counts = {facet: {} for facet in facets}
+    for row in _facet_rollup(scope):
+        for facet in facets:
+            position = FACETS.index(facet)
+            if all(row[i] == value for i, value in active if i != position):
+                bucket = counts[facet]
+                bucket[row[position]] = bucket.get(row[position], 0) + row[-1]
+    return counts
+
+def get_grievance_statistics(submitted_by=None):
+    """Totals by status, category and priority, and the five newest grievances
+    (of everyone, or of one submitter); counts come from the facet rollup"""
+    rollup = _facet_rollup({'submitted_by': submitted_by} if submitted_by else {})
+    by_facet = {facet: {} for facet in FACETS}
+    for row in rollup:
+        for position, facet in enumerate(FACETS):
+            by_facet[facet][row[position]] = by_facet[facet].get(row[position], 0) + row[-1]
+    query = 'SELECT {select} FROM {grievances}'
+    if submitted_by:
+        query += ' WHERE submitted_by = ?'
+    recent = _newest_first(query + ' ORDER BY created_at DESC', (submitted_by,) if submitted_by else (), 5, 0,
+                           False, columns=('id', 'title', 'status', 'priority', 'created_at'))
+    return {
+        'total_grievances': sum(row[-1] for row in rollup),
+        **{f'by_{facet}': [{facet: value, 'count': count} for value, count in sorted(counts.items())]
+           for facet, counts in by_facet.items()},
+        'recent_grievances': recent,
+    }
 
 # Comment functions
-def add_comment(grievance_id, user_id, content):
+def add_comment(grievance_id, user_id, content, wait=True):
     """Add a comment to a grievance"""
-    conn = get_db_connection()
-    comment_id = str(uuid.uuid4())
-    now = datetime.now().isoformat()
-    
-    try:
+    def mutation(conn):
+        comment_id = ids.new_id()
+        now = datetime.now().isoformat()
         conn.execute(
             'INSERT INTO comments (id, grievance_id, user_id, content, created_at) VALUES (?, ?, ?, ?, ?)',
             (comment_id, grievance_id, user_id, content, now)
         )
-        conn.commit()
-        
-        comment = conn.execute('SELECT * FROM comments WHERE id = ?', (comment_id,)).fetchone()
-        conn.close()
-        
-        if comment:
-            return dict(comment), None
-        return None, "Failed to add comment"
-    except Exception as e:
+        conn.execute('UPDATE grievances SET comment_count = comment_count + 1, last_activity_at = ? WHERE id = ?',
+                     (now, grievance_id))
+        _log_change(conn, 'comment.added', grievance_id, {'comment_id': comment_id})
+        return _row(conn, 'comments', comment_id)
+    
+    return _write(mutation, "Failed to add comment", wait, shard_of(grievance_id))
+
+# Comment threads are read a page at a time, ordered by (created_at, id) and
+# addressed by keyset cursors, so polling for new comments or scrolling back
+# reads only the rows returned, through idx_comments_grievance.
+COMMENT_PAGE_SIZE = 50
+COMMENT_PAGE_MAX = 500
+USER_NAME_CACHE_SECONDS = 300
+_user_names = {}
+_user_names_cleared = time.monotonic()
+
+def encode_cursor(*values):
+    """Opaque pagination cursor for a row's sort key"""
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, size=2):
+    """Sort key from encode_cursor(); raises ValueError if it isn't one"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+def _user_name_map(conn, user_ids):
+    """Names for user ids, from a process-wide cache (USER_NAME_CACHE_SECONDS; renames clear it)"""
+    global _user_names_cleared
+    if time.monotonic() - _user_names_cleared > USER_NAME_CACHE_SECONDS:
+        _user_names.clear()
+        _user_names_cleared = time.monotonic()
+    missing = [user_id for user_id in set(user_ids) if user_id not in _user_names]
+    for start in range(0, len(missing), 500):
+        chunk = missing[start:start + 500]
+        placeholders = ', '.join('?' for _ in chunk)
+        # Unqualified: on a shard connection users is the attached main database's
+        for row in conn.execute(f'SELECT id, name FROM users WHERE id IN ({placeholders})', chunk):
+            _user_names[row[0]] = row[1]
+    return {user_id: _user_names.get(user_id) for user_id in user_ids}
+
+def _comment_rows(grievance_id, archived, since=None, before=None, limit=None):
+    """Comments oldest first: after since, else the limit just before before (or the newest)"""
+    shard = shard_of(grievance_id)
+    conn = get_archive_connection(shard) if archived else get_shard_connection(shard)
+    if conn is None:
+        return []
+    schema = 'archive' if archived else 'main'
+    clauses, params = ['grievance_id = ?'], [grievance_id]
+    if since:
+        created_at, comment_id = decode_cursor(since)
+        clauses.append('created_at >= ? AND (created_at > ? OR id > ?)')
+        params += [created_at, created_at, comment_id]
+    if before:
+        created_at, comment_id = decode_cursor(before)
+        clauses.append('created_at <= ? AND (created_at < ? OR id < ?)')
+        params += [created_at, created_at, comment_id]
+    # Without since, a limited page is the newest comments: read backwards
+    order = 'DESC' if limit and not since else 'ASC'
+    query = f'''SELECT * FROM {schema}.comments WHERE {' AND '.join(clauses)}
+                ORDER BY created_at {order}, id {order}'''
+    if limit:
+        query += ' LIMIT ?'
+        params.append(limit)
+    try:
+        rows = [dict(row) for row in conn.execute(query, params).fetchall()]
+        names = _user_name_map(conn, [row['user_id'] for row in rows])
+    finally:
         conn.close()
-        return None, str(e)
+    if order == 'DESC':
+        rows.reverse()
+    for row in rows:
+        row['user_name'] = names[row['user_id']]
+    return rows
 
-def get_grievance_comments(grievance_id):
-    """Get all comments for a grievance"""
-    conn = get_db_connection()
-    comments = conn.execute(
-        '''SELECT c.*, u.name as user_name 
-           FROM comments c
-           JOIN users u ON c.user_id = u.id
-           WHERE c.grievance_id = ?
-           ORDER BY c.created_at ASC''',
-        (grievance_id,)
-    ).fetchall()
-    conn.close()
-    
-    return [dict(c) for c in comments]
+def get_grievance_comments(grievance_id, as_json=False, archived=False):
+    """Get all comments for a grievance (archived: read them from the archive)"""
+    rows = _comment_rows(grievance_id, archived)
+    return json.dumps(rows) if as_json else rows
+
+def get_comment_page(grievance_id, since=None, before=None, limit=COMMENT_PAGE_SIZE, archived=False):
+    """A page of a grievance's comments, oldest first, with cursors.
+
+    since=cursor returns up to limit comments after it (poll with the returned
+    next_cursor to get only new ones); before=cursor the limit comments just
+    before it; neither, the newest limit. next_cursor points at the newest
+    comment returned (or is since, if there was none); prev_cursor at the
+    oldest, or is None once the start of the thread is reached. Raises
+    ValueError for malformed cursors.
+    """
+    limit = max(1, min(int(limit), COMMENT_PAGE_MAX))
+    # One extra row tells whether there is anything older
+    rows = _comment_rows(grievance_id, archived, since, before, limit if since else limit + 1)
+    more_before = False
+    if not since and len(rows) > limit:
+        rows = rows[1:]
+        more_before = True
+    return {
+        'comments': rows,
+        'next_cursor': encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if rows else since,
+        'prev_cursor': encode_cursor(rows[0]['created_at'], rows[0]['id']) if more_before else None,
+        'has_more': bool(since) and len(rows) == limit,
+    }
 
 # Attachment functions
-def add_attachment(grievance_id, file_name, file_path, user_id):
+def add_attachment(grievance_id, file_name, file_path, user_id, wait=True):
     """Add an attachment to a grievance"""
-    conn = get_db_connection()
-    attachment_id = str(uuid.uuid4())
-    
-    try:
+    def mutation(conn):
+        attachment_id = ids.new_id()
+        now = datetime.now().isoformat()
         conn.execute(
-            'INSERT INTO attachments (id, grievance_id, file_name, file_path, uploaded_by) VALUES (?, ?, ?, ?, ?)',
-            (attachment_id, grievance_id, file_name, file_path, user_id)
+            'INSERT INTO attachments (id, grievance_id, file_name, file_path, uploaded_by, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (attachment_id, grievance_id, file_name, file_path, user_id, now)
         )
-        conn.commit()
-        
-        attachment = conn.execute('SELECT * FROM attachments WHERE id = ?', (attachment_id,)).fetchone()
-        conn.close()
-        
-        if attachment:
-            return dict(attachment), None
-        return None, "Failed to add attachment"
-    except Exception as e:
-        conn.close()
-        return None, str(e)
-
-def get_grievance_attachments(grievance_id):
-    """Get all attachments for a grievance"""
-    conn = get_db_connection()
-    attachments = conn.execute(
-        'SELECT * FROM attachments WHERE grievance_id = ? ORDER BY created_at DESC',
-        (grievance_id,)
-    ).fetchall()
-    conn.close()
+        conn.execute('UPDATE grievances SET attachment_count = attachment_count + 1, last_activity_at = ? WHERE id = ?',
+                     (now, grievance_id))
+        return _row(conn, 'attachments', attachment_id)
     
-    return [dict(a) for a in attachments]
+    return _write(mutation, "Failed to add attachment", wait, shard_of(grievance_id))
+
+def get_grievance_attachments(grievance_id, as_json=False, archived=False):
+    """Get all attachments for a grievance (archived: read them from the archive)"""
+    shard = shard_of(grievance_id)
+    conn = get_archive_connection(shard) if archived else get_shard_connection(shard)
+    if conn is None:
+        return _empty(as_json)
+    schema = 'archive' if archived else 'main'
+    return _fetch(
+        conn,
+        f'SELECT {_select(conn, "attachments", as_json=as_json)} FROM {schema}.attachments WHERE grievance_id = ? ORDER BY created_at DESC',
+        (grievance_id,), as_json
+    )
 
 def view_grievence():
     conn = get_db_connection()
@@ -472,29 +1461,47 @@ def update_profile(user_id, updates):
         raise ValueError("User not found")
     
     # Update allowed fields
-
-    print(updates)
     
-    conn = get_db_connection()
+    # Hash before queueing the write so a busy pool doesn't hold the writer
+    new_hash = hashing.hash_password(updates["password"]) if "password" in updates else None
 
-    if "name" in updates:
-        conn.execute('UPDATE users SET name = ? WHERE id = ?', (updates["name"], user_id))
+    def mutation(conn):
+        if "name" in updates:
+            conn.execute('UPDATE users SET name = ? WHERE id = ?', (updates["name"], user_id))
+            _bump_directory(conn, user['department'])
+        if "department" in updates:
+            conn.execute('UPDATE users SET department = ? WHERE id = ?', (updates["department"], user_id))
+            _bump_directory(conn, user['department'], updates["department"])
+            if not sharded():
+                conn.execute('UPDATE grievances SET submitter_department = ? WHERE submitted_by = ?',
+                             (updates["department"], user_id))
+        if "password" in updates:
+            conn.execute('UPDATE users SET password = ? WHERE id = ?', (new_hash, user_id))
+        return True
 
-    if "department" in updates:        
-        conn.execute('UPDATE users SET department = ? WHERE id = ?', (updates["department"], user_id))
-    
-    if "password" in updates:
-        conn.execute('UPDATE users SET password = ? WHERE id = ?', (generate_password_hash(updates["password"]), user_id))
+    def move_grievances(conn):
+        conn.execute('UPDATE grievances SET submitter_department = ? WHERE submitted_by = ?',
+                     (updates["department"], user_id))
+        return True
+
+    futures = [_write(mutation, None, wait=False)]
+    if "department" in updates and sharded():
+        # The grievances stay in their shard; listings read every shard anyway
+        futures += [_write(move_grievances, None, wait=False, shard=shard) for shard in shard_ids()]
+    for future in futures:
+        future.result()
+    if "name" in updates:
+        _user_names.pop(user_id, None)
 
-    conn.commit()
-        
     return user
 
 def forgot_password(email, password):
-    conn = get_db_connection()
     if get_user_by_email(email):
-        conn.execute('UPDATE users SET password = ? WHERE email = ?', (generate_password_hash(password), email))
+        new_hash = hashing.hash_password(password)
+        conn = get_db_connection()
+        conn.execute('UPDATE users SET password = ? WHERE email = ?', (new_hash, email))
         conn.commit()
+        conn.close()
         return True
     return False
 
@@ -0,0 +1,482 @@
+import errno
+import json
+import os
+import selectors
+import socket
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import db
+import metrics
+
+# Live grievance updates over server-sent events.
+#
+# db.create_grievance/update_grievance/add_comment append a row to the
+# change_events table in the same transaction as the change. One watcher
+# thread per process copies new rows into an in-memory ring buffer (the hub)
+# and wakes every subscriber. Writes from other worker processes are picked up
+# by polling PRAGMA data_version, which doesn't read any table, so nothing is
+# read from the database while nothing changes; local writes wake the watcher
+# immediately through db.on_change.
+#
+# With sharded storage (see db.py) each shard has its own change_events and
+# ids count per shard, so a position in the feed is a tuple of the last id
+# seen from each shard, sent to clients as the event id "12.7.30" (a plain
+# "12" when not sharded). The watcher polls every shard's data_version.
+#
+# A subscriber holds only its user, the last position it has seen and its
+# unsent output. The request thread sends the response headers and then hands
+# the connection to the broadcaster, one thread per worker that multiplexes
+# every stream with a selector: when the hub moves it writes each subscriber
+# the events it may see, and every EVENTS_HEARTBEAT seconds it sends idle ones
+# a comment line to keep proxies from closing the connection. The request
+# thread is free again as soon as the headers are out, so idle streams cost a
+# socket and a few hundred bytes each (mind the worker's open file limit).
+#
+# Handing over a connection needs the server's help: server.py's workers and
+# the gthread worker in gunicorn.conf.py put environ['server.hijack'] in each
+# request, which returns a duplicate of the client socket and keeps the
+# server from closing it. Under any other server (flask run, python app.py)
+# a stream falls back to blocking its request thread on the hub.
+#
+# A worker takes at most EVENTS_MAX_SUBSCRIBERS streams, and of those at most
+# EVENTS_MAX_THREAD_STREAMS (half of WEB_THREADS) on request threads; further
+# clients get a 503 and fall back to reloading periodically (see
+# use-grievance-events.ts). A subscriber whose output backs up past
+# EVENTS_MAX_BUFFERED bytes is disconnected and resumes from its last event id.
+
+BUFFER_SIZE = int(os.environ.get('EVENTS_BUFFER', 1000))
+RETAIN = int(os.environ.get('EVENTS_RETAIN', 10000))          # rows kept in change_events
+HEARTBEAT = float(os.environ.get('EVENTS_HEARTBEAT', 15))
+POLL_INTERVAL = float(os.environ.get('EVENTS_POLL_INTERVAL', 0.5))
+MAX_SUBSCRIBERS = int(os.environ.get('EVENTS_MAX_SUBSCRIBERS', 10000))
+MAX_THREAD_STREAMS = int(os.environ.get('EVENTS_MAX_THREAD_STREAMS',
+                                        max(1, int(os.environ.get('WEB_THREADS', 8)) // 2)))
+MAX_BUFFERED = int(os.environ.get('EVENTS_MAX_BUFFERED', 256 * 1024))
+PRUNE_INTERVAL = 600
+RETRY_MS = 3000
+
+
+def _behind(position, last):
+    return any(seen < latest for seen, latest in zip(position, last))
+
+
+class Hub:
+    """Ring buffer of recent change events with blocking waits"""
+
+    def __init__(self, size=BUFFER_SIZE, shards=1):
+        self.buffer = deque(maxlen=size)
+        self.last_id = (0,) * shards  # Position: last id per shard
+        self.subscribers = 0
+        self.threaded = 0  # Subscribers streaming from a request thread
+        self.closed = False
+        self.cond = threading.Condition()
+        self.listeners = []
+
+    def publish(self, events):
+        """Append events (each one shard's, oldest first); each gets its 'position'"""
+        with self.cond:
+            position = list(self.last_id)
+            for event in events:
+                if event['id'] > position[event['shard']]:
+                    position[event['shard']] = event['id']
+                    event['position'] = tuple(position)
+                    self.buffer.append(event)
+            self.last_id = tuple(position)
+            self.cond.notify_all()
+        for listener in self.listeners:
+            listener()
+
+    def since(self, after):
+        """Buffered events after position after, or None if some were already evicted"""
+        if not _behind(after, self.last_id):
+            return []
+        first = {}
+        events = []
+        for event in self.buffer:
+            first.setdefault(event['shard'], event['id'])
+            if event['id'] > after[event['shard']]:
+                events.append(event)
+        for shard, (seen, latest) in enumerate(zip(after, self.last_id)):
+            if seen < latest and first.get(shard, latest + 1) > seen + 1:
+                return None
+        return events
+
+    def wait(self, after, timeout):
+        with self.cond:
+            if not _behind(after, self.last_id) and not self.closed:
+                self.cond.wait(timeout)
+            return self.since(after)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        for listener in self.listeners:
+            listener()
+
+
+hub = Hub(shards=db.SHARDS)
+_wake = threading.Event()
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def _to_event(row):
+    event = dict(row)
+    event['data'] = json.loads(event['data'] or '{}')
+    return event
+
+
+def _watch():
+    """Copy new change_events rows into the hub"""
+    conns = [sqlite3.connect(db.shard_database(shard), check_same_thread=False) for shard in db.shard_ids()]
+    versions = [None] * len(conns)
+    last_prune = time.monotonic()
+    try:
+        while not hub.closed:
+            for shard, conn in enumerate(conns):
+                current = conn.execute('PRAGMA data_version').fetchone()[0]
+                if current == versions[shard]:
+                    continue
+                versions[shard] = current
+                rows = db.get_changes(hub.last_id[shard], shard=shard)
+                while rows:
+                    hub.publish([_to_event(row) for row in rows])
+                    rows = db.get_changes(hub.last_id[shard], shard=shard) if len(rows) == 500 else []
+
+            if time.monotonic() - last_prune > PRUNE_INTERVAL:
+                last_prune = time.monotonic()
+                db.prune_changes(RETAIN)
+
+            _wake.wait(POLL_INTERVAL)
+            _wake.clear()
+    except Exception as e:
+        print(f"Event watcher stopped: {e}")
+    finally:
+        for conn in conns:
+            conn.close()
+
+
+def start():
+    """Start the watcher thread (once per process, after any fork)"""
+    global _watcher
+    if _watcher is not None and _watcher.is_alive():
+        return
+    with _watcher_lock:
+        if _watcher is None or not _watcher.is_alive():
+            # Only changes made from now on are pushed; older ones come from resume
+            hub.last_id = tuple(max(seen, db.latest_change_id(shard))
+                                for shard, seen in zip(db.shard_ids(), hub.last_id))
+            _watcher = threading.Thread(target=_watch, name='events-watcher', daemon=True)
+            _watcher.start()
+
+
+@db.on_change
+def _changed(kind, grievance_id, data):
+    _wake.set()
+
+
+def shutdown(wait=True):
+    """End all streams so in-flight requests can finish; wait=False from signal handlers"""
+    hub.close()
+    _wake.set()
+    thread = broadcaster.thread
+    if wait and thread is not None:
+        # Let it send the closing chunks before the process exits
+        thread.join(5)
+
+
+def visible(event, user):
+    """Same rules as db.get_user_grievances"""
+    role = (user.get('role') or '').lower()
+    if role in ('admin', 'manager'):
+        return True
+    if role == 'staff':
+        return (event['assigned_to'] == user['id']
+                or (event['department'] == user.get('department') and event['status'] != 'Closed'))
+    return event['submitted_by'] == user['id']
+
+
+def format_id(position):
+    return '.'.join(str(value) for value in position)
+
+
+def parse_id(value):
+    """Position from a Last-Event-ID, or None if it isn't one for this shard count"""
+    parts = value.split('.') if value else []
+    if len(parts) != len(hub.last_id) or not all(part.isdigit() for part in parts):
+        return None
+    return tuple(int(part) for part in parts)
+
+
+def _format(event):
+    data = dict(event['data'], grievance_id=event['grievance_id'], status=event['status'],
+                at=event['created_at'])
+    return f"id: {format_id(event['position'])}\nevent: {event['kind']}\ndata: {json.dumps(data)}\n\n"
+
+
+def _replay(after):
+    """Events evicted from the buffer, read back from change_events"""
+    events = []
+    for shard, (seen, latest) in enumerate(zip(after, hub.last_id)):
+        if seen >= latest:
+            continue
+        rows = db.get_changes(seen, limit=hub.buffer.maxlen, shard=shard)
+        if not rows or rows[0]['id'] != seen + 1:
+            return None
+        events += [_to_event(row) for row in rows]
+    # Interleave the shards by time, tracking the position after each event
+    events.sort(key=lambda event: event['created_at'])
+    position = list(after)
+    for event in events:
+        position[event['shard']] = event['id']
+        event['position'] = tuple(position)
+    return events
+
+
+def reserve(threaded):
+    """Take a subscriber slot, or return False when the worker has none left"""
+    with hub.cond:
+        if hub.subscribers >= MAX_SUBSCRIBERS or (threaded and hub.threaded >= MAX_THREAD_STREAMS):
+            return False
+        hub.subscribers += 1
+        hub.threaded += threaded
+    metrics.gauge_add('events_subscribers', (), 1)
+    return True
+
+
+def release(threaded):
+    with hub.cond:
+        hub.subscribers -= 1
+        hub.threaded -= threaded
+    metrics.gauge_add('events_subscribers', (), -1)
+
+
+class HandedOff(ConnectionError):
+    """Ends the request once its connection belongs to the broadcaster"""
+
+
+class Stream:
+    """Response body of one subscriber; holds a slot (see reserve()) until closed.
+
+    hijack is environ['server.hijack'] when the server supports it.
+    """
+
+    def __init__(self, user, last_id=None, hijack=None):
+        self.user = user
+        self.last_id = last_id
+        self.hijack = hijack
+        self.threaded = hijack is None
+        self.owned = True
+
+    def __iter__(self):
+        start()
+        yield f'retry: {RETRY_MS}\n\n'
+        if self.hijack is None:
+            yield from _thread_stream(self.user, self.last_id)
+            return
+        # The headers and the retry line are out; the rest is the broadcaster's
+        sock, chunked = self.hijack()
+        self.owned = False
+        broadcaster.add(_Client(sock, chunked, self.user, self.last_id))
+        raise HandedOff(errno.EPIPE, 'Stream handed off to the event broadcaster')
+
+    def close(self):
+        if self.owned:
+            self.owned = False
+            release(self.threaded)
+
+
+def _thread_stream(user, last_id):
+    """Events for one subscriber, blocking the calling thread between them"""
+    if last_id is None or _behind(hub.last_id, last_id):
+        last_id = hub.last_id
+    sent = time.monotonic()
+    while not hub.closed:
+        events = hub.wait(last_id, HEARTBEAT)
+        if events is None:
+            events = _replay(last_id)
+            if events is None:
+                # Too far behind: the client should reload instead
+                last_id = hub.last_id
+                yield _reset(last_id)
+                sent = time.monotonic()
+                continue
+
+        for event in events:
+            last_id = event['position']
+            if visible(event, user):
+                yield _format(event)
+                sent = time.monotonic()
+
+        if time.monotonic() - sent >= HEARTBEAT:
+            yield ': heartbeat\n\n'
+            sent = time.monotonic()
+
+
+def _reset(position):
+    return f'id: {format_id(position)}\nevent: reset\ndata: {{}}\n\n'
+
+
+# Broadcaster
+
+class _Client:
+    __slots__ = ('sock', 'chunked', 'user', 'position', 'out', 'sent', 'writing')
+
+    def __init__(self, sock, chunked, user, last_id):
+        self.sock = sock
+        self.chunked = chunked
+        self.user = user
+        self.position = last_id
+        self.out = bytearray()
+        self.sent = time.monotonic()
+        self.writing = False
+
+    def queue(self, text):
+        data = text.encode()
+        if self.chunked:
+            self.out += b'%x\r\n%s\r\n' % (len(data), data)
+        else:
+            self.out += data
+        self.sent = time.monotonic()
+
+
+class Broadcaster:
+    """One thread per worker writing every handed-off stream"""
+
+    def __init__(self):
+        self.thread = None
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.clients = {}
+        self.waker = None
+        self.wake_pipe = None
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                # Created here, after any fork, so every worker has its own
+                self.wake_pipe, self.waker = socket.socketpair()
+                self.wake_pipe.setblocking(False)
+                self.waker.setblocking(False)
+                self.thread = threading.Thread(target=self._run, name='events-broadcaster', daemon=True)
+                self.thread.start()
+
+    def add(self, client):
+        self.start()
+        client.sock.setblocking(False)
+        self.pending.append(client)
+        self.wake()
+
+    def wake(self):
+        if self.waker is not None:
+            try:
+                self.waker.send(b'x')
+            except (BlockingIOError, OSError):
+                pass  # Already awake (the pipe is full) or shutting down
+
+    def _run(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self.wake_pipe, selectors.EVENT_READ)
+        try:
+            while not hub.closed:
+                for key, mask in selector.select(1.0):
+                    if key.fileobj is self.wake_pipe:
+                        try:
+                            while self.wake_pipe.recv(4096):
+                                pass
+                        except BlockingIOError:
+                            pass
+                    elif mask & selectors.EVENT_READ and not self._readable(key.data):
+                        self._drop(selector, key.data)
+                while self.pending:
+                    client = self.pending.popleft()
+                    if client.position is None or _behind(hub.last_id, client.position):
+                        client.position = hub.last_id
+                    self.clients[client.sock.fileno()] = client
+                    selector.register(client.sock, selectors.EVENT_READ, client)
+                self._deliver()
+                for client in list(self.clients.values()):
+                    if client.out and not self._flush(selector, client):
+                        self._drop(selector, client)
+        except Exception as e:
+            print(f"Event broadcaster stopped: {e}")
+        finally:
+            for client in list(self.clients.values()) + list(self.pending):
+                if client.chunked:
+                    client.out += b'0\r\n\r\n'
+                try:
+                    client.sock.send(client.out)
+                except OSError:
+                    pass
+                self._drop(selector, client)
+            self.pending.clear()
+            selector.close()
+            self.wake_pipe.close()
+            self.waker.close()
+            self.waker = None
+
+    def _readable(self, client):
+        """False once the client has gone away (anything it sends is ignored)"""
+        try:
+            return bool(client.sock.recv(4096))
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+
+    def _deliver(self):
+        """Queue new events and heartbeats; clients at the same position share one lookup"""
+        now = time.monotonic()
+        latest = hub.last_id
+        found = {}
+        for client in self.clients.values():
+            if _behind(client.position, latest):
+                if client.position not in found:
+                    with hub.cond:
+                        events = hub.since(client.position)
+                    found[client.position] = events if events is not None else _replay(client.position)
+                events = found[client.position]
+                if events is None:
+                    # Too far behind: the client should reload instead
+                    client.position = latest
+                    client.queue(_reset(latest))
+                    continue
+                for event in events:
+                    client.position = event['position']
+                    if visible(event, client.user):
+                        client.queue(_format(event))
+            if now - client.sent >= HEARTBEAT:
+                client.queue(': heartbeat\n\n')
+
+    def _flush(self, selector, client):
+        """Send what the socket takes now; False if the client is gone or too far behind"""
+        try:
+            sent = client.sock.send(client.out)
+            del client.out[:sent]
+        except BlockingIOError:
+            pass
+        except OSError:
+            return False
+        if len(client.out) > MAX_BUFFERED:
+            return False
+        writing = bool(client.out)
+        if writing != client.writing:
+            client.writing = writing
+            selector.modify(client.sock, selectors.EVENT_READ | (selectors.EVENT_WRITE if writing else 0), client)
+        return True
+
+    def _drop(self, selector, client):
+        if self.clients.pop(client.sock.fileno(), None) is not None:
+            selector.unregister(client.sock)
+        client.sock.close()
+        release(False)
+
+
+broadcaster = Broadcaster()
+hub.listeners.append(broadcaster.wake)
@@ -0,0 +1,76 @@
+# gunicorn settings equivalent to server.py:
+#
+#     gunicorn -c gunicorn.conf.py app:app
+import os
+
+from gunicorn.workers.gthread import ThreadWorker
+
+bind = f"{os.environ.get('WEB_HOST', '0.0.0.0')}:{os.environ.get('WEB_PORT', '5000')}"
+workers = int(os.environ.get('WEB_WORKERS', os.cpu_count() or 2))
+threads = int(os.environ.get('WEB_THREADS', 8))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+
+# Import the app in the master so setup happens once, before forking
+preload_app = True
+
+
+def on_starting(server):
+    import app
+    app.init_storage()
+
+
+def post_fork(server, worker):
+    import app
+    app.warm_up()
+
+
+class Worker(ThreadWorker):
+    """gthread worker that lets /api/events take over its connection.
+
+    environ['server.hijack'] works as in server.py: the events broadcaster
+    gets a duplicate of the client socket and the worker drops its own
+    handle without closing the connection.
+    """
+
+    def init_process(self):
+        self.handed_off = set()
+        super().init_process()
+
+    def load_wsgi(self):
+        super().load_wsgi()
+        wsgi = self.wsgi
+
+        def app(environ, start_response):
+            if environ.get('SERVER_PROTOCOL', '').startswith('HTTP/1'):
+                environ['server.hijack'] = lambda: self.hijack(environ)
+            return wsgi(environ, start_response)
+
+        self.wsgi = app
+
+    def hijack(self, environ):
+        sock = environ['gunicorn.socket']
+        self.handed_off.add(sock)
+        # gunicorn chunks bodies without a Content-Length for HTTP/1.1 clients
+        return sock.dup(), environ['SERVER_PROTOCOL'] != 'HTTP/1.0'
+
+    def finish_request(self, conn, fs):
+        if conn.sock in self.handed_off:
+            self.handed_off.discard(conn.sock)
+            self.nr_conns -= 1
+            conn.sock.close()
+        else:
+            super().finish_request(conn, fs)
+
+    def handle_exit(self, sig, frame):
+        # End event streams as soon as the drain starts, not after it
+        import app
+        app.events.shutdown(wait=False)
+        super().handle_exit(sig, frame)
+
+
+worker_class = Worker
+
+
+def worker_exit(server, worker):
+    import app
+    app.shutdown()
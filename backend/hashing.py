@@ -0,0 +1,132 @@
+import os
+import threading
+
+# Password hashing configuration (read from the environment on every call so
+# values loaded later by load_dotenv() in app.py are still picked up)
+DEFAULT_HASH_METHOD = 'pbkdf2:sha256:600000'
+DEFAULT_SALT_LENGTH = 16
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_slots = None
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing pool is saturated and the request should be retried"""
+
+    def __init__(self, retry_after=1):
+        super().__init__("Password hashing is busy, please retry shortly")
+        self.retry_after = retry_after
+
+
+def get_settings():
+    """Return the hashing configuration as a dict"""
+    pool_size = int(os.environ.get('PASSWORD_POOL_SIZE', max(1, (os.cpu_count() or 2) // 2)))
+    return {
+        'method': os.environ.get('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD),
+        'salt_length': int(os.environ.get('PASSWORD_SALT_LENGTH', DEFAULT_SALT_LENGTH)),
+        'pool_size': pool_size,
+        'queue_depth': int(os.environ.get('PASSWORD_QUEUE_DEPTH', pool_size * 8)),
+        'timeout': float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10)),
+    }
+
+
+def _get_pool(settings):
+    """Create the process pool on first use (and again after a fork).
+
+    Workers start from a forkserver (spawn where that is unavailable): forking
+    the threaded server process directly could copy locks held by other threads.
+    """
+    global _pool, _pool_pid, _slots
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # Imported here: multiprocessing is only needed once hashing starts
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pool = ProcessPoolExecutor(max_workers=settings['pool_size'],
+                                        mp_context=multiprocessing.get_context(method))
+            _pool_pid = os.getpid()
+            _slots = threading.BoundedSemaphore(settings['queue_depth'])
+    return _pool
+
+
+def _run(fn, *args):
+    """Run fn in the pool, rejecting immediately when the queue is full.
+
+    A slot is held until the job finishes, even if the caller stopped waiting
+    for it, so queue_depth bounds the work actually queued in the pool.
+    """
+    settings = get_settings()
+    if settings['pool_size'] <= 0:
+        # Pool disabled (CLI tools, single-threaded scripts): hash inline
+        return fn(*args)
+
+    from concurrent.futures import TimeoutError as FutureTimeout
+
+    pool = _get_pool(settings)
+    slots = _slots
+    if not slots.acquire(blocking=False):
+        raise HasherBusy()
+
+    try:
+        future = pool.submit(fn, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+
+    try:
+        return future.result(timeout=settings['timeout'])
+    except FutureTimeout:
+        raise HasherBusy()
+
+
+def needs_rehash(pwhash, settings=None):
+    """Check whether a stored hash was made with outdated parameters"""
+    settings = settings or get_settings()
+    try:
+        stored_method, salt, _ = pwhash.split('$', 2)
+    except ValueError:
+        return True
+
+    wanted = settings['method'].split(':')
+    # A configured method may omit trailing parameters (e.g. "pbkdf2:sha256"),
+    # in which case only the parts that were given are compared
+    if stored_method.split(':')[:len(wanted)] != wanted:
+        return True
+    return len(salt) != settings['salt_length']
+
+
+def hash_password(password):
+    """Hash a password in the pool with the configured parameters"""
+    # werkzeug is imported lazily: it pulls in the whole package (~100 ms)
+    from werkzeug.security import generate_password_hash
+
+    settings = get_settings()
+    return _run(generate_password_hash, password, settings['method'], settings['salt_length'])
+
+
+def verify_password(pwhash, password):
+    """Check a password in the pool.
+
+    Returns (valid, needs_rehash) so callers can upgrade the stored hash
+    after a successful login.
+    """
+    from werkzeug.security import check_password_hash
+
+    valid = _run(check_password_hash, pwhash, password)
+    return valid, valid and needs_rehash(pwhash)
+
+
+def shutdown(wait=True):
+    """Stop the worker processes"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=wait)
+        _pool = None
@@ -0,0 +1,226 @@
+"""Time-ordered primary keys (UUIDv7, RFC 9562).
+
+new_id() returns a UUID whose first 48 bits are the Unix time in
+milliseconds, followed by a 12-bit counter and 62 random bits, in the usual
+36-character text form. Keys made later sort later, so inserts append to the
+right edge of the primary key B-tree instead of splitting pages all over it
+(as uuid4 keys do), and id order follows creation order. Within one
+millisecond the counter keeps ids from a process strictly increasing.
+
+With sharded storage (see db.py) a grievance id also carries its shard
+number in the six random bits after the variant (shard_of()), so a lookup
+by id goes straight to the right file.
+
+Ids are stored as TEXT. pack()/unpack() convert to and from the 16-byte
+form for compact BLOB storage (about half the index size, see
+benchmarks/id_locality.py); the schema keeps TEXT because ids also travel in
+URLs, JSON, tokens and the change feed.
+
+Rows created before this module keep their uuid4 ids until migrated:
+
+    python ids.py --migrate                      # re-key every table (stop the server first)
+    python ids.py --migrate --tables grievances,comments --dry-run
+
+A migrated row gets an id built from its created_at, and every column that
+refers to it (in the archive too) is rewritten in the same transaction.
+Re-keying users signs everybody out, since tokens carry the user id. Run it
+before splitting into shards (shards.py): it only handles one database.
+"""
+import argparse
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+_COUNTER_MAX = 0xFFF
+_RANDOM_BITS = (1 << 62) - 1
+_SHARD_SHIFT = 56
+_SHARD_MASK = 0x3F
+MAX_SHARDS = _SHARD_MASK + 1
+
+
+class Generator:
+    """Monotonic UUIDv7 source (RFC 9562 section 6.2, method 1: a 12-bit counter).
+
+    rng (a random.Random) supplies the random bits instead of os.urandom, for
+    reproducible ids in generated data.
+    """
+
+    def __init__(self, rng=None):
+        self.last_ms = -1
+        self.counter = 0
+        self.rng = rng
+        self.lock = threading.Lock()
+
+    def next(self, ms=None, shard=None):
+        if ms is None:
+            ms = time.time_ns() // 1_000_000
+        rand = self.rng.getrandbits(80) if self.rng else int.from_bytes(os.urandom(10), 'big')
+        with self.lock:
+            if ms > self.last_ms:
+                # Start in the lower half of the counter range so a busy millisecond rarely overflows it
+                self.last_ms, self.counter = ms, rand >> 69
+            else:
+                # Same millisecond, or the clock stepped back: keep counting from the last id
+                self.counter += 1
+                if self.counter > _COUNTER_MAX:
+                    self.last_ms, self.counter = self.last_ms + 1, 0
+            ms, counter = self.last_ms, self.counter
+        value = (ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | (rand & _RANDOM_BITS)
+        if shard is not None:
+            value = with_shard(value, shard)
+        return str(uuid.UUID(int=value))
+
+
+_generator = Generator()
+
+
+def new_id(shard=None):
+    """A new time-ordered id (carrying shard, if given)"""
+    return _generator.next(shard=shard)
+
+
+def with_shard(value, shard):
+    """The UUID integer value with its shard bits set to shard"""
+    return value & ~(_SHARD_MASK << _SHARD_SHIFT) | (shard & _SHARD_MASK) << _SHARD_SHIFT
+
+
+def shard_of(id_value):
+    """Shard number carried by an id (any RFC 4122 UUID: for ids made without one
+    the bits are random)"""
+    return (uuid.UUID(id_value).int >> _SHARD_SHIFT) & _SHARD_MASK
+
+
+def timestamp(id_value):
+    """Creation time (Unix seconds) of a UUIDv7 id, or None for other ids"""
+    value = uuid.UUID(id_value)
+    if value.version != 7:
+        return None
+    return (value.int >> 80) / 1000
+
+
+def pack(id_value):
+    """16-byte form of an id, for BLOB columns"""
+    return uuid.UUID(id_value).bytes
+
+
+def unpack(data):
+    return str(uuid.UUID(bytes=data))
+
+
+# Migrating uuid4 keys
+
+# table -> (timestamp column, [(table, column) referring to its id])
+REFERENCES = {
+    'users': ('created_at', [
+        ('grievances', 'submitted_by'), ('grievances', 'assigned_to'), ('comments', 'user_id'),
+        ('attachments', 'uploaded_by'), ('feedback', 'userId'), ('grievance_events', 'changed_by'),
+        ('change_events', 'submitted_by'), ('change_events', 'assigned_to'),
+    ]),
+    'grievances': ('created_at', [
+        ('comments', 'grievance_id'), ('attachments', 'grievance_id'),
+        ('grievance_events', 'grievance_id'), ('change_events', 'grievance_id'),
+    ]),
+    'comments': ('created_at', []),
+    'attachments': ('created_at', []),
+    'feedback': ('createdAt', []),
+}
+
+
+def _milliseconds(value):
+    try:
+        return int(datetime.fromisoformat(value).timestamp() * 1000)
+    except (TypeError, ValueError):
+        return time.time_ns() // 1_000_000
+
+
+def _schemas(conn):
+    return ['main'] + (['archive'] if any(row[1] == 'archive' for row in conn.execute('PRAGMA database_list')) else [])
+
+
+def _has_table(conn, schema, table):
+    return conn.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?",
+                        (table,)).fetchone() is not None
+
+
+def migrate_table(conn, table):
+    """Give table's non-v7 rows (main and archive) new ids in creation order; returns the count"""
+    created, references = REFERENCES[table]
+    schemas = _schemas(conn)
+    rows = []
+    for schema in schemas:
+        if not _has_table(conn, schema, table):
+            continue
+        # Version nibble of the text form: 'xxxxxxxx-xxxx-7xxx-...'
+        rows += conn.execute(f"SELECT id, {created} FROM {schema}.{table} WHERE substr(id, 15, 1) != '7'").fetchall()
+    if not rows:
+        return 0
+    generator = Generator()
+    keyed = sorted((_milliseconds(created_at), old) for old, created_at in rows)
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS id_map (old TEXT PRIMARY KEY, new TEXT NOT NULL)')
+    conn.execute('DELETE FROM temp.id_map')
+    conn.executemany('INSERT INTO temp.id_map (old, new) VALUES (?, ?)',
+                     ((old, generator.next(ms)) for ms, old in keyed))
+    for schema in schemas:
+        for target, column in [(table, 'id')] + references:
+            if _has_table(conn, schema, target):
+                conn.execute(f'''UPDATE {schema}.{target}
+                                 SET {column} = (SELECT new FROM temp.id_map WHERE old = {column})
+                                 WHERE {column} IN (SELECT old FROM temp.id_map)''')
+    return len(rows)
+
+
+def migrate(tables=tuple(REFERENCES), dry_run=False):
+    """Re-key the given tables in one transaction; returns {table: rows re-keyed}"""
+    import db  # db imports this module
+
+    if db.sharded():
+        # Grievance ids must carry their shard; re-key before splitting (shards.py)
+        raise RuntimeError('migrate before splitting the database into shards')
+    conn = db.get_db_connection()
+    conn.isolation_level = None
+    if os.path.exists(db.archive_path()):
+        conn.execute('ATTACH DATABASE ? AS archive', (db.archive_path(),))
+    counts = {}
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        for table in tables:
+            counts[table] = migrate_table(conn, table)
+        conn.execute('ROLLBACK' if dry_run else 'COMMIT')
+        if not dry_run and any(counts.values()):
+            # Rewritten keys leave the primary key indexes half empty; rebuild them packed
+            for table, count in counts.items():
+                if count:
+                    conn.execute(f'REINDEX {table}')
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time-ordered ids')
+    parser.add_argument('--migrate', action='store_true', help='Re-key rows that still have random (uuid4) ids')
+    parser.add_argument('--tables', default=','.join(REFERENCES), help='Comma separated tables to migrate')
+    parser.add_argument('--dry-run', action='store_true', help='Count the rows without changing them')
+    parser.add_argument('-n', type=int, default=0, help='Print this many new ids')
+    args = parser.parse_args()
+
+    if args.migrate:
+        tables = args.tables.split(',')
+        unknown = set(tables) - set(REFERENCES)
+        if unknown:
+            parser.error(f"unknown tables: {', '.join(sorted(unknown))}")
+        counts = migrate([table for table in REFERENCES if table in tables], args.dry_run)
+        for table, count in counts.items():
+            print(f"{table}: {count} rows {'would be ' if args.dry_run else ''}re-keyed")
+    for _ in range(args.n):
+        print(new_id())
+
+
+if __name__ == '__main__':
+    main()
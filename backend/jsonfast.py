@@ -0,0 +1,77 @@
+import json
+from flask.json.provider import DefaultJSONProvider
+
+# Fast JSON for list responses.
+#
+# Two pieces:
+#   - FastJSONProvider, used by jsonify(): orjson when it is installed,
+#     otherwise the stdlib encoder without key sorting.
+#   - response(): assembles a response from JSON text produced by db.py list
+#     functions called with as_json=True/'stream'. Those ask SQLite to emit
+#     each row as a json_object(...) string, so large pages are built by
+#     joining strings instead of creating a dict per row and encoding it.
+
+try:
+    import orjson
+except ImportError:  # Optional dependency
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that prefers orjson and falls back to the stdlib"""
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        # jsonify() always passes indent or separators; orjson covers both
+        if orjson is not None and set(kwargs) <= {'indent', 'separators'}:
+            option = orjson.OPT_NON_STR_KEYS
+            if kwargs.get('indent'):
+                option |= orjson.OPT_INDENT_2
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            try:
+                return orjson.dumps(obj, default=self.default, option=option).decode()
+            except TypeError:
+                pass  # Fall through for anything orjson refuses (e.g. huge ints)
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+
+def init_app(app):
+    app.json = FastJSONProvider(app)
+
+
+def dumps(obj):
+    """Encode with the fastest available encoder"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, separators=(',', ':'))
+
+
+def response(app, fields, status=200):
+    """Build a JSON object response from pre-encoded values.
+
+    fields maps keys to JSON text (e.g. from db functions called with
+    as_json=True); values that are generators are streamed.
+    """
+    streamed = any(not isinstance(value, str) for value in fields.values())
+    if not streamed:
+        body = '{' + ','.join(f'{json.dumps(key)}:{value}' for key, value in fields.items()) + '}'
+        return app.response_class(body, status=status, mimetype='application/json')
+
+    def generate():
+        yield '{'
+        for i, (key, value) in enumerate(fields.items()):
+            yield ('' if i == 0 else ',') + json.dumps(key) + ':'
+            if isinstance(value, str):
+                yield value
+            else:
+                yield from value
+        yield '}'
+
+    return app.response_class(generate(), status=status, mimetype='application/json')
@@ -0,0 +1,247 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Request metrics in Prometheus text format.
+#
+# Every thread writes into its own shard (plain dicts, no locks), and a scrape
+# sums the shards. Recording a sample costs a thread-local lookup and a couple
+# of dict updates, so instrumentation stays in the microsecond range. Shards
+# of threads that have exited are folded into one retired total (by a scrape,
+# or when enough of them pile up), so thread-per-request servers don't grow
+# the list without bound.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_local = threading.local()
+_shards = []  # (thread, shard)
+_shards_lock = threading.Lock()
+_prune_at = 256
+
+
+def _new_shard():
+    return {'counters': {}, 'histograms': {}, 'gauges': {}}
+
+
+_retired = _new_shard()
+
+
+def _merge(into, shard):
+    counters, gauges, histograms = into['counters'], into['gauges'], into['histograms']
+    for key, value in list(shard['counters'].items()):
+        counters[key] = counters.get(key, 0) + value
+    for key, value in list(shard['gauges'].items()):
+        gauges[key] = gauges.get(key, 0) + value
+    for key, hist in list(shard['histograms'].items()):
+        total = histograms.get(key)
+        if total is None:
+            histograms[key] = list(hist)
+        else:
+            for i in range(len(hist) - 1):
+                total[i] += hist[i]
+
+
+def _prune():
+    """Fold the shards of exited threads into _retired (caller holds _shards_lock)"""
+    global _prune_at
+    alive = []
+    for thread, shard in _shards:
+        if thread.is_alive():
+            alive.append((thread, shard))
+        else:
+            _merge(_retired, shard)
+    _shards[:] = alive
+    _prune_at = max(256, 2 * len(alive))
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _new_shard()
+        with _shards_lock:
+            if len(_shards) >= _prune_at:
+                _prune()
+            _shards.append((threading.current_thread(), shard))
+        _local.shard = shard
+    return shard
+
+
+def inc(name, labels, value=1):
+    """Add to a counter. labels is a tuple of (key, value) pairs."""
+    counters = _shard()['counters']
+    key = (name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+
+def gauge_add(name, labels, value):
+    gauges = _shard()['gauges']
+    key = (name, labels)
+    gauges[key] = gauges.get(key, 0) + value
+
+
+def observe(name, labels, value, buckets=LATENCY_BUCKETS):
+    """Record a sample in a histogram"""
+    histograms = _shard()['histograms']
+    key = (name, labels)
+    hist = histograms.get(key)
+    if hist is None:
+        # [per-bucket counts..., +Inf count, sum, bucket bounds]
+        hist = histograms[key] = [0] * (len(buckets) + 1) + [0.0, buckets]
+    hist[bisect_left(buckets, value)] += 1
+    hist[-2] += value
+
+
+# Per-request dependency attribution
+
+def observe_dependency(kind, seconds, calls=1):
+    """Record time spent in a dependency (sqlite, ai, smtp)"""
+    current = getattr(_local, 'request', None)
+    if current is not None:
+        entry = current.get(kind)
+        if entry is None:
+            current[kind] = [calls, seconds]
+        else:
+            entry[0] += calls
+            entry[1] += seconds
+    else:
+        # Outside a request (background jobs, CLI tools)
+        inc('dependency_calls_total', (('dependency', kind), ('endpoint', 'background')), calls)
+        inc('dependency_seconds_total', (('dependency', kind), ('endpoint', 'background')), seconds)
+
+
+@contextmanager
+def track(kind):
+    """Time a block as a call to the given dependency"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_dependency(kind, time.perf_counter() - start)
+
+
+# Flask integration
+
+def _begin_request(endpoint, method):
+    _local.request = {}
+    _local.request_start = time.perf_counter()
+    _local.request_labels = (('endpoint', endpoint), ('method', method))
+    gauge_add('http_requests_in_flight', (('endpoint', endpoint),), 1)
+
+
+def _end_request(status, size):
+    start = getattr(_local, 'request_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    labels = _local.request_labels
+    endpoint_label = labels[:1]
+
+    observe('http_request_duration_seconds', labels, elapsed)
+    inc('http_requests_total', labels + (('status', str(status)),))
+    if size is not None:
+        observe('http_response_size_bytes', endpoint_label, size, SIZE_BUCKETS)
+
+    for kind, (calls, seconds) in _local.request.items():
+        dep_labels = (('dependency', kind),) + endpoint_label
+        inc('dependency_calls_total', dep_labels, calls)
+        inc('dependency_seconds_total', dep_labels, seconds)
+
+    gauge_add('http_requests_in_flight', endpoint_label, -1)
+    _local.request = None
+    _local.request_start = None
+
+
+def init_app(app):
+    """Install the request hooks and the /metrics endpoint"""
+    from flask import Response, request
+
+    @app.before_request
+    def metrics_before_request():
+        _begin_request(request.endpoint or 'unmatched', request.method)
+
+    @app.after_request
+    def metrics_after_request(response):
+        size = None if response.is_streamed else response.calculate_content_length()
+        _end_request(response.status_code, size)
+        return response
+
+    @app.teardown_request
+    def metrics_teardown_request(exc):
+        # after_request is skipped on unhandled exceptions; close the books here
+        if getattr(_local, 'request_start', None) is not None:
+            _end_request(500, None)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        """Expose metrics in Prometheus text format"""
+        return Response(render(), mimetype='text/plain; version=0.0.4')
+
+
+# Exposition
+
+HELP = {
+    'http_request_duration_seconds': ('histogram', 'Request latency by endpoint'),
+    'http_requests_total': ('counter', 'Requests by endpoint and status'),
+    'http_requests_in_flight': ('gauge', 'Requests currently being served'),
+    'http_response_size_bytes': ('histogram', 'Response body size by endpoint'),
+    'dependency_calls_total': ('counter', 'SQLite queries, AI calls and SMTP sends by endpoint'),
+    'dependency_seconds_total': ('counter', 'Time spent in SQLite, AI and SMTP by endpoint'),
+    'events_subscribers': ('gauge', 'Open /api/events streams'),
+    'db_write_batch_size': ('histogram', 'Mutations per group commit'),
+    'db_write_commit_seconds': ('histogram', 'Time to apply and commit one write batch'),
+    'scheduler_pending': ('gauge', 'SLA deadlines held by the escalation scheduler'),
+    'escalations_total': ('counter', 'Grievances escalated after missing their SLA deadline, by action'),
+    'assignments_total': ('counter', 'New grievances auto-assigned, by routing (category, submitter, none)'),
+}
+
+
+def _collect():
+    total = _new_shard()
+    with _shards_lock:
+        _prune()
+        _merge(total, _retired)
+        shards = [shard for _, shard in _shards]
+    for shard in shards:
+        _merge(total, shard)
+    return total['counters'], total['gauges'], total['histograms']
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def render():
+    """Render every metric in Prometheus text exposition format"""
+    counters, gauges, histograms = _collect()
+    by_name = {}
+    for source in (counters, gauges):
+        for (name, labels), value in source.items():
+            by_name.setdefault(name, []).append(f'{name}{_format_labels(labels)} {value}')
+
+    for (name, labels), hist in histograms.items():
+        lines = by_name.setdefault(name, [])
+        buckets = hist[-1]
+        cumulative = 0
+        for bound, count in zip(buckets, hist):
+            cumulative += count
+            lines.append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {cumulative}')
+        cumulative += hist[len(buckets)]
+        lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {cumulative}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {hist[-2]}')
+        lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+
+    output = []
+    for name in sorted(by_name):
+        kind, text = HELP.get(name, ('untyped', name))
+        output.append(f'# HELP {name} {text}')
+        output.append(f'# TYPE {name} {kind}')
+        output.extend(by_name[name])
+    return '\n'.join(output) + '\n'
@@ -0,0 +1,59 @@
+import importlib
+import os
+import threading
+import time
+
+# Registry of heavy optional dependencies, loaded on first use.
+#
+# google.generativeai alone pulls in gRPC and protobuf; importing it (and
+# jwt, smtplib, email) eagerly made every worker and every CLI tool pay for
+# it at startup. Code asks for a dependency with providers.get(name) and
+# the first caller pays the import once per process.
+
+_factories = {}
+_instances = {}
+_lock = threading.Lock()
+
+# name -> seconds spent loading, for startup diagnostics
+load_times = {}
+
+
+def register(name, factory):
+    """Register a zero-argument factory that builds the named dependency"""
+    _factories[name] = factory
+
+
+def get(name):
+    """Return the named dependency, loading it on first use"""
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+
+    with _lock:
+        instance = _instances.get(name)
+        if instance is None:
+            start = time.perf_counter()
+            instance = _instances[name] = _factories[name]()
+            load_times[name] = time.perf_counter() - start
+    return instance
+
+
+def loaded():
+    """Names of dependencies loaded so far in this process"""
+    return sorted(_instances)
+
+
+def _load_genai():
+    genai = importlib.import_module('google.generativeai')
+    genai.configure(api_key=os.environ.get('GEMINI_API_KEY', 'YOUR_API_KEY'))
+    return genai
+
+
+register('genai', _load_genai)
+register('jwt', lambda: importlib.import_module('jwt'))
+register('smtplib', lambda: importlib.import_module('smtplib'))
+register('email.message', lambda: importlib.import_module('email.message'))
+
+# PostgreSQL storage backend (pgstore.py)
+register('psycopg.rows', lambda: importlib.import_module('psycopg.rows'))
+register('psycopg_pool', lambda: importlib.import_module('psycopg_pool'))
@@ -0,0 +1,182 @@
+import heapq
+import os
+import threading
+import time
+from datetime import datetime
+
+import db
+import metrics
+
+# SLA escalation scheduler.
+#
+# Every open grievance has a deadline, grievances.due_at (sla.deadline: its
+# creation, or last escalation, plus the window for its priority). One thread
+# per process keeps the upcoming deadlines in a min-heap and sleeps until the
+# earliest one, then calls db.escalate_grievance: bump the priority, or at the
+# top priority reassign to a department manager, and restart the deadline.
+# Each deadline costs one heap push and pop (O(log n)) instead of a periodic
+# scan of every grievance.
+#
+# Only deadlines within SCHEDULER_HORIZON are held. At start, and every half
+# horizon after, they are loaded from idx_grievances_due (a range read of the
+# deadlines coming up, including any already missed). db.on_change keeps the
+# heap current for writes made by this process: changed deadlines are pushed
+# and stale entries are skipped when they surface (lazy deletion).
+#
+# With several worker processes each runs a scheduler. escalate_grievance only
+# acts on a grievance whose deadline has actually passed, so a deadline seen by
+# more than one process is still escalated once.
+#
+#   SCHEDULER=0          don't run the scheduler in this process
+#   SCHEDULER_HORIZON    seconds of upcoming deadlines to hold (default 3600)
+#   SLA_DEADLINE_HOURS   per-priority windows, see sla.py
+
+HORIZON = float(os.environ.get('SCHEDULER_HORIZON', 3600))
+
+
+def enabled():
+    return os.environ.get('SCHEDULER', '1').lower() not in ('0', 'false', 'off')
+
+
+def _timestamp(value):
+    return datetime.fromisoformat(value).timestamp()
+
+
+class Scheduler:
+    """Min-heap of (deadline, grievance id) with a thread firing them on time"""
+
+    def __init__(self, horizon=HORIZON):
+        self.horizon = horizon
+        self.heap = []
+        self.scheduled = {}      # grievance id -> deadline of its live heap entry
+        self.loaded_until = 0.0  # deadlines up to here are in the heap
+        self.next_load = 0.0
+        self.closed = False
+        self.cond = threading.Condition()
+        self.reported = 0
+
+    def schedule(self, grievance_id, due_at):
+        """Set (or with None clear) a grievance's deadline"""
+        with self.cond:
+            deadline = _timestamp(due_at) if due_at else None
+            if deadline is None or deadline > self.loaded_until:
+                # Resolved, or far enough out that the next load picks it up
+                self.scheduled.pop(grievance_id, None)
+                return
+            if self.scheduled.get(grievance_id) == deadline:
+                return
+            self.scheduled[grievance_id] = deadline
+            heapq.heappush(self.heap, (deadline, grievance_id))
+            if self.heap[0][1] == grievance_id:
+                self.cond.notify()
+
+    def load(self):
+        """Pull every deadline up to now + horizon from the index"""
+        now = time.time()
+        until = now + self.horizon
+        rows = db.get_due_grievances(datetime.fromtimestamp(until).isoformat())
+        with self.cond:
+            self.loaded_until = until
+            self.next_load = now + self.horizon / 2
+        for grievance_id, due_at in rows:
+            self.schedule(grievance_id, due_at)
+        return len(rows)
+
+    def _next(self):
+        """Block until a deadline passes; returns its grievance id, or None to reload/stop"""
+        with self.cond:
+            while not self.closed:
+                now = time.time()
+                if now >= self.next_load:
+                    return None
+                if self.heap and self.heap[0][0] <= now:
+                    deadline, grievance_id = heapq.heappop(self.heap)
+                    if self.scheduled.get(grievance_id) != deadline:
+                        continue  # Superseded or cleared since it was pushed
+                    del self.scheduled[grievance_id]
+                    return grievance_id
+                wake = min(self.heap[0][0], self.next_load) if self.heap else self.next_load
+                self.cond.wait(wake - now)
+            return None
+
+    def run(self):
+        while not self.closed:
+            grievance_id = self._next()
+            if grievance_id is None:
+                if not self.closed:
+                    self.load()
+            else:
+                grievance, error = db.escalate_grievance(grievance_id)
+                # None: escalated by another process, or no longer overdue
+                if grievance is not None:
+                    metrics.inc('escalations_total', (('action', grievance['escalation']),))
+                    _notify(grievance)
+            pending = len(self.scheduled)
+            metrics.gauge_add('scheduler_pending', (), pending - self.reported)
+            self.reported = pending
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+_scheduler = None
+_thread = None
+_pid = None
+_lock = threading.Lock()
+_escalation_listeners = []
+
+
+def on_escalation(fn):
+    """Register fn(grievance), called after the scheduler escalates a grievance.
+
+    grievance['escalation'] is 'priority', 'reassigned' or 'notified'.
+    """
+    _escalation_listeners.append(fn)
+    return fn
+
+
+def _notify(grievance):
+    for fn in _escalation_listeners:
+        try:
+            fn(grievance)
+        except Exception as e:
+            print(f"Escalation listener failed: {e}")
+
+
+def _run():
+    try:
+        _scheduler.run()
+    except Exception as e:
+        print(f"Escalation scheduler stopped: {e}")
+
+
+def start():
+    """Start the scheduler thread (once per process, after any fork)"""
+    global _scheduler, _thread, _pid
+    if not enabled():
+        return
+    with _lock:
+        if _thread is not None and _pid == os.getpid() and _thread.is_alive():
+            return
+        _scheduler = Scheduler()
+        _pid = os.getpid()
+        _thread = threading.Thread(target=_run, name='sla-scheduler', daemon=True)
+        _thread.start()
+
+
+@db.on_change
+def _changed(kind, grievance_id, data):
+    if 'due_at' in data and _scheduler is not None and _pid == os.getpid():
+        _scheduler.schedule(grievance_id, data['due_at'])
+
+
+def shutdown():
+    with _lock:
+        if _scheduler is not None:
+            _scheduler.close()
+        thread = _thread
+    if thread is not None and _pid == os.getpid():
+        thread.join(timeout=5)
+
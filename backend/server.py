@@ -0,0 +1,225 @@
+"""Production launcher: pre-forked worker processes with a thread pool each.
+
+    python server.py --workers 4 --threads 8 --port 5000
+
+The master initializes the schema and upload folder once, opens the listening
+socket and forks the workers, which share it. Each worker warms up (database
+pages, and the AI client with WARM_AI_CLIENT=1) before accepting connections. On SIGTERM/SIGINT the master
+asks every worker to stop accepting, finish in-flight requests and drain
+background queues, and only kills workers that exceed --graceful-timeout.
+Crashed workers are replaced. A worker that dies within WORKER_MIN_UPTIME
+seconds of starting is replaced after a delay that doubles with each such
+crash (up to 30 s), and once WORKER_MAX_CRASHES of them happen within a
+minute the master stops everything and exits with status 1, instead of
+fork-looping on a worker that can't boot.
+
+Settings can also come from WEB_WORKERS, WEB_THREADS, WEB_HOST, WEB_PORT and
+WEB_GRACEFUL_TIMEOUT. For gunicorn deployments see gunicorn.conf.py.
+"""
+import argparse
+import heapq
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from socketserver import ThreadingMixIn
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+
+class WorkerRequestHandler(WSGIRequestHandler):
+    def make_environ(self):
+        environ = super().make_environ()
+        environ['server.hijack'] = self.hijack
+        return environ
+
+    def hijack(self):
+        """Take over the connection once the response headers are sent.
+
+        Returns a duplicate of the client socket and whether the body is
+        chunked; the server then closes its own handle without shutting the
+        connection down. Used by /api/events (see events.py).
+        """
+        self.server.handed_off.add(self.connection)
+        return self.connection.dup(), self.protocol_version >= 'HTTP/1.1'
+
+
+class WorkerServer(ThreadingMixIn, BaseWSGIServer):
+    """Werkzeug server on an inherited socket with a bounded number of threads"""
+
+    multithread = True
+    daemon_threads = False
+    block_on_close = True  # server_close() waits for in-flight requests
+
+    def __init__(self, sock, app, threads):
+        self.slots = threading.BoundedSemaphore(threads)
+        self.handed_off = set()
+        super().__init__(*sock.getsockname()[:2], app, handler=WorkerRequestHandler, fd=sock.fileno())
+
+    def process_request(self, request, client_address):
+        # Block the accept loop while all threads are busy instead of
+        # spawning without limit
+        self.slots.acquire()
+        super().process_request(request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self.slots.release()
+
+    def shutdown_request(self, request):
+        if request in self.handed_off:
+            # The hijacker's duplicate keeps the connection open
+            self.handed_off.discard(request)
+            request.close()
+        else:
+            super().shutdown_request(request)
+
+
+def run_worker(sock, threads):
+    import app as app_module
+
+    app_module.warm_up()
+    server = WorkerServer(sock, app_module.app, threads)
+
+    def stop(signum, frame):
+        # End event streams now: they would otherwise never finish
+        app_module.events.shutdown(wait=False)
+        # shutdown() blocks until serve_forever returns, so call it off-thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The master handles Ctrl-C
+
+    print(f"Worker {os.getpid()} serving with {threads} threads")
+    server.serve_forever()
+    server.server_close()
+    app_module.shutdown()
+    print(f"Worker {os.getpid()} stopped")
+
+
+def spawn(sock, threads):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(sock, threads)
+        except Exception as e:
+            print(f"Worker {os.getpid()} failed: {e}", file=sys.stderr)
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+# Restart policy for workers that die at or soon after boot
+MIN_UPTIME = float(os.environ.get('WORKER_MIN_UPTIME', 5))
+MAX_CRASHES = int(os.environ.get('WORKER_MAX_CRASHES', 10))
+CRASH_WINDOW = 60.0
+MAX_BACKOFF = 30.0
+
+
+def serve(host, port, workers, threads, graceful_timeout):
+    import app as app_module
+
+    # One-time setup in the master, before any worker exists
+    app_module.create_app(init=True, warm=False)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+    print(f"Listening on http://{host}:{port} with {workers} workers x {threads} threads")
+
+    children = {}  # pid -> start time
+    restarts = []  # heap of times to spawn a replacement at
+    crashes = []  # times of recent early exits
+    backoff = 0.0
+    stopping = threading.Event()
+    exit_code = 0
+
+    def request_stop(signum, frame):
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    for _ in range(workers):
+        children[spawn(sock, threads)] = time.monotonic()
+
+    while not stopping.is_set():
+        now = time.monotonic()
+        while restarts and restarts[0] <= now:
+            heapq.heappop(restarts)
+            children[spawn(sock, threads)] = now
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if not pid:
+            stopping.wait(min(0.5, max(restarts[0] - now, 0.01)) if restarts else 0.5)
+            continue
+        started = children.pop(pid, now)
+        if stopping.is_set():
+            break
+        if now - started < MIN_UPTIME:
+            crashes = [t for t in crashes if now - t < CRASH_WINDOW] + [now]
+            if len(crashes) >= MAX_CRASHES:
+                print(f"{len(crashes)} workers died within {CRASH_WINDOW:.0f}s of each other, giving up",
+                      file=sys.stderr)
+                exit_code = 1
+                break
+            backoff = min(max(backoff * 2, 0.5), MAX_BACKOFF)
+        else:
+            backoff = 0.0
+        print(f"Worker {pid} exited with status {status}, restarting in {backoff}s")
+        heapq.heappush(restarts, now + backoff)
+
+    # Graceful drain: workers stop accepting and finish what they have
+    sock.close()
+    for pid in children:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    deadline = time.monotonic() + graceful_timeout
+    while children and time.monotonic() < deadline:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            children.pop(pid, None)
+        else:
+            time.sleep(0.1)
+
+    for pid in children:
+        print(f"Worker {pid} did not drain in {graceful_timeout}s, killing")
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    print("Server stopped")
+    return exit_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the grievance API with pre-forked workers')
+    parser.add_argument('--host', default=os.environ.get('WEB_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('WEB_PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', os.cpu_count() or 2)))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 8)))
+    parser.add_argument('--graceful-timeout', type=float,
+                        default=float(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30)))
+    args = parser.parse_args()
+
+    sys.exit(serve(args.host, args.port, args.workers, args.threads, args.graceful_timeout))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""Split grievance data into department shards, and report on the shards.
+
+With DB_SHARDS=N (see db.py) new grievances go to the shard files, but the
+ones created before that still sit in DATABASE_NAME. --split moves them a
+batch at a time into the shard of their submitter's department, with their
+comments, attachments and status history, giving each an id that carries its
+shard (ids.with_shard) and rewriting the rows that refer to it. Archived
+grievances move to the shard archives the same way. SLA aggregates are then
+rebuilt per shard; the old change feed isn't carried over, so connected
+clients get a reset event and reload.
+
+    DB_SHARDS=4 python shards.py              # rows per shard
+    DB_SHARDS=4 python shards.py --split      # stop the server first
+
+A batch is written to the shards before it is deleted from the main
+database, replacing whatever an interrupted run left there, so re-running
+is safe. A grievance stays in the shard it was filed in if its submitter
+later changes department.
+"""
+import argparse
+import os
+import sqlite3
+import uuid
+
+import archive
+import db
+import ids
+import sla
+
+# (table, column linking it to the grievance)
+TABLES = (('grievances', 'id'), ('comments', 'grievance_id'), ('attachments', 'grievance_id'),
+          ('grievance_events', 'grievance_id'))
+
+
+def sharded_id(grievance_id, shard):
+    return str(uuid.UUID(int=ids.with_shard(uuid.UUID(grievance_id).int, shard)))
+
+
+def _columns(conn, schema, table):
+    return [row[1] for row in conn.execute(f'PRAGMA {schema}.table_info({table})')]
+
+
+def _schema(table, schema):
+    # Status history isn't archived: it stays in the main file of the database
+    return 'main' if table == 'grievance_events' else schema
+
+
+def copy_batch(source, schema, target, grievance_ids, shard):
+    """Copy grievances and their rows from source's schema into target's, under sharded ids"""
+    new_ids = [sharded_id(gid, shard) for gid in grievance_ids]
+    mapping = dict(zip(grievance_ids, new_ids))
+    placeholders = ', '.join('?' for _ in grievance_ids)
+    target.execute('BEGIN IMMEDIATE')
+    try:
+        for table, key in TABLES:
+            table_schema = _schema(table, schema)
+            existing = set(_columns(target, table_schema, table))
+            # grievance_events ids are the target's own (AUTOINCREMENT)
+            columns = [column for column in _columns(source, table_schema, table)
+                       if column in existing and not (table == 'grievance_events' and column == 'id')]
+            if not columns:
+                continue
+            rows = source.execute(f"SELECT {', '.join(columns)} FROM {table_schema}.{table} "
+                                  f"WHERE {key} IN ({placeholders})", grievance_ids).fetchall()
+            index = columns.index(key)
+            target.execute(f'DELETE FROM {table_schema}.{table} WHERE {key} IN ({placeholders})', new_ids)
+            target.executemany(
+                f"INSERT INTO {table_schema}.{table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                [tuple(mapping[value] if i == index else value for i, value in enumerate(row)) for row in rows])
+        target.execute('COMMIT')
+    except Exception:
+        target.execute('ROLLBACK')
+        raise
+
+
+def delete_batch(source, schema, grievance_ids):
+    placeholders = ', '.join('?' for _ in grievance_ids)
+    source.execute('BEGIN IMMEDIATE')
+    try:
+        for table, key in TABLES:
+            table_schema = _schema(table, schema)
+            if _columns(source, table_schema, table):
+                source.execute(f'DELETE FROM {table_schema}.{table} WHERE {key} IN ({placeholders})', grievance_ids)
+        source.execute('COMMIT')
+    except Exception:
+        source.execute('ROLLBACK')
+        raise
+
+
+def _open_target(shard, schema):
+    if schema == 'archive':
+        conn = archive.connect(shard)
+        archive.ensure_schema(conn)
+        return conn
+    conn = db.open_shard(shard)
+    conn.isolation_level = None
+    return conn
+
+
+def split_schema(source, schema, batch_size):
+    """Move every grievance in source's schema to its shard; returns the count per shard"""
+    moved = {}
+    targets = {}
+    try:
+        while True:
+            rows = source.execute(f'SELECT id, submitter_department FROM {schema}.grievances LIMIT ?',
+                                  (batch_size,)).fetchall()
+            if not rows:
+                break
+            by_shard = {}
+            for grievance_id, department in rows:
+                by_shard.setdefault(db.shard_for_department(department), []).append(grievance_id)
+            for shard, grievance_ids in by_shard.items():
+                if shard not in targets:
+                    targets[shard] = _open_target(shard, schema)
+                copy_batch(source, schema, targets[shard], grievance_ids, shard)
+                moved[shard] = moved.get(shard, 0) + len(grievance_ids)
+            delete_batch(source, schema, [row[0] for row in rows])
+    finally:
+        for conn in targets.values():
+            conn.close()
+    return moved
+
+
+def split(batch_size=500):
+    """Move the main database's grievances into the shards; returns a report"""
+    if not db.sharded():
+        raise RuntimeError('set DB_SHARDS to the number of shards first')
+    db.init_db()
+    source = db.get_db_connection()
+    source.isolation_level = None
+    report = {}
+    try:
+        report['moved'] = split_schema(source, 'main', batch_size)
+        if os.path.exists(db.archive_path()):
+            source.execute('ATTACH DATABASE ? AS archive', (db.archive_path(),))
+            report['archive_moved'] = split_schema(source, 'archive', batch_size)
+        # What is left describes rows that are gone
+        source.execute('DELETE FROM sla_aggregates')
+        source.execute('DELETE FROM change_events')
+    finally:
+        source.close()
+    report['sla'] = sla.rebuild()
+    return report
+
+
+def counts():
+    """Grievances in the main database and in each shard (and their archives)"""
+    report = {}
+    files = [('home', db.DATABASE_NAME, db.archive_path())]
+    if db.sharded():
+        files += [(f'shard {shard}', db.shard_path(shard), db.archive_path(shard)) for shard in db.shard_ids()]
+    for name, path, archive_path in files:
+        row = {}
+        for kind, file in (('grievances', path), ('archived', archive_path)):
+            if not os.path.exists(file):
+                continue
+            conn = sqlite3.connect(file)
+            if _columns(conn, 'main', 'grievances'):
+                row[kind] = conn.execute('SELECT COUNT(*) FROM grievances').fetchone()[0]
+            conn.close()
+        report[name] = row
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Department shards')
+    parser.add_argument('--split', action='store_true', help="Move the main database's grievances into the shards")
+    parser.add_argument('--batch', type=int, default=500, help='Grievances per transaction')
+    args = parser.parse_args()
+
+    if args.split:
+        for key, value in split(args.batch).items():
+            print(f"  {key}: {value}")
+    for name, row in counts().items():
+        print(f"{name}: {', '.join(f'{kind} {count}' for kind, count in row.items()) or 'empty'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""Incrementally maintained SLA metrics.
+
+Whenever a grievance changes status, db.update_grievance calls observe_transition()
+inside the same transaction. It updates one sla_aggregates row per
+(metric, dimension, value):
+
+    resolution       seconds from creation to Resolved/Closed, by category, priority and overall
+    time_in_status   seconds spent in the status being left, by status
+
+Each row holds count, total, max and a log-bucket sketch (HDR-histogram style:
+bucket i covers [GAMMA**i, GAMMA**(i+1)) seconds, so quantiles are within
+about 1% relative error and a row never holds more than a few hundred
+buckets; bucket -1 holds everything under a second). Quantiles are clamped to
+[0, max], so they never exceed the largest duration seen. Reading the metrics touches only these rows, independent of how
+many grievances exist.
+
+    python sla.py --rebuild    # recompute from grievance_events (holds the write lock meanwhile)
+
+It also defines the resolution deadline of each open grievance (due_at, see
+deadline()); scheduler.py escalates grievances whose deadline has passed.
+"""
+import argparse
+import json
+import math
+import os
+from datetime import datetime, timedelta
+
+RESOLVED_STATUSES = ('Resolved', 'Closed')
+# Lowest to highest; escalation moves a grievance one step up
+PRIORITIES = ('Low', 'Medium', 'High', 'Critical')
+GAMMA = 1.02
+QUANTILES = (0.5, 0.9, 0.99)
+SUB_SECOND = -1
+_LOG_GAMMA = math.log(GAMMA)
+
+
+# Sketch
+
+def bucket(seconds):
+    if seconds < 1.0:
+        return SUB_SECOND
+    return int(math.floor(math.log(seconds) / _LOG_GAMMA))
+
+
+def quantile(sketch, count, q, maximum=None):
+    """Approximate q-quantile from a {bucket: count} sketch, at most maximum"""
+    if not count:
+        return None
+    rank = q * (count - 1)
+    seen = 0
+    for index in sorted(sketch, key=int):
+        seen += sketch[index]
+        if seen > rank:
+            if int(index) == SUB_SECOND:
+                value = 0.5
+            else:
+                # Midpoint of the bucket (in relative terms)
+                value = 2 * GAMMA ** int(index) * GAMMA / (GAMMA + 1)
+            if maximum is not None:
+                value = min(value, maximum)
+            return round(max(value, 0.0), 1)
+    return None
+
+
+def _observe(conn, metric, dimension, value, seconds):
+    row = conn.execute(
+        'SELECT count, total_seconds, max_seconds, sketch FROM sla_aggregates '
+        'WHERE metric = ? AND dimension = ? AND value = ?',
+        (metric, dimension, value)
+    ).fetchone()
+    if row:
+        count, total, maximum, sketch = row[0], row[1], row[2], json.loads(row[3])
+    else:
+        count, total, maximum, sketch = 0, 0.0, 0.0, {}
+
+    key = str(bucket(seconds))
+    sketch[key] = sketch.get(key, 0) + 1
+    conn.execute(
+        '''INSERT OR REPLACE INTO sla_aggregates
+           (metric, dimension, value, count, total_seconds, max_seconds, sketch)
+           VALUES (?, ?, ?, ?, ?, ?, ?)''',
+        (metric, dimension, value, count + 1, total + seconds, max(maximum, seconds),
+         json.dumps(sketch, separators=(',', ':')))
+    )
+
+
+def _seconds(start, end):
+    return max(0.0, (datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds())
+
+
+def observe_transition(conn, grievance, old_status, new_status, since, now):
+    """Account a status change; grievance is the row before the update.
+
+    since is when old_status was entered (its last status event, or the
+    grievance's creation).
+    """
+    if old_status:
+        _observe(conn, 'time_in_status', 'status', old_status, _seconds(since, now))
+
+    if new_status in RESOLVED_STATUSES and old_status not in RESOLVED_STATUSES:
+        seconds = _seconds(grievance['created_at'], now)
+        _observe(conn, 'resolution', 'all', 'all', seconds)
+        _observe(conn, 'resolution', 'category', grievance['category'], seconds)
+        _observe(conn, 'resolution', 'priority', grievance['priority'], seconds)
+
+
+# Deadlines
+
+def _deadline_hours():
+    """Hours to resolve per priority; SLA_DEADLINE_HOURS="Critical=4,High=24,..." overrides"""
+    hours = {'Critical': 4, 'High': 24, 'Medium': 72, 'Low': 168}
+    for item in os.environ.get('SLA_DEADLINE_HOURS', '').split(','):
+        if '=' in item:
+            priority, value = item.split('=', 1)
+            hours[priority.strip()] = float(value)
+    return hours
+
+
+DEADLINE_HOURS = _deadline_hours()
+
+
+def deadline(priority, status, since):
+    """When a grievance breaches its SLA: since (creation or last escalation) plus
+    its priority's window; None once resolved or for unknown priorities"""
+    hours = DEADLINE_HOURS.get(priority)
+    if status in RESOLVED_STATUSES or hours is None or since is None:
+        return None
+    return (datetime.fromisoformat(since) + timedelta(hours=hours)).isoformat()
+
+
+def next_priority(priority):
+    """One step up, or None at the top (or for unknown priorities)"""
+    if priority not in PRIORITIES or priority == PRIORITIES[-1]:
+        return None
+    return PRIORITIES[PRIORITIES.index(priority) + 1]
+
+
+# Reading
+
+def summary(conns):
+    """All aggregates as {metric: {dimension: {value: stats}}}, merged over conns
+    (one per database shard; sketches add bucket by bucket)"""
+    merged = {}
+    for conn in conns:
+        rows = conn.execute('SELECT metric, dimension, value, count, total_seconds, max_seconds, sketch FROM sla_aggregates')
+        for metric, dimension, value, count, total, maximum, sketch in rows:
+            entry = merged.setdefault((metric, dimension, value), [0, 0.0, 0.0, {}])
+            entry[0] += count
+            entry[1] += total
+            entry[2] = max(entry[2], maximum)
+            for index, n in json.loads(sketch).items():
+                entry[3][index] = entry[3].get(index, 0) + n
+
+    result = {}
+    for (metric, dimension, value), (count, total, maximum, sketch) in merged.items():
+        stats = {
+            'count': count,
+            'mean_seconds': round(total / count, 1) if count else None,
+            'max_seconds': round(maximum, 1),
+        }
+        for q in QUANTILES:
+            stats[f'p{int(q * 100)}_seconds'] = quantile(sketch, count, q, maximum)
+        result.setdefault(metric, {}).setdefault(dimension, {})[value] = stats
+    return result
+
+
+# Rebuild
+
+def rebuild():
+    """Recompute every aggregate from grievance_events (in each shard).
+
+    Grievances resolved before status history existed have no events; for
+    those, updated_at stands in for the resolution time.
+    """
+    import db
+
+    report = {'events_replayed': 0, 'estimated_from_updated_at': 0}
+    for shard in db.shard_ids():
+        conn = db.open_shard(shard)
+        try:
+            replayed, estimated = _rebuild(conn)
+        finally:
+            conn.close()
+        report['events_replayed'] += replayed
+        report['estimated_from_updated_at'] += estimated
+    return report
+
+
+def _rebuild(conn):
+    """Recompute one database's aggregates; returns (events replayed, estimated)"""
+    conn.execute('DELETE FROM sla_aggregates')
+    grievances = {}
+    replayed = 0
+    for row in conn.execute(
+        '''SELECT e.grievance_id, e.old_value, e.new_value, e.created_at,
+                  g.category, g.priority, g.created_at AS grievance_created_at
+           FROM grievance_events e JOIN grievances g ON g.id = e.grievance_id
+           WHERE e.field = 'status' ORDER BY e.grievance_id, e.id'''
+    ).fetchall():
+        state = grievances.get(row['grievance_id'])
+        if state is None:
+            state = grievances[row['grievance_id']] = {
+                'category': row['category'], 'priority': row['priority'],
+                'created_at': row['grievance_created_at'], 'since': row['grievance_created_at'],
+            }
+        if row['old_value'] is not None:
+            observe_transition(conn, state, row['old_value'], row['new_value'], state['since'], row['created_at'])
+        state['since'] = row['created_at']
+        replayed += 1
+
+    placeholders = ', '.join('?' for _ in RESOLVED_STATUSES)
+    estimated = 0
+    for row in conn.execute(
+        f'''SELECT id, category, priority, created_at, updated_at FROM grievances
+            WHERE status IN ({placeholders}) AND NOT EXISTS
+                  (SELECT 1 FROM grievance_events e WHERE e.grievance_id = grievances.id)''',
+        RESOLVED_STATUSES
+    ).fetchall():
+        observe_transition(conn, row, None, RESOLVED_STATUSES[0], None, row['updated_at'])
+        estimated += 1
+    conn.commit()
+    return replayed, estimated
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SLA aggregates')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute aggregates from history')
+    args = parser.parse_args()
+
+    import db
+    if args.rebuild:
+        print(rebuild())
+    conns = [db.get_shard_connection(shard) for shard in db.shard_ids()]
+    print(json.dumps(summary(conns), indent=2))
+    for conn in conns:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
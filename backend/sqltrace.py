@@ -0,0 +1,245 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Opt-in SQL tracing for db.py connections.
+#
+#   SQL_TRACE=1          time every query, log slow ones, EXPLAIN each distinct statement
+#   SQL_TRACE=verbose    additionally log every statement SQLite runs (set_trace_callback)
+#   SQL_SLOW_MS=50       slow-query threshold in milliseconds
+#
+# Parameter values are never logged, only their shapes (type and length).
+
+logger = logging.getLogger('sqltrace')
+
+EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+_whitespace = re.compile(r'\s+')
+
+_statements = {}  # normalized sql -> stats and plan
+_statements_lock = threading.Lock()
+_local = threading.local()
+
+
+def mode():
+    return os.environ.get('SQL_TRACE', '').lower()
+
+
+def enabled():
+    return mode() not in ('', '0', 'false', 'off') or getattr(_local, 'captured', None) is not None
+
+
+def slow_threshold():
+    return float(os.environ.get('SQL_SLOW_MS', 50)) / 1000.0
+
+
+def normalize(sql):
+    return _whitespace.sub(' ', sql).strip()
+
+
+def param_shape(params):
+    """Describe parameters without revealing their values"""
+    if params is None:
+        return '()'
+    if isinstance(params, dict):
+        return '{' + ', '.join(f'{k}: {_value_shape(v)}' for k, v in params.items()) + '}'
+    return '(' + ', '.join(_value_shape(v) for v in params) + ')'
+
+
+def _value_shape(value):
+    if value is None:
+        return 'null'
+    if isinstance(value, (str, bytes)):
+        return f'{type(value).__name__}[{len(value)}]'
+    return type(value).__name__
+
+
+def explain(conn, sql, params=()):
+    """Return (plan rows, full scans) for a statement"""
+    plan = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, params or ()).fetchall()
+    details = [row[3] for row in plan]
+    return details, [d for d in details if is_full_scan(d)]
+
+
+def is_full_scan(detail):
+    """True for plan steps that read a whole table rather than an index"""
+    if not detail.startswith('SCAN '):
+        return False
+    if 'USING' in detail or 'CONSTANT ROW' in detail:
+        return False
+    # Subquery/CTE scans are reported as e.g. "SCAN (subquery-1)"
+    return not detail.startswith('SCAN (')
+
+
+def install(conn):
+    """Attach the statement stream logger to a connection (verbose mode)"""
+    if mode() == 'verbose':
+        conn.set_trace_callback(lambda statement: logger.debug('sql: %s', statement))
+    return conn
+
+
+def record(conn, sql, params, elapsed):
+    """Account one executed statement; called from db.TimedCursor"""
+    key = normalize(sql)
+    with _statements_lock:
+        stats = _statements.get(key)
+        first_seen = stats is None
+        if first_seen:
+            stats = _statements[key] = {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0,
+                                        'plan': None, 'full_scans': []}
+        stats['count'] += 1
+        stats['total_seconds'] += elapsed
+        stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+
+    captured = getattr(_local, 'captured', None)
+    if (first_seen or captured is not None) and key.split(' ', 1)[0].upper() in EXPLAINABLE:
+        try:
+            plan, full_scans = explain(conn, sql, params)
+        except sqlite3.Error as e:
+            plan, full_scans = [f'EXPLAIN failed: {e}'], []
+        stats['plan'], stats['full_scans'] = plan, full_scans
+        if full_scans:
+            logger.warning('full scan: %s -- %s', key, '; '.join(full_scans))
+        if captured is not None:
+            captured.append({'sql': key, 'plan': plan, 'full_scans': full_scans})
+
+    if elapsed >= slow_threshold():
+        logger.warning('slow query %.1f ms: %s params=%s', elapsed * 1000, key, param_shape(params))
+
+
+def report():
+    """Per-statement stats collected so far, slowest total time first"""
+    with _statements_lock:
+        items = [dict(stats, sql=sql) for sql, stats in _statements.items()]
+    return sorted(items, key=lambda s: s['total_seconds'], reverse=True)
+
+
+def reset():
+    with _statements_lock:
+        _statements.clear()
+
+
+# Plan assertions for hot queries
+
+@contextmanager
+def capture():
+    """Collect the plan of every statement run in this thread inside the block"""
+    previous = getattr(_local, 'captured', None)
+    _local.captured = []
+    try:
+        yield _local.captured
+    finally:
+        _local.captured = previous
+
+
+def captured():
+    """The capture list active in this thread, to hand to another thread"""
+    return getattr(_local, 'captured', None)
+
+
+@contextmanager
+def capture_into(plans):
+    """Record into a capture list started in another thread (None: no capture)"""
+    previous = getattr(_local, 'captured', None)
+    _local.captured = plans
+    try:
+        yield plans
+    finally:
+        _local.captured = previous
+
+
+def assert_uses_index(fn, *args, **kwargs):
+    """Run a db function and fail if any statement it issues scans a whole table"""
+    with capture() as plans:
+        fn(*args, **kwargs)
+    scans = [f"{p['sql']}\n    -> {'; '.join(p['full_scans'])}" for p in plans if p['full_scans']]
+    if scans:
+        raise AssertionError(f'{fn.__name__} scans whole tables:\n  ' + '\n  '.join(scans))
+    return plans
+
+
+def hot_queries(user_id, grievance_id):
+    """Named hot queries as (name, function, args); ids are sample rows"""
+    import db
+    return [
+        ('get_user_by_id', db.get_user_by_id, (user_id,)),
+        ('get_user_by_email', db.get_user_by_email, ('sample@example.com',)),
+        ('get_grievance', db.get_grievance, (grievance_id,)),
+        ('get_user_grievances:admin', db.get_user_grievances, (user_id, 'admin')),
+        ('get_user_grievances:staff', db.get_user_grievances, (user_id, 'staff', 50, 0, False, 'Sample')),
+        ('get_user_grievances:user', db.get_user_grievances, (user_id, 'user')),
+        ('get_grievances:status', db.get_grievances, ({'status': 'New'},)),
+        ('update_grievance', db.update_grievance, (grievance_id, {'status': 'In Progress'})),
+        ('get_due_grievances', db.get_due_grievances, ('9999-12-31',)),
+        ('get_comment_page', db.get_comment_page, (grievance_id,)),
+        ('get_comment_page:since', db.get_comment_page, (grievance_id, db.encode_cursor('2000-01-01', 'c0'))),
+        ('get_comment_page:before', db.get_comment_page, (grievance_id, None, db.encode_cursor('9999-12-31', 'c0'))),
+        ('get_feedback_page', db.get_feedback_page, ()),
+        ('get_feedback_page:user', db.get_feedback_page, ({'userId': user_id},)),
+        ('get_feedback_page:category+rating', db.get_feedback_page, ({'category': 'other', 'rating': 5},)),
+        ('get_feedback_page:cursor', db.get_feedback_page, ({'category': 'other'}, db.encode_cursor('9999-12-31', 1))),
+    ]
+
+
+def seed_sample():
+    """Add the sample user u1 and grievance g1 that hot_queries('u1', 'g1') reads
+    to the current (initialized) database, plus a hundred other grievances"""
+    import db
+
+    conn = db.get_db_connection()
+    conn.execute("INSERT INTO users (id, name, email, password, role, department) "
+                 "VALUES ('u1', 'Sample', 'sample@example.com', 'x', 'user', 'Sample')")
+    conn.execute("INSERT INTO grievances (id, title, description, category, priority, status, submitted_by) "
+                 "VALUES ('g1', 'Sample', 'Sample', 'Other', 'Low', 'New', 'u1')")
+    # With a single row a table scan is the cheapest plan for any range, so
+    # the planner would never show whether a range query can use its index
+    statuses = ('New', 'In Progress', 'Resolved', 'Closed')
+    conn.executemany(
+        "INSERT INTO grievances (id, title, description, category, priority, status, submitted_by, created_at, due_at) "
+        "VALUES (?, 'Filler', 'Filler', 'Other', 'Low', ?, 'u0', ?, ?)",
+        [(f'g{i}', statuses[i % 4], f'2024-01-{i % 28 + 1:02d}T00:00:{i % 60:02d}',
+          f'2024-02-{i % 28 + 1:02d}T00:00:{i % 60:02d}' if i % 4 < 2 else None) for i in range(2, 102)]
+    )
+    conn.commit()
+    # Give the planner statistics so it behaves as it does on real data
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+
+
+def check_hot_queries():
+    """Run every hot query against a scratch database; return the failures"""
+    import tempfile
+    import db
+
+    original = db.DATABASE_NAME
+    with tempfile.TemporaryDirectory() as workdir:
+        db.DATABASE_NAME = os.path.join(workdir, 'plans.db')
+        try:
+            db.init_db()
+            seed_sample()
+
+            failures = []
+            for name, fn, args in hot_queries('u1', 'g1'):
+                try:
+                    assert_uses_index(fn, *args)
+                except AssertionError as e:
+                    failures.append((name, str(e)))
+            return failures
+        finally:
+            db.DATABASE_NAME = original
+
+
+if __name__ == '__main__':
+    import sys
+
+    # db records into the imported module, not into this __main__ copy of it
+    import sqltrace
+
+    failures = sqltrace.check_hot_queries()
+    for name, message in failures:
+        print(f'FAIL {name}: {message}')
+    print(f'{len(failures)} hot queries with full table scans')
+    sys.exit(1 if failures else 0)
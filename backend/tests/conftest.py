@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules are imported flat, as the servers and scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Hash in the test process: a worker pool only adds start-up time here
+os.environ.setdefault('PASSWORD_POOL_SIZE', '0')
+
+import db  # noqa: E402
+from benchmarks.common import temp_database  # noqa: E402
+
+
+@pytest.fixture
+def database():
+    """A fresh, initialized database file that db points at for the test"""
+    with temp_database() as path:
+        yield path
+
+
+@pytest.fixture
+def user(database):
+    user, error = db.create_user('Test User', 'test@example.com', 'Passw0rd!', 'user', 'Public Works')
+    assert error is None, error
+    return user
+
+
+@pytest.fixture
+def grievance(user):
+    grievance, error = db.create_grievance('Broken street light', 'Dark since Monday', 'Other', 'Low', user['id'])
+    assert error is None, error
+    return grievance
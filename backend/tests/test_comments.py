@@ -0,0 +1,72 @@
+import pytest
+
+import db
+import ids
+
+
+def _comments(grievance, user, count):
+    for i in range(count):
+        _, error = db.add_comment(grievance['id'], user['id'], f'Comment {i}')
+        assert error is None, error
+
+
+def _same_time(grievance, user, count, created_at='2030-01-01T00:00:00'):
+    """Comments sharing one created_at, so only the id orders them"""
+    rows = [(ids.new_id(), grievance['id'], user['id'], f'Tied {i}', created_at) for i in range(count)]
+    db.bulk_insert('comments', ('id', 'grievance_id', 'user_id', 'content', 'created_at'), rows)
+    return [row[0] for row in rows]
+
+
+def test_newest_page_first(grievance, user):
+    _comments(grievance, user, 7)
+    page = db.get_comment_page(grievance['id'], limit=3)
+    assert [c['content'] for c in page['comments']] == ['Comment 4', 'Comment 5', 'Comment 6']
+    assert page['prev_cursor'] is not None
+    assert page['comments'][0]['user_name'] == 'Test User'
+
+
+def test_walk_back_to_start(grievance, user):
+    _comments(grievance, user, 7)
+    tied = _same_time(grievance, user, 4)
+    seen = []
+    page = db.get_comment_page(grievance['id'], limit=3)
+    while True:
+        seen = page['comments'] + seen
+        if page['prev_cursor'] is None:
+            break
+        page = db.get_comment_page(grievance['id'], before=page['prev_cursor'], limit=3)
+    assert [c['id'] for c in seen] == [c['id'] for c in db.get_grievance_comments(grievance['id'])]
+    assert [c['id'] for c in seen[-4:]] == tied
+
+
+def test_since_returns_only_new(grievance, user):
+    _comments(grievance, user, 3)
+    cursor = db.get_comment_page(grievance['id'])['next_cursor']
+    assert db.get_comment_page(grievance['id'], since=cursor) == {
+        'comments': [], 'next_cursor': cursor, 'prev_cursor': None, 'has_more': False,
+    }
+    db.add_comment(grievance['id'], user['id'], 'Later')
+    page = db.get_comment_page(grievance['id'], since=cursor)
+    assert [c['content'] for c in page['comments']] == ['Later']
+    assert page['next_cursor'] != cursor
+
+
+def test_since_pages_through_ties(grievance, user):
+    tied = _same_time(grievance, user, 5)
+    first = db.get_comment_page(grievance['id'], since=db.encode_cursor('2000-01-01', ''), limit=2)
+    assert first['has_more']
+    seen = first['comments']
+    cursor = first['next_cursor']
+    while True:
+        page = db.get_comment_page(grievance['id'], since=cursor, limit=2)
+        seen += page['comments']
+        cursor = page['next_cursor']
+        if not page['has_more']:
+            break
+    assert [c['id'] for c in seen] == tied
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', db.encode_cursor('2030-01-01'), db.encode_cursor(1, 2, 3)])
+def test_malformed_cursor(grievance, cursor):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        db.get_comment_page(grievance['id'], since=cursor)
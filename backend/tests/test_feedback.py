@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+import db
+import ids
+
+
+def _feedback(user, ratings, category='usability'):
+    created = []
+    for rating in ratings:
+        row, error = db.create_feedback(user['name'], user['id'], rating, category, f'Rated {rating}')
+        assert error is None, error
+        created.append(row['id'])
+    return created
+
+
+def _pages(filters=None, limit=3):
+    rows, cursor = db.get_feedback_page(filters, limit=limit)
+    pages = [rows]
+    while cursor:
+        rows, cursor = db.get_feedback_page(filters, cursor, limit=limit)
+        pages.append(rows)
+    return pages
+
+
+def test_cursor_walks_every_row_once(user):
+    created = _feedback(user, [5, 4, 3, 2, 1, 5, 4])
+    pages = _pages()
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [row['id'] for page in pages for row in page] == created[::-1]
+
+
+def test_exact_multiple_has_no_empty_page(user):
+    _feedback(user, [1, 2, 3, 4, 5, 1])
+    assert [len(page) for page in _pages()] == [3, 3]
+
+
+def test_same_created_at(user):
+    rows = [(ids.new_id(), user['name'], user['id'], 3, 'design', f'Tied {i}', '2030-01-01T00:00:00')
+            for i in range(5)]
+    db.bulk_insert('feedback', db.FEEDBACK_FIELDS, rows)
+    seen = [row['message'] for page in _pages(limit=2) for row in page]
+    # Ties fall back to insertion order (rowid), newest first
+    assert seen == [f'Tied {i}' for i in reversed(range(5))]
+
+
+def test_filters_and_projection(user):
+    _feedback(user, [5, 4, 5], category='features')
+    _feedback(user, [5], category='design')
+    rows, cursor = db.get_feedback_page({'category': 'features', 'rating': 5}, fields=('id', 'rating'))
+    assert cursor is None
+    assert [set(row) for row in rows] == [{'id', 'rating'}] * 2
+    as_json, _ = db.get_feedback_page({'userId': user['id']}, as_json=True)
+    assert len(json.loads(as_json)) == 4
+
+
+def test_malformed_cursor(database):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        db.get_feedback_page(cursor='%%%')
@@ -0,0 +1,116 @@
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import db
+import ids
+from benchmarks import datagen
+
+
+def test_layout():
+    value = uuid.UUID(ids.new_id())
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+    assert abs(ids.timestamp(str(value)) - time.time()) < 5
+
+
+def test_strictly_increasing_within_a_millisecond():
+    generator = ids.Generator()
+    made = [generator.next(1_700_000_000_000) for _ in range(10_000)]
+    assert made == sorted(made) and len(set(made)) == len(made)
+    # 10000 ids overflow the 12-bit counter, which carries into the next millisecond
+    assert ids.timestamp(made[0]) == 1_700_000_000.0
+    assert ids.timestamp(made[-1]) > ids.timestamp(made[0])
+
+
+def test_clock_step_back_keeps_order():
+    generator = ids.Generator()
+    later = generator.next(2_000_000)
+    earlier = generator.next(1_000_000)
+    assert earlier > later
+    assert ids.timestamp(earlier) == ids.timestamp(later)
+
+
+def test_text_order_follows_time():
+    generator = ids.Generator()
+    made = [generator.next(ms) for ms in (1, 255, 256, 2 ** 40, 2 ** 47)]
+    assert made == sorted(made)
+
+
+def test_threads_get_distinct_ids():
+    generator = ids.Generator()
+    made = []
+
+    def run():
+        batch = [generator.next() for _ in range(2000)]
+        made.extend(batch)
+        assert batch == sorted(batch)
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(made)) == 16_000
+
+
+def test_seeded_generator_is_reproducible():
+    first = [ids.Generator(random.Random(3)).next(ms) for ms in range(100)]
+    again = [ids.Generator(random.Random(3)).next(ms) for ms in range(100)]
+    assert first == again
+    assert first != [ids.Generator(random.Random(4)).next(ms) for ms in range(100)]
+
+
+def test_shard_bits():
+    for shard in (0, 1, 17, ids.MAX_SHARDS - 1):
+        made = ids.new_id(shard)
+        assert ids.shard_of(made) == shard
+        assert uuid.UUID(made).version == 7
+    moved = str(uuid.UUID(int=ids.with_shard(uuid.UUID(made).int, 5)))
+    assert ids.shard_of(moved) == 5
+    assert ids.timestamp(moved) == ids.timestamp(made)
+
+
+def test_pack_round_trip():
+    made = ids.new_id()
+    assert len(ids.pack(made)) == 16
+    assert ids.unpack(ids.pack(made)) == made
+
+
+def test_uuid4_has_no_timestamp():
+    assert ids.timestamp(str(uuid.uuid4())) is None
+
+
+def test_migrate_rekeys_references(user, grievance):
+    conn = db.get_db_connection()
+    old_user, old_grievance = str(uuid.uuid4()), str(uuid.uuid4())
+    conn.execute('PRAGMA foreign_keys = OFF')
+    conn.execute('UPDATE users SET id = ? WHERE id = ?', (old_user, user['id']))
+    conn.execute('UPDATE grievances SET id = ?, submitted_by = ? WHERE id = ?',
+                 (old_grievance, old_user, grievance['id']))
+    conn.execute('UPDATE grievance_events SET grievance_id = ? WHERE grievance_id = ?', (old_grievance, grievance['id']))
+    conn.commit()
+    conn.close()
+
+    assert ids.migrate(('users', 'grievances')) == {'users': 1, 'grievances': 1}
+    conn = db.get_db_connection()
+    user_id, grievance_id, submitted_by = conn.execute(
+        'SELECT u.id, g.id, g.submitted_by FROM grievances g JOIN users u ON u.id = g.submitted_by').fetchone()
+    conn.close()
+    assert uuid.UUID(user_id).version == uuid.UUID(grievance_id).version == 7
+    assert submitted_by == user_id
+    assert ids.migrate(('users', 'grievances')) == {'users': 0, 'grievances': 0}
+
+
+def test_generated_data_ids_follow_created_at(database):
+    datagen.generate(500, seed=3)
+    conn = db.get_db_connection()
+    for table, created in (('users', 'created_at'), ('grievances', 'created_at'), ('comments', 'created_at'),
+                           ('feedback', 'createdAt')):
+        for row_id, created_at in conn.execute(f'SELECT id, {created} FROM {table}'):
+            assert abs(ids.timestamp(row_id) - datetime.fromisoformat(created_at).timestamp()) < 0.01
+    first = conn.execute('SELECT id FROM grievances ORDER BY created_at LIMIT 1').fetchone()[0]
+    conn.close()
+    assert datagen.make_id('grievance', 0, 3, 500) == first
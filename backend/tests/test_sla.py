@@ -0,0 +1,70 @@
+import math
+import random
+
+import pytest
+
+import db
+import sla
+
+
+def _sketch(values):
+    sketch = {}
+    for value in values:
+        key = str(sla.bucket(value))
+        sketch[key] = sketch.get(key, 0) + 1
+    return sketch
+
+
+@pytest.mark.parametrize('q', sla.QUANTILES)
+def test_quantile_relative_error(q):
+    rng = random.Random(7)
+    # Resolution times from minutes to weeks
+    values = sorted(rng.lognormvariate(math.log(36000), 1.5) for _ in range(5000))
+    estimate = sla.quantile(_sketch(values), len(values), q, max(values))
+    exact = values[math.floor(q * (len(values) - 1))]
+    assert abs(estimate - exact) / exact < 0.011
+
+
+def test_sub_second_values():
+    assert sla.bucket(0.0) == sla.bucket(0.999) == sla.SUB_SECOND
+    assert sla.bucket(1.0) == 0
+    assert sla.quantile(_sketch([0.0, 0.2, 0.3]), 3, 0.5) == 0.5
+    # Never above the largest value seen
+    assert sla.quantile(_sketch([0.0, 0.2, 0.3]), 3, 0.99, maximum=0.3) == 0.3
+
+
+def test_empty_sketch():
+    assert sla.quantile({}, 0, 0.5) is None
+
+
+def test_summary_merges_sketches(database):
+    rng = random.Random(11)
+    values = [rng.uniform(60, 86400) for _ in range(400)]
+    conn = db.get_db_connection()
+    for value in values:
+        sla._observe(conn, 'resolution', 'priority', 'High', value)
+    conn.commit()
+    single = sla.summary([conn])['resolution']['priority']['High']
+    # The same aggregates twice, as if from two shards
+    merged = sla.summary([conn, conn])['resolution']['priority']['High']
+    conn.close()
+
+    assert single['count'] == 400
+    assert single['max_seconds'] == round(max(values), 1)
+    assert single['mean_seconds'] == pytest.approx(sum(values) / 400, abs=0.1)
+    assert merged['count'] == 800
+    assert merged['mean_seconds'] == single['mean_seconds']
+    assert {key: merged[key] for key in ('p50_seconds', 'p90_seconds', 'p99_seconds')} == \
+        {key: single[key] for key in ('p50_seconds', 'p90_seconds', 'p99_seconds')}
+
+
+def test_resolution_recorded_on_status_change(grievance, user):
+    db.update_grievance(grievance['id'], {'status': 'Resolved'}, changed_by=user['id'])
+    conn = db.get_db_connection()
+    stats = sla.summary([conn])
+    conn.close()
+    assert stats['resolution']['all']['all']['count'] == 1
+    assert stats['resolution']['priority']['Low']['count'] == 1
+    assert stats['time_in_status']['status']['New']['count'] == 1
+    # Resolved within the test, so well under a second
+    assert stats['resolution']['all']['all']['p50_seconds'] < 1
@@ -0,0 +1,41 @@
+import pytest
+
+import db
+import sqltrace
+
+HOT_QUERIES = sqltrace.hot_queries('u1', 'g1')
+
+
+@pytest.mark.parametrize('name, fn, args', HOT_QUERIES, ids=[name for name, _, _ in HOT_QUERIES])
+def test_hot_query_uses_index(database, name, fn, args):
+    sqltrace.seed_sample()
+    plans = sqltrace.assert_uses_index(fn, *args)
+    assert plans, f'{name} ran no statements'
+
+
+def test_full_scan_fails(database):
+    def search_descriptions(text):
+        conn = db.get_db_connection()
+        conn.execute('SELECT id FROM grievances WHERE description LIKE ?', (f'%{text}%',)).fetchall()
+        conn.close()
+
+    with pytest.raises(AssertionError, match='grievances'):
+        sqltrace.assert_uses_index(search_descriptions, 'pothole')
+
+
+def test_capture_is_per_block(database):
+    sqltrace.seed_sample()
+    with sqltrace.capture() as outer:
+        db.get_user_by_id('u1')
+        with sqltrace.capture() as inner:
+            db.get_grievance('g1')
+        db.get_user_by_email('sample@example.com')
+    assert inner and all('grievances' in plan['sql'] for plan in inner)
+    assert not any('grievances' in plan['sql'] for plan in outer)
+    assert sqltrace.captured() is None
+
+
+def test_param_shape_hides_values():
+    shape = sqltrace.param_shape(('secret@example.com', 42, None, b'\x00\x01'))
+    assert shape == '(str[18], int, null, bytes[2])'
+    assert sqltrace.param_shape({'email': 'secret@example.com'}) == '{email: str[18]}'
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from benchmarks import storage, storage_suite
+
+CHECKS = [pytest.param(fn, id=fn.__name__) for fn in storage_suite.CHECKS]
+
+
+@pytest.fixture
+def sqlite_store(database):
+    store = storage.open_backend('sqlite')
+    yield store
+    store.close()
+
+
+@pytest.fixture(scope='module')
+def postgres_store():
+    # Checks only read rows they created, so any scratch database will do
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        pytest.skip('DATABASE_URL is not set')
+    pytest.importorskip('psycopg_pool')
+    store = storage.open_backend('postgres', dsn=dsn)
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize('check', CHECKS)
+def test_sqlite_conformance(sqlite_store, check):
+    check(sqlite_store)
+
+
+@pytest.mark.parametrize('check', CHECKS)
+def test_postgres_conformance(postgres_store, check):
+    check(postgres_store)
+
+
+def test_storage_is_abstract():
+    with pytest.raises(TypeError):
+        storage.Storage()
+
+    class Partial(storage.Storage):
+        def get_user_by_id(self, user_id):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match='Unknown storage backend'):
+        storage.open_backend('mongodb')
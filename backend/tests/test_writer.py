@@ -0,0 +1,89 @@
+import sqlite3
+
+import pytest
+
+import db
+import writer
+
+
+@pytest.fixture(params=['1', '0'], ids=['queued', 'inline'])
+def scratch(database, request, monkeypatch):
+    """A Writer on the test database with a table of unique values (queued or DB_WRITER=0)"""
+    monkeypatch.setenv('DB_WRITER', request.param)
+    conn = db.get_db_connection()
+    conn.execute('CREATE TABLE scratch (value INTEGER UNIQUE)')
+    conn.commit()
+    conn.close()
+    w = writer.Writer(db.get_db_connection, lambda: database)
+    # Wide enough for every submit below to land in one batch
+    w.window = 0.2
+    yield w
+    w.shutdown()
+
+
+def _insert(value, fail=False):
+    def mutation(conn):
+        conn.execute('INSERT INTO scratch (value) VALUES (?)', (value,))
+        if fail:
+            raise ValueError(f'rejected {value}')
+        return value
+    return mutation
+
+
+def _values():
+    conn = db.get_db_connection()
+    values = sorted(row[0] for row in conn.execute('SELECT value FROM scratch'))
+    conn.close()
+    return values
+
+
+def test_failed_mutation_is_rolled_back_alone(scratch):
+    futures = [scratch.submit(fn) for fn in (_insert(1), _insert(2, fail=True), _insert(1), _insert(3))]
+    assert futures[0].result(timeout=5) == 1
+    with pytest.raises(ValueError, match='rejected 2'):
+        futures[1].result(timeout=5)
+    with pytest.raises(sqlite3.IntegrityError):
+        futures[2].result(timeout=5)
+    assert futures[3].result(timeout=5) == 3
+    assert _values() == [1, 3]
+
+
+def test_after_commit_runs_for_committed_mutations_only(scratch):
+    ran = []
+
+    def mutation(value, fail):
+        def fn(conn):
+            conn.after_commit.append(lambda: ran.append(value))
+            return _insert(value, fail)(conn)
+        return fn
+
+    futures = [scratch.submit(mutation(value, value == 2)) for value in (1, 2, 3)]
+    for future in futures:
+        future.exception(timeout=5)
+    assert sorted(ran) == [1, 3]
+
+
+def test_group_commit(scratch, monkeypatch):
+    batches = []
+    monkeypatch.setattr(writer.metrics, 'observe',
+                        lambda name, labels, value, *args: batches.append(value) if name == 'db_write_batch_size' else None)
+    futures = [scratch.submit(_insert(value)) for value in range(20)]
+    for future in futures:
+        future.result(timeout=5)
+    assert _values() == list(range(20))
+    assert len(batches) == (20 if not writer.enabled() else 1)
+
+
+def test_shutdown_applies_queued_writes(scratch):
+    futures = [scratch.submit(_insert(value)) for value in range(5)]
+    scratch.shutdown()
+    assert all(future.done() for future in futures)
+    assert _values() == list(range(5))
+
+
+def test_db_write_returns_error(database):
+    def mutation(conn):
+        raise ValueError('nope')
+
+    assert db._write(mutation, 'Failed') == (None, 'nope')
+    assert db._write(lambda conn: None, 'Failed') == (None, 'Failed')
@@ -0,0 +1,184 @@
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import metrics
+import sqltrace
+
+# Single-writer queue with group commit.
+#
+# Mutations are functions fn(conn) queued from request threads. One thread
+# owns the write connection: it takes everything queued, runs it inside one
+# BEGIN IMMEDIATE ... COMMIT (each mutation in its own savepoint, so a failing
+# one doesn't undo the others) and then resolves each caller's future. Under
+# load, many rows share one commit and one fsync, and request threads never
+# compete for SQLite's write lock with each other.
+#
+# Mutations may append callables to conn.after_commit; they run once the
+# batch is durable (db.py uses this to notify change listeners).
+#
+#   DB_WRITER=0          run mutations inline in the calling thread instead
+#   DB_WRITER_WINDOW_MS  how long to wait for more work before committing (default 1)
+#   DB_WRITER_BATCH      maximum mutations per commit (default 256)
+#   DB_WRITER_RETRIES    retries when another process holds the lock (default 5)
+
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+_STOP = object()
+
+
+def enabled():
+    return os.environ.get('DB_WRITER', '1').lower() not in ('0', 'false', 'off')
+
+
+def _is_busy(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+class Writer:
+    """Background thread applying queued mutations in group commits"""
+
+    def __init__(self, connect, target):
+        self.connect = connect  # () -> connection
+        self.target = target    # () -> database path; the connection follows it
+        self.window = float(os.environ.get('DB_WRITER_WINDOW_MS', 1)) / 1000.0
+        self.max_batch = int(os.environ.get('DB_WRITER_BATCH', 256))
+        self.retries = int(os.environ.get('DB_WRITER_RETRIES', 5))
+        self.queue = None
+        self.thread = None
+        self.pid = None
+        self.lock = threading.Lock()
+        self.conn = None
+        self.conn_target = None
+
+    def submit(self, fn):
+        """Queue fn(conn); returns a Future with its return value"""
+        future = Future()
+        item = (fn, future, sqltrace.captured())
+        if not enabled():
+            conn = self.connect()
+            conn.isolation_level = None
+            try:
+                self._commit(conn, [item])
+            finally:
+                conn.close()
+            return future
+
+        self._ensure_thread()
+        self.queue.put(item)
+        return future
+
+    def _ensure_thread(self):
+        if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+            return
+        with self.lock:
+            # Threads don't survive fork, so a worker process starts its own
+            if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+                self.queue = queue.Queue()
+                self.conn = None
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self._commit(self._connection(), batch)
+            except Exception as e:
+                # e.g. the database can't be opened: fail this batch, keep serving
+                self.conn = None
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def _connection(self):
+        target = self.target()
+        if self.conn is None or self.conn_target != target:
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = self.connect()
+            self.conn.isolation_level = None  # Transactions are managed here
+            self.conn_target = target
+        return self.conn
+
+    def _commit(self, conn, batch):
+        """Apply a batch in one transaction, retrying the whole batch on lock contention"""
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        start = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            outcomes = []
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                for fn, future, captured in batch:
+                    outcomes.append(self._apply(conn, fn, future, captured))
+                conn.execute('COMMIT')
+                break
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                if not _is_busy(e) or attempt == self.retries:
+                    for _, future, _ in batch:
+                        future.set_exception(e)
+                    return
+                # Another process holds the lock beyond busy_timeout: back off with jitter
+                time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+
+        metrics.observe('db_write_batch_size', (), len(batch), BATCH_BUCKETS)
+        metrics.observe('db_write_commit_seconds', (), time.perf_counter() - start)
+        for future, value, error, after_commit in outcomes:
+            if error is not None:
+                future.set_exception(error)
+                continue
+            for hook in after_commit:
+                try:
+                    hook()
+                except Exception as e:
+                    print(f"After-commit hook failed: {e}")
+            future.set_result(value)
+
+    def _apply(self, conn, fn, future, captured):
+        """Run one mutation in a savepoint; returns (future, value, error, after_commit)"""
+        conn.after_commit = []
+        conn.execute('SAVEPOINT mutation')
+        try:
+            with sqltrace.capture_into(captured):
+                value = fn(conn)
+        except Exception as e:
+            if isinstance(e, sqlite3.OperationalError) and _is_busy(e):
+                raise  # Retry the whole batch
+            conn.execute('ROLLBACK TO mutation')
+            conn.execute('RELEASE mutation')
+            return future, None, e, []
+        conn.execute('RELEASE mutation')
+        return future, value, None, conn.after_commit
+
+    def shutdown(self):
+        """Apply everything already queued, then stop the thread"""
+        with self.lock:
+            thread = self.thread
+            if thread is None or self.pid != os.getpid() or not thread.is_alive():
+                return
+            self.queue.put(_STOP)
+        thread.join()